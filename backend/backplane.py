@@ -0,0 +1,425 @@
+"""
+Pub/sub backplane between server processes.
+
+With the default "local" backend everything stays in this process, as
+before. With "hub" (a small Unix-socket broker) or "redis" (optional redis
+package) several uvicorn workers, or servers on several machines, hold
+WebSocket connections and share the updates:
+
+- publish() sends a message to every other process. The publishing process
+  handles its own update directly, so its clients never wait for a round
+  trip through the broker.
+- Messages published with a retain key are kept by the broker and replayed
+  to processes that connect later, so a new worker starts with the current
+  live/public state. Workers offer them again to a hub that restarted.
+- One process is the ingest leader; only it polls OneDrive, watches local
+  files and keeps the Graph subscription. The hub makes its oldest client
+  the leader, with Redis the leader holds an expiring lock key (renewed
+  and released only while it still holds it, and released on stop() so
+  another worker takes over right away).
+
+The hub is started by the first worker that finds no hub listening, or
+standalone with `python backplane.py hub [--path /tmp/slalomtools.sock]`
+(then it survives worker restarts). Unix sockets make it Linux/macOS only.
+"""
+import os
+import sys
+import json
+import socket
+import time
+import asyncio
+import argparse
+from broadcaster import encode
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import WatchError
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+BACKENDS = ("local", "hub", "redis")
+RECONNECT_DELAY = 2
+LEADER_TTL = 15          # seconds the Redis leader lock lives without renewal
+LEADER_RENEW = 5
+REDIS_TIMEOUT = 5        # seconds for connecting to and disconnecting from Redis
+REDIS_HEALTH_CHECK = 15  # seconds between pings on the subscription connection
+MAX_LINE = 64 * 1024 * 1024
+MAX_CLIENT_BUFFER = 32 * 1024 * 1024   # hub drops a worker that stops reading
+REDIS_CHANNEL = "slalomtools:updates"
+REDIS_RETAINED = "slalomtools:retained"
+REDIS_LEADER = "slalomtools:leader"
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_settings = {
+    "backend": "local",
+    "hub_path": "/tmp/slalomtools.sock",
+    "start_hub": True,
+    "redis_url": "redis://localhost:6379/0"
+}
+_state = {
+    "handler": None,
+    "on_leader": None,
+    "leader": True,
+    "connected": False,
+    "writer": None,
+    "redis": None,
+    "hub_server": None,
+    "hub_lock": None,
+    "tasks": []
+}
+# Retained messages this worker has seen, offered to a restarted hub (or an emptied Redis)
+_retained = {}
+backplane_stats = {"published": 0, "received": 0, "reconnects": 0, "errors": 0}
+
+
+def configure(settings):
+    _settings.update({k: v for k, v in settings.items() if k in _settings})
+    if _settings["backend"] not in BACKENDS:
+        print(f"Unknown backplane backend '{_settings['backend']}', using local")
+        _settings["backend"] = "local"
+    if _settings["backend"] == "redis" and not REDIS_AVAILABLE:
+        print("Warning: redis package not installed, using the local backplane")
+        _settings["backend"] = "local"
+    if _settings["backend"] == "hub" and not hasattr(asyncio, "open_unix_connection"):
+        print("Warning: Unix sockets are not available on this platform, using the local backplane")
+        _settings["backend"] = "local"
+
+
+def is_leader():
+    return _state["leader"]
+
+
+def _set_leader(leader):
+    if leader == _state["leader"]:
+        return
+    _state["leader"] = leader
+    print(f"Backplane: this worker ({WORKER_ID}) is {'now' if leader else 'no longer'} the ingest leader")
+    if _state["on_leader"]:
+        _state["on_leader"](leader)
+
+
+async def _deliver(message):
+    backplane_stats["received"] += 1
+    try:
+        await _state["handler"](message)
+    except Exception as e:
+        backplane_stats["errors"] += 1
+        print(f"Error handling backplane message: {e}")
+
+
+def _line(data):
+    return (encode(data) + "\n").encode("utf-8")
+
+
+# --- Unix-socket hub -------------------------------------------------------
+
+async def serve_hub(path):
+    """Run the hub broker on a Unix socket and return the asyncio server."""
+    clients = []      # writers in connection order; the first one is the leader
+    retained = {}     # retain key -> message
+
+    def announce_leader():
+        for i, writer in enumerate(clients):
+            writer.write(_line({"op": "leader", "leader": i == 0}))
+
+    async def handle(reader, writer):
+        for key, message in retained.items():
+            writer.write(_line({"op": "message", "message": message, "retain": key}))
+        clients.append(writer)
+        announce_leader()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                data = json.loads(line)
+                if data.get("op") == "restore":
+                    # A worker re-offers what it knows after the hub restarted
+                    for key, message in data["retained"].items():
+                        retained.setdefault(key, message)
+                    continue
+                if data.get("op") != "publish":
+                    continue
+                if data.get("retain"):
+                    retained[data["retain"]] = data["message"]
+                out = _line({"op": "message", "message": data["message"], "retain": data.get("retain")})
+                for other in clients[:]:
+                    if other is writer:
+                        continue
+                    if other.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+                        print("Backplane hub: dropping a worker that stopped reading")
+                        clients.remove(other)
+                        other.close()
+                        continue
+                    other.write(out)
+        except (ConnectionError, ValueError) as e:
+            print(f"Backplane hub: worker connection failed: {e}")
+        finally:
+            if writer in clients:
+                clients.remove(writer)
+                announce_leader()
+            writer.close()
+
+    if os.path.exists(path):
+        os.unlink(path)  # stale socket of a hub that is gone (we hold the lock)
+    server = await asyncio.start_unix_server(handle, path=path, limit=MAX_LINE)
+    print(f"Backplane hub listening on {path}")
+    return server
+
+
+def _acquire_hub_lock(path):
+    """Only one process may host the hub; an flock on a side file decides which."""
+    if not FCNTL_AVAILABLE:
+        return True
+    if _state["hub_lock"] is None:
+        lock = open(path + ".lock", "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        _state["hub_lock"] = lock
+    return True
+
+
+async def _hub_connect():
+    path = _settings["hub_path"]
+    try:
+        return await asyncio.open_unix_connection(path, limit=MAX_LINE)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if not _settings["start_hub"] or _state["hub_server"] or not _acquire_hub_lock(path):
+            raise
+    _state["hub_server"] = await serve_hub(path)
+    return await asyncio.open_unix_connection(path, limit=MAX_LINE)
+
+
+async def _hub_loop():
+    while True:
+        try:
+            reader, writer = await _hub_connect()
+            _state.update({"writer": writer, "connected": True})
+            if _retained:
+                writer.write(_line({"op": "restore", "retained": _retained}))
+            print(f"Backplane: connected to hub at {_settings['hub_path']}")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                data = json.loads(line)
+                if data["op"] == "leader":
+                    _set_leader(data["leader"])
+                elif data["op"] == "message":
+                    if data.get("retain"):
+                        _retained[data["retain"]] = data["message"]
+                    await _deliver(data["message"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Backplane: hub connection failed: {e}")
+        _state.update({"writer": None, "connected": False})
+        _set_leader(False)
+        backplane_stats["reconnects"] += 1
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+# --- Redis -------------------------------------------------------------------
+
+async def _close_redis(*connections):
+    """Close Redis clients without hanging on a server that stopped answering."""
+    for connection in connections:
+        close = getattr(connection, "aclose", None) or connection.close
+        try:
+            await asyncio.wait_for(close(), REDIS_TIMEOUT)
+        except Exception as e:
+            print(f"Backplane: closing the Redis connection failed: {e}")
+
+
+async def _redis_loop():
+    while True:
+        client = aioredis.from_url(_settings["redis_url"], socket_connect_timeout=REDIS_TIMEOUT,
+                                   health_check_interval=REDIS_HEALTH_CHECK)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(REDIS_CHANNEL)
+            # Only count as connected once Redis confirmed the subscription, or updates
+            # published in the meantime would be lost
+            confirmation = await pubsub.get_message(timeout=REDIS_TIMEOUT)
+            if not confirmation or confirmation["type"] != "subscribe":
+                raise ConnectionError("Redis did not confirm the subscription")
+            _state.update({"redis": client, "connected": True})
+            print(f"Backplane: connected to Redis at {_settings['redis_url']}")
+            # Offer what we know to a Redis that restarted empty, like workers do for the hub
+            for key, entry in _retained.items():
+                await client.hsetnx(REDIS_RETAINED, key, encode(entry))
+            # Replay in publish order, like the hub does
+            retained = {key.decode("utf-8"): json.loads(raw) for key, raw in (await client.hgetall(REDIS_RETAINED)).items()}
+            _retained.update(retained)
+            for entry in sorted(retained.values(), key=lambda entry: entry["at"]):
+                await _deliver(entry["message"])
+            async for item in pubsub.listen():
+                if item["type"] != "message":
+                    continue
+                data = json.loads(item["data"])
+                if data["origin"] != WORKER_ID:
+                    if data.get("retain"):
+                        # Published between subscribing and reading the hash: the replay delivered it already
+                        if _retained.get(data["retain"], {}).get("at") == data["at"]:
+                            continue
+                        _retained[data["retain"]] = {"at": data["at"], "message": data["message"]}
+                    await _deliver(data["message"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Backplane: Redis connection failed: {e}")
+        finally:
+            _state.update({"redis": None, "connected": False})
+            await _close_redis(pubsub, client)
+        backplane_stats["reconnects"] += 1
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+async def _if_leader_key(client, command):
+    """
+    Run `command(pipeline)` on the leader lock only if this worker holds it.
+    WATCH makes the check and the command atomic: if the lock expired and
+    another worker took it in between, nothing is changed.
+    """
+    async with client.pipeline(transaction=True) as pipe:
+        try:
+            await pipe.watch(REDIS_LEADER)
+            if await pipe.get(REDIS_LEADER) != WORKER_ID.encode("utf-8"):
+                return False
+            pipe.multi()
+            command(pipe)
+            await pipe.execute()
+            return True
+        except WatchError:
+            return False
+
+
+async def _redis_leader_loop():
+    while True:
+        client = _state["redis"]
+        try:
+            if client is None:
+                _set_leader(False)
+            elif await client.set(REDIS_LEADER, WORKER_ID, nx=True, px=LEADER_TTL * 1000):
+                _set_leader(True)
+            else:
+                _set_leader(await _if_leader_key(client, lambda pipe: pipe.pexpire(REDIS_LEADER, LEADER_TTL * 1000)))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Backplane: leader election failed: {e}")
+            _set_leader(False)
+        await asyncio.sleep(LEADER_RENEW)
+
+
+# --- Public API -------------------------------------------------------------
+
+async def start(handler, on_leader_change=None):
+    """
+    Connect to the configured backend. `handler(message)` is awaited for every
+    message published by another process; `on_leader_change(bool)` is called
+    when this process gains or loses the ingest leadership.
+    """
+    _state.update({"handler": handler, "on_leader": on_leader_change})
+    backend = _settings["backend"]
+    if backend == "local":
+        return
+    # Followers until the broker says otherwise
+    _state["leader"] = False
+    if backend == "hub":
+        _state["tasks"].append(asyncio.create_task(_hub_loop()))
+    elif backend == "redis":
+        _state["tasks"].append(asyncio.create_task(_redis_loop()))
+        _state["tasks"].append(asyncio.create_task(_redis_leader_loop()))
+
+
+async def publish(message, retain=None):
+    """
+    Send a message to the other processes. With `retain` the broker keeps
+    it under that key for processes that connect later.
+    """
+    backend = _settings["backend"]
+    if backend == "local":
+        return
+    try:
+        if backend == "hub" and retain:
+            _retained[retain] = message
+        if backend == "hub" and _state["writer"] is not None:
+            _state["writer"].write(_line({"op": "publish", "message": message, "retain": retain}))
+            await _state["writer"].drain()
+        elif backend == "redis" and _state["redis"] is not None:
+            client = _state["redis"]
+            entry = {"at": time.time(), "message": message}
+            await client.publish(REDIS_CHANNEL, encode({"origin": WORKER_ID, "retain": retain, **entry}))
+            if retain:
+                _retained[retain] = entry
+                await client.hset(REDIS_RETAINED, retain, encode(entry))
+        else:
+            print("Backplane: not connected, update not shared with other workers")
+            return
+        backplane_stats["published"] += 1
+    except Exception as e:
+        backplane_stats["errors"] += 1
+        print(f"Backplane: publish failed: {e}")
+
+
+async def stop():
+    # Let another worker take over now instead of after LEADER_TTL
+    if _settings["backend"] == "redis" and _state["leader"] and _state["redis"] is not None:
+        try:
+            await _if_leader_key(_state["redis"], lambda pipe: pipe.delete(REDIS_LEADER))
+        except Exception as e:
+            print(f"Backplane: could not release the leader lock: {e}")
+    tasks = _state["tasks"]
+    _state["tasks"] = []
+    # A cancel that lands while redis-py is inside a timeout can be lost; cancel again until the tasks end
+    while tasks:
+        for task in tasks:
+            task.cancel()
+        _, tasks = await asyncio.wait(tasks, timeout=1)
+    if _state["writer"] is not None:
+        _state["writer"].close()
+    if _state["hub_server"] is not None:
+        _state["hub_server"].close()
+        _state["hub_server"] = None
+
+
+def get_status():
+    return {
+        "backend": _settings["backend"],
+        "worker_id": WORKER_ID,
+        "leader": _state["leader"],
+        "connected": _settings["backend"] == "local" or _state["connected"],
+        "hosting_hub": _state["hub_server"] is not None,
+        **backplane_stats
+    }
+
+
+async def _run_hub(path):
+    server = await serve_hub(path)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the backplane hub for several server workers")
+    parser.add_argument("command", choices=["hub"])
+    parser.add_argument("--path", default=_settings["hub_path"])
+    args = parser.parse_args()
+    if not _acquire_hub_lock(args.path):
+        sys.exit(f"Another hub is already running on {args.path}")
+    try:
+        asyncio.run(_run_hub(args.path))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Per-client cost of broadcasting a live update as the viewer count grows.
+
+Run from the backend folder:
+
+    python benchmarks/bench_broadcast.py [--viewers 1 10 50 200 1000] [--competitors 200] [--repeat 20]
+
+Compares the old per-socket send_json loop (the message is serialized once
+per client, as Starlette's send_json does) with broadcaster.publish, which
+queues one pre-encoded frame for everybody; the time is measured until the
+last client got it. The sockets are in-memory fakes that only turn the text
+into UTF-8 bytes like the ASGI server would, so the numbers are the CPU
+cost of the broadcast itself.
+
+Frame sizes are printed for JSON and MessagePack, raw and compressed the
+way permessage-deflate would (raw deflate of the frame).
+
+A second run adds one viewer that takes --slow-delay seconds per send and
+reports how long the other clients waited for the update with the old
+sequential loop and with the per-connection queues.
+"""
+import os
+import sys
+import time
+import json
+import asyncio
+import argparse
+import contextlib
+import io
+import statistics
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import broadcaster
+from results_parser import parse_results_from_excel
+from workbook_generator import make_workbook
+
+
+class FakeSocket:
+    """Behaves like Starlette's WebSocket for sending."""
+
+    def __init__(self, delay=0):
+        self.sent = 0
+        self.delay = delay
+        self.received_at = None
+
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+    async def send_text(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent += len(text.encode("utf-8"))
+        self.received_at = time.perf_counter()
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+async def per_socket(sockets, msg):
+    for ws in list(sockets):
+        await ws.send_json(msg)
+
+
+async def encode_once(sockets, msg):
+    await broadcaster.publish(sockets, broadcaster.frame(msg), msg["type"])
+
+
+async def measure(func, sockets, msg, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func(sockets, msg)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def fast_clients_wait(func, sockets, msg):
+    """Time until every fast client has the update, with one slow client in the list."""
+    start = time.perf_counter()
+    task = asyncio.create_task(func(sockets, msg))
+    fast = [ws for ws in sockets if not ws.delay]
+    while any(ws.received_at is None or ws.received_at < start for ws in fast):
+        await asyncio.sleep(0.001)
+    waited = max(ws.received_at for ws in fast) - start
+    await task
+    return waited
+
+
+async def run(args, msg):
+    print(f"{'viewers':>8} {'send_json':>12} {'encode once':>12} {'per client':>12} {'per client':>12} {'speedup':>8}")
+    print(f"{'':>8} {'total':>12} {'total':>12} {'send_json':>12} {'encode once':>12}")
+    for count in args.viewers:
+        sockets = dict.fromkeys(FakeSocket() for _ in range(count))
+        old = await measure(per_socket, sockets, msg, args.repeat)
+        new = await measure(encode_once, sockets, msg, args.repeat)
+        print(f"{count:>8} {old * 1000:>10.2f}ms {new * 1000:>10.2f}ms "
+              f"{old / count * 1e6:>10.1f}us {new / count * 1e6:>10.1f}us {old / new:>7.1f}x")
+        for ws in list(sockets):
+            broadcaster.detach(ws)
+
+    count = max(args.viewers)
+    sockets = dict.fromkeys([FakeSocket(delay=args.slow_delay)] + [FakeSocket() for _ in range(count - 1)])
+    old = await fast_clients_wait(per_socket, sockets, msg)
+    new = await fast_clients_wait(encode_once, sockets, msg)
+    print(f"\nOne viewer taking {args.slow_delay}s per send, {count - 1} others: they had the update after "
+          f"{old * 1000:.1f}ms with sequential sends, {new * 1000:.1f}ms with per-connection queues")
+    for ws in list(sockets):
+        broadcaster.detach(ws)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--viewers", type=int, nargs="+", default=[1, 10, 50, 200, 1000])
+    parser.add_argument("--competitors", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--slow-delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        discipline, category, comps = parse_results_from_excel(file_bytes=make_workbook(args.competitors))
+    msg = {"type": "live_update", "data": {"category": category, "discipline": discipline,
+                                            "competitors": comps, "category_complete": False}}
+    if json.loads(broadcaster.encode(msg)) != msg:
+        raise SystemExit("Encoded message does not round-trip")
+
+    encoder = "orjson" if broadcaster.ORJSON_AVAILABLE else "json"
+    print(f"Payload: {len(broadcaster.encode(msg)) / 1024:.1f}KB, {len(comps)} competitors, encoder: {encoder}")
+    frames = {"json": broadcaster.encode(msg).encode("utf-8")}
+    if broadcaster.MSGPACK_AVAILABLE:
+        frames["msgpack"] = broadcaster.encode_msgpack(msg)
+    for name, data in frames.items():
+        deflate = zlib.compressobj(wbits=-15)
+        deflated = deflate.compress(data) + deflate.flush(zlib.Z_SYNC_FLUSH)
+        print(f"  {name:<8} {len(data) / 1024:>6.1f}KB, with permessage-deflate {len(deflated) / 1024:>6.1f}KB")
+    asyncio.run(run(args, msg))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Ingest benchmarks: parse, Graph fetches and the refresh + broadcast cycle.
+
+pytest-benchmark cases (`pip install pytest-benchmark`). The file is not
+named test_*.py, so `python -m pytest backend/tests` leaves it out; run it
+on its own from the repository root:
+
+    python -m pytest backend/benchmarks/bench_ingest.py
+    python -m pytest backend/benchmarks/bench_ingest.py --benchmark-autosave
+    python -m pytest backend/benchmarks/bench_ingest.py --benchmark-compare --benchmark-compare-fail=mean:25%
+
+Graph is replaced by a local HTTP server that serves generated workbooks,
+so the numbers include real socket I/O but no internet. The cases that
+talk to Graph record the KB it sent per call in extra_info.
+"""
+import os
+import sys
+import json
+import asyncio
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+
+import httpx
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+# The `main` and `source` fixtures of the test suite
+from conftest import main, source  # noqa: F401
+import http_client
+import broadcaster
+from results_parser import parse_results_from_excel
+from workbook_generator import make_workbook
+
+SHARE_URL = "https://1drv.ms/x/benchmark"
+DRIVE_ID, ITEM_ID = "bench-drive", "bench-item"
+
+COMPETITORS = 200
+HIDDEN_SHEETS = 5
+OPERATORS = 20
+ROUNDS = 20
+# Every refresh round needs a version that was not parsed before (plus the first fetch and a warmup)
+VERSIONS = ROUNDS + 2
+
+
+def used_range(wb, name):
+    """The usedRange response Graph would send for a sheet."""
+    ws = wb[name]
+    values = [["" if v is None else v for v in row]
+              for row in ws.iter_rows(min_row=ws.min_row, min_col=ws.min_column, values_only=True)]
+    address = (f"'{name}'!{get_column_letter(ws.min_column)}{ws.min_row}:"
+               f"{get_column_letter(ws.max_column)}{ws.max_row}")
+    return {"address": address, "values": values}
+
+
+class FakeGraph:
+    """Workbook versions served by the stand-in server; `current` is the live one."""
+
+    def __init__(self, versions):
+        self.versions = versions
+        self.current = 0
+        self.bytes_sent = 0
+        self.port = None
+        self.lock = threading.Lock()
+
+    def version(self):
+        return self.versions[self.current]
+
+
+def make_handler(graph):
+    class GraphHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; avoid the delayed-ACK stall
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, status, body=b"", content_type="application/json"):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with graph.lock:
+                graph.bytes_sent += len(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.endswith("/workbook/createSession"):
+                return self.send(201, {"id": "bench-session"})
+            self.send(404, {"error": {"code": "itemNotFound"}})
+
+        def do_GET(self):
+            version = graph.version()
+            path = unquote(self.path.split("?")[0])
+            if "/shares/" in path:
+                return self.send(200, {"id": ITEM_ID, "parentReference": {"driveId": DRIVE_ID}})
+            if path == f"/v1.0/drives/{DRIVE_ID}/items/{ITEM_ID}":
+                if self.headers.get("If-None-Match") == version["etag"]:
+                    return self.send(304)
+                return self.send(200, {
+                    "id": ITEM_ID,
+                    "eTag": version["etag"],
+                    "cTag": version["ctag"],
+                    "size": len(version["content"]),
+                    "lastModifiedDateTime": version["modified"],
+                    "@microsoft.graph.downloadUrl": f"https://download.invalid/{ITEM_ID}"
+                })
+            if path == f"/{ITEM_ID}":
+                return self.send(200, version["content"], "application/octet-stream")
+            if "/worksheets/" in path:
+                sheet = path.split("/worksheets/")[1].split("/")[0]
+                if sheet in version["ranges"]:
+                    return self.send(200, version["ranges"][sheet])
+            self.send(404, {"error": {"code": "itemNotFound"}})
+
+    return GraphHandler
+
+
+class LocalTransport(httpx.AsyncHTTPTransport):
+    """Sends every request to the stand-in server instead of its real host."""
+
+    def __init__(self, port):
+        super().__init__()
+        self.port = port
+
+    async def handle_async_request(self, request):
+        request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self.port)
+        return await super().handle_async_request(request)
+
+
+class FakeSocket:
+    """Stands in for an operator WebSocket; counts what would be sent."""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data))
+
+    async def send_text(self, text):
+        self.messages += 1
+        self.bytes += len(text)
+
+    async def send_bytes(self, data):
+        self.messages += 1
+        self.bytes += len(data)
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+def build_versions(count, competitors, hidden_sheets):
+    versions = []
+    for i in range(count):
+        # A different number of scored skaters makes every version distinct
+        content = make_workbook(competitors=competitors, scored=min(competitors, 1 + i), seed=i,
+                                hidden_sheets=hidden_sheets)
+        wb = load_workbook(io.BytesIO(content), data_only=True)
+        versions.append({
+            "content": content,
+            "etag": f'"{{bench-{i}}},1"',
+            "ctag": f'"c:{{bench-{i}}},1"',
+            "modified": f"2025-01-01T10:{i // 60:02d}:{i % 60:02d}Z",
+            "ranges": {name: used_range(wb, name) for name in ("Final results", "Marks")}
+        })
+    return versions
+
+
+@pytest.fixture(scope="module")
+def graph():
+    fake = FakeGraph(build_versions(VERSIONS, COMPETITORS, HIDDEN_SHEETS))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(fake))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake.port = server.server_address[1]
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="module")
+def run(main, graph):
+    """Run a coroutine on the event loop all cases share, with Graph pointed at the stand-in."""
+    loop = asyncio.new_event_loop()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "get_user_token", lambda: "benchmark-token")
+        mp.setitem(http_client._clients, "async", httpx.AsyncClient(
+            transport=LocalTransport(graph.port), timeout=http_client.TIMEOUT, follow_redirects=True))
+        yield loop.run_until_complete
+        loop.run_until_complete(http_client._clients["async"].aclose())
+    loop.close()
+
+
+def measure(benchmark, graph, run, case, setup=None):
+    """Benchmark ROUNDS awaited calls of case(); setup() runs untimed before each."""
+    calls = []
+    sent = graph.bytes_sent
+
+    def target():
+        calls.append(None)
+        return run(case())
+    result = benchmark.pedantic(target, setup=setup, rounds=ROUNDS, warmup_rounds=1)
+    benchmark.extra_info["kb_per_op"] = round((graph.bytes_sent - sent) / len(calls) / 1024, 1)
+    return result
+
+
+def test_parse_results_from_excel(benchmark, graph):
+    result = benchmark(parse_results_from_excel, file_bytes=graph.version()["content"])
+    assert result[2]
+
+
+def test_download(benchmark, main, source, graph, run, monkeypatch):
+    monkeypatch.setattr(main, "RANGE_READS_ENABLED", False)
+    source = main.sources[source]
+    content = measure(benchmark, graph, run, lambda: main.download_latest_excel(SHARE_URL, source=source))
+    assert content == graph.version()["content"]
+
+
+def test_poll_unchanged(benchmark, main, source, graph, run):
+    source = main.sources[source]
+    run(main.download_latest_excel(SHARE_URL, source=source))
+    assert measure(benchmark, graph, run,
+                   lambda: main.download_latest_excel(SHARE_URL, only_if_changed=True, source=source)) is None
+
+
+def test_range_read(benchmark, main, source, graph, run, monkeypatch):
+    monkeypatch.setattr(main, "RANGE_READS_ENABLED", True)
+    source = main.sources[source]
+    result = measure(benchmark, graph, run, lambda: main.fetch_latest_results(SHARE_URL, source=source))
+    assert result == parse_results_from_excel(file_bytes=graph.version()["content"])
+
+
+def test_refresh_and_broadcast(benchmark, main, source, graph, run, monkeypatch):
+    monkeypatch.setattr(main, "RANGE_READS_ENABLED", False)
+    source_id, source = source, main.sources[source]
+    run(main.fetch_latest_results(SHARE_URL, source=source))
+    sockets = [FakeSocket() for _ in range(OPERATORS)]
+
+    async def attach():
+        for ws in sockets:
+            broadcaster.attach(ws, main.connections[source_id]["operator"])
+    run(attach())
+
+    def next_version():
+        graph.current = (graph.current + 1) % len(graph.versions)
+
+    async def refresh_cycle():
+        before = [ws.messages for ws in sockets]
+        await main.refresh_watched_file([source_id])
+        # Broadcasts are queued per connection; wait until every operator has the update
+        while any(ws.messages == count for ws, count in zip(sockets, before)):
+            await asyncio.sleep(0)
+
+    async def detach():
+        for ws in sockets:
+            broadcaster.detach(ws)
+    try:
+        measure(benchmark, graph, run, lambda: asyncio.wait_for(refresh_cycle(), 5), setup=next_version)
+    finally:
+        run(detach())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Compare the column-wise results parser with the original pandas/iterrows one.
+
+Run from the backend folder:
+
+    python benchmarks/bench_results_parser.py [--sizes 50 200 1000] [--repeat 10]
+
+For every size a synthetic workbook is generated, both parsers must return
+identical results, and the median time of the full parse and of the
+table processing stage (Marks + Final results, sheets already read) is
+printed. The legacy parser is the implementation results_parser.py
+replaced and is kept here as the reference; tests/test_results_parser.py
+runs the same comparison with pytest.
+"""
+import os
+import sys
+import time
+import argparse
+import contextlib
+import io
+import statistics
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from openpyxl import load_workbook
+
+import results_parser
+from workbook_generator import make_workbook
+
+
+def legacy_parse(file_bytes):
+    """The pandas based parser with per-row iterrows() loops."""
+    category = None
+    discipline = None
+    wb = load_workbook(filename=BytesIO(file_bytes), data_only=True)
+    sheet = wb["Final results"]
+    skater_points = {}
+    last_skater_name = None
+    if "Marks" in wb.sheetnames:
+        try:
+            marks_df = pd.read_excel(BytesIO(file_bytes), sheet_name="Marks", engine="openpyxl", skiprows=6)
+            marks_df = marks_df.iloc[2:].dropna(how="all")
+            judge_cols = [col for col in marks_df.columns if "Judge" in str(col)]
+            judge_total_cols = []
+            for judge_col in judge_cols:
+                col_idx = list(marks_df.columns).index(judge_col)
+                if col_idx + 2 < len(marks_df.columns):
+                    judge_total_cols.append(marks_df.columns[col_idx + 2])
+            name_col = next((col for col in marks_df.columns if "Name" in str(col)), None)
+            if name_col and len(judge_total_cols) == 3:
+                last_skater_row = None
+                for _, row in marks_df.iterrows():
+                    skater_name = str(row[name_col]).strip() if pd.notna(row[name_col]) else ""
+                    if not skater_name:
+                        continue
+                    has_all_scores = all(pd.notna(row[col]) and float(row[col]) > 0
+                                         for col in judge_total_cols if col in row)
+                    total_points = [float(row[col]) if pd.notna(row[col]) else 0
+                                    for col in judge_total_cols if col in row]
+                    skater_points[skater_name] = sum(total_points)
+                    if has_all_scores:
+                        last_skater_row = row
+                if last_skater_row is not None and name_col in last_skater_row:
+                    last_skater_name = str(last_skater_row[name_col]).strip()
+        except Exception as e:
+            print(f"Error processing Marks sheet: {e}")
+
+    for i in range(1, 10):
+        for j in range(1, 6):
+            v = sheet.cell(row=i, column=j).value
+            if isinstance(v, str) and v.strip().startswith("Category"):
+                category = v.strip().split(" ", 1)[1].strip()
+                if i > 1:
+                    discipline_cell = sheet.cell(row=i - 1, column=j).value
+                    if discipline_cell and isinstance(discipline_cell, str):
+                        discipline = discipline_cell.strip()
+                break
+        if category:
+            break
+
+    df = pd.read_excel(BytesIO(file_bytes), sheet_name="Final results", engine="openpyxl", skiprows=6)
+    df = df.dropna(how="all")
+    df = df.loc[:, ~df.columns.str.startswith("Unnamed")]
+    df = df.dropna(subset=["Name", "Rank", "Judge 1", "Judge 2", "Judge 3"])
+
+    competitors = []
+    for _, r in df.iterrows():
+        try:
+            rank = int(float(r["Rank"])) if pd.notna(r["Rank"]) else 0
+            penalty = int(float(r.get("PEN", 0))) if pd.notna(r.get("PEN")) else 0
+            judge1 = int(float(r["Judge 1"])) if pd.notna(r["Judge 1"]) else 0
+            judge2 = int(float(r["Judge 2"])) if pd.notna(r["Judge 2"]) else 0
+            judge3 = int(float(r["Judge 3"])) if pd.notna(r["Judge 3"]) else 0
+            skater_name = str(r["Name"]).strip()
+            if skater_name in skater_points and skater_points[skater_name] == 0:
+                continue
+            competitors.append({
+                "rank": rank,
+                "name": skater_name,
+                "team": str(r.get("Team", "") or ""),
+                "country": str(r.get("Ctry", "") or ""),
+                "penalty": penalty,
+                "judge1": judge1,
+                "judge2": judge2,
+                "judge3": judge3,
+                "remark": str(r.get("Remark", "") or ""),
+                "last_skater": bool(last_skater_name) and skater_name == last_skater_name
+            })
+        except (ValueError, TypeError) as e:
+            print(f"Error processing row: {e}")
+    return discipline, category, competitors
+
+
+def median_ms(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def process_tables(results_rows, marks_rows):
+    skater_points, last_skater_name = results_parser.parse_marks(marks_rows)
+    return results_parser.parse_competitors(results_rows, skater_points, last_skater_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'competitors':>11}  {'legacy parse':>12}  {'parse':>8}  {'processing':>10}  speedup")
+    for size in args.sizes:
+        content = make_workbook(competitors=size, seed=size)
+        wb = load_workbook(BytesIO(content), read_only=True, data_only=True)
+        results_rows = results_parser.read_sheet_rows(wb[results_parser.RESULTS_SHEET])
+        marks_rows = results_parser.read_sheet_rows(wb[results_parser.MARKS_SHEET])
+        wb.close()
+
+        # The parsers log every skipped skater; keep the table readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = legacy_parse(content)
+            actual = results_parser.parse_results_from_excel(file_bytes=content)
+            if actual != expected:
+                raise SystemExit(f"Results differ for {size} competitors")
+            legacy = median_ms(lambda: legacy_parse(content), args.repeat)
+            full = median_ms(lambda: results_parser.parse_results_from_excel(file_bytes=content), args.repeat)
+            tables = median_ms(lambda: process_tables(results_rows, marks_rows), args.repeat)
+        print(f"{size:>11}  {legacy:>10.1f}ms  {full:>6.1f}ms  {tables:>8.2f}ms  {legacy / full:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
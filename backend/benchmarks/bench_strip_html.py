@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Compare the regex HTML stripping of the rankings scrapers with BeautifulSoup.
+
+Run from the backend folder:
+
+    python benchmarks/bench_strip_html.py [--payload table.json] [--rows 2000] [--repeat 5]
+
+--payload is a recorded World Skate DataTables response (the JSON of a
+ranking table or an athletes.json chunk, e.g. saved from the browser's
+network tab); without it a payload with the same kind of markup is
+generated (linked names, flag images, ranks in spans, &nbsp; entities).
+Every cell must come out the same as with BeautifulSoup;
+tests/test_strip_html.py checks that with pytest, including unknown
+entity names and unusual code points. Printed are the
+median times for stripping every cell one by one with BeautifulSoup (the
+old strip_html), with the new strip_html, and column-wise with
+clean_cells (as fetch_rankings does), and how many cells needed the
+BeautifulSoup fallback.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rankings
+
+COUNTRIES = ["SVK", "CZE", "FRA", "ITA", "POL", "CHN", "ESP", "GER"]
+NAMES = ["NOVÁK Jana", "DUPONT Léa", "ROSSI Marco", "O'BRIEN Seán", "WANG Li", "MÜLLER Jörg"]
+
+
+def generated_payload(rows, seed):
+    """A ranking table response with the markup the World Skate site sends."""
+    rnd = random.Random(seed)
+    data = []
+    for i in range(rows):
+        country = rnd.choice(COUNTRIES)
+        skater_id = 10000 + i
+        movement = rnd.choice(["up", "down", "same"])
+        data.append([
+            f'<span class="rank">{i + 1}</span>',
+            f'<span class="prev {movement}">{i + rnd.randint(-3, 3) or 1}</span>',
+            f"{rnd.randint(100, 999)}.{rnd.randint(0, 99):02d}",
+            f'<a href="/athletes/{skater_id}" class="athlete">{rnd.choice(NAMES).replace(" ", "&nbsp;", 1)} {i}</a>',
+            f'<img class="flag" src="/flags/{country.lower()}.png" alt="{country}"/>&nbsp;{country}',
+            f"<span>{skater_id}</span>",
+            f"<b>{rnd.randint(100, 3000)}</b>"
+        ])
+    return {"data": data}
+
+
+def median_ms(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--payload", help="recorded DataTables JSON response")
+    parser.add_argument("--rows", type=int, default=2000, help="rows of the generated payload")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload, encoding="utf-8") as f:
+            payload = json.load(f)
+    else:
+        payload = generated_payload(args.rows, args.seed)
+    rows = payload["data"]
+    columns = [list(column) for column in zip(*rows)]
+    cells = [str(cell) for row in rows for cell in row]
+
+    mismatches = [cell for cell in cells if rankings.strip_html(cell) != rankings.strip_html_soup(cell)]
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} cells differ from BeautifulSoup, e.g. {mismatches[0]!r}")
+
+    fallbacks = [0]
+    soup = rankings.strip_html_soup
+
+    def counting_soup(html_str):
+        fallbacks[0] += 1
+        return soup(html_str)
+    rankings.strip_html_soup = counting_soup
+    for cell in cells:
+        rankings.strip_html(cell)
+    rankings.strip_html_soup = soup
+
+    legacy = median_ms(lambda: [rankings.strip_html_soup(cell) for cell in cells], args.repeat)
+    fast = median_ms(lambda: [rankings.strip_html(cell) for cell in cells], args.repeat)
+    columnwise = median_ms(lambda: [rankings.clean_cells(column) for column in columns], args.repeat)
+    print(f"{len(rows)} rows, {len(cells)} cells, {fallbacks[0]} needed the BeautifulSoup fallback")
+    print(f"{'BeautifulSoup per cell':<24} {legacy:>9.1f}ms {legacy * 1000 / len(cells):>8.2f}us/cell")
+    print(f"{'strip_html per cell':<24} {fast:>9.1f}ms {fast * 1000 / len(cells):>8.2f}us/cell {legacy / fast:>7.1f}x")
+    print(f"{'clean_cells by column':<24} {columnwise:>9.1f}ms {columnwise * 1000 / len(cells):>8.2f}us/cell "
+          f"{legacy / columnwise:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
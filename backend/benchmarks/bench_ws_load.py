@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+WebSocket fan-out load test: how many displays can the server drive?
+
+Run from the backend folder (the server is started from there, so
+config.json and secrets.json must be in place like for a normal start):
+
+    python benchmarks/bench_ws_load.py [--clients 10 100 500 1000 5000] [--operator-share 0.05]
+                                       [--burst 5] [--rounds 3] [--save load.json] [--baseline load.json]
+
+A server instance is started on a free local port (or use --url with
+--server-pid for one that is already running). For every client count the
+harness opens /ws/public and /ws/operator clients up to that number, then
+fires bursts of updates: each step loads the next generated workbook
+(/load_excel, a live update for the operators) and publishes it
+(/publish, a public update for everybody). The clients answer heartbeats
+and ask for a resync when they see a patch for a version they do not
+have, like the pages do.
+
+Reported per client count:
+- latency from sending the HTTP request to the client receiving the
+  message, p50/p95/p99/max over all deliveries
+- messages delivered of the ones sent; fewer arrive when slow clients
+  skip versions (the broadcaster coalesces to the newest)
+- lost: clients that did not end up at the final version of a stream,
+  and resyncs: patches that did not fit the client's version
+- server CPU (percent of one core while the bursts ran) and RSS
+
+The workbooks come from a fixed seed and the steps run in a fixed order,
+so runs on the same machine are comparable. With --baseline the run exits
+with code 1 if the p95 latency at any client count got more than
+--tolerance slower than in the saved run. All clients run in this one
+process; at several thousand clients its own CPU use shows up in the
+latencies, so compare runs made the same way.
+"""
+import os
+import re
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+from workbook_generator import make_workbook
+
+try:
+    import websockets
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    WEBSOCKETS_AVAILABLE = False
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Messages start with type and seq (and base for patches); reading just that
+# keeps the harness cheap enough to run thousands of clients
+HEADER = re.compile(r'\{"type":"(\w+)","seq":(\d+)(?:,"base":(\d+))?')
+SOURCE = "default"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def raise_fd_limit():
+    """Every client needs a file descriptor here and one in the server."""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def cpu_seconds(pid):
+    """User + system CPU time of a process (Linux /proc)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def percentile(samples, pct):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[pct - 1]
+
+
+class Client:
+    """One simulated display: keeps the last version per stream and when messages arrived."""
+
+    def __init__(self, role, ws):
+        self.role = role
+        self.ws = ws
+        self.streams = ("live", "public") if role == "operator" else ("public",)
+        self.seq = {}
+        self.arrivals = []
+        self.resyncs = 0
+        self.closed = False
+        self.task = None
+
+    async def read(self):
+        try:
+            async for raw in self.ws:
+                now = time.perf_counter()
+                if isinstance(raw, bytes):
+                    raw = raw.decode("utf-8")
+                header = HEADER.match(raw)
+                if header is None:
+                    msg = json.loads(raw)
+                    if msg.get("type") == "ping":
+                        await self.ws.send(json.dumps({"type": "pong", "id": msg["id"]}))
+                    continue
+                kind, seq, base = header.group(1), int(header.group(2)), header.group(3)
+                stream = kind.split("_")[0]
+                if base is not None and self.seq.get(stream) != int(base):
+                    self.resyncs += 1
+                    await self.ws.send(json.dumps({"type": "resync", "stream": stream}))
+                    continue
+                self.seq[stream] = seq
+                self.arrivals.append((stream, seq, now))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.closed = True
+
+
+async def open_clients(url, role, count, batch, deflate):
+    clients = []
+    for start in range(0, count, batch):
+        async def connect():
+            ws = await websockets.connect(f"{url}/ws/{role}?source={SOURCE}&label=load-{role}",
+                                          compression="deflate" if deflate else None,
+                                          max_size=None, open_timeout=60, ping_interval=None)
+            client = Client(role, ws)
+            client.task = asyncio.create_task(client.read())
+            return client
+        clients += await asyncio.gather(*(connect() for _ in range(min(batch, count - start))))
+    return clients
+
+
+async def wait_until(condition, timeout):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+async def stream_seqs(http):
+    streams = (await http.get("/pipeline/metrics", params={"limit": 1})).json()["deltas"]["streams"]
+    return {stream: streams.get(f"{SOURCE}/{stream}", 0) for stream in ("live", "public")}
+
+
+async def run_step(http, clients, workbooks, args, server_pid):
+    """Fire the bursts for the current clients and collect the numbers."""
+    operators = [c for c in clients if c.role == "operator"]
+    latencies, expected, delivered = [], 0, 0
+    cpu_before, wall_before = cpu_seconds(server_pid) if server_pid else None, time.perf_counter()
+    for _ in range(args.rounds):
+        for c in clients:
+            c.arrivals = []
+        base = await stream_seqs(http)
+        sent = {"live": {}, "public": {}}
+        for i in range(args.burst):
+            sent["live"][base["live"] + i + 1] = time.perf_counter()
+            r = await http.post("/load_excel", params={"source": SOURCE}, json={"path": workbooks[i % len(workbooks)]})
+            r.raise_for_status()
+            sent["public"][base["public"] + i + 1] = time.perf_counter()
+            r = await http.post("/publish", params={"source": SOURCE})
+            r.raise_for_status()
+        final = await stream_seqs(http)
+        await wait_until(lambda: all(c.closed or all(c.seq.get(s) == final[s] for s in c.streams) for c in clients),
+                         args.settle)
+        expected += args.burst * (len(clients) + len(operators))
+        for c in clients:
+            for stream, seq, arrived in c.arrivals:
+                if seq in sent[stream]:
+                    delivered += 1
+                    latencies.append((arrived - sent[stream][seq]) * 1000)
+    cpu_after, wall = cpu_seconds(server_pid) if server_pid else None, time.perf_counter() - wall_before
+    final = await stream_seqs(http)
+    latencies.sort()
+    return {
+        "clients": len(clients),
+        "operators": len(operators),
+        "expected": expected,
+        "delivered": delivered,
+        "lost": sum(1 for c in clients if c.closed or any(c.seq.get(s) != final[s] for s in c.streams)),
+        "resyncs": sum(c.resyncs for c in clients),
+        "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+        "max_ms": round(latencies[-1], 2) if latencies else None,
+        "server_cpu_pct": round((cpu_after - cpu_before) / wall * 100, 1) if cpu_before is not None and cpu_after is not None else None,
+        "server_rss_mb": rss_mb(server_pid) if server_pid else None
+    }
+
+
+async def run(args, url, server_pid):
+    print(f"Generating {args.workbooks} workbooks with {args.competitors} competitors...")
+    folder = tempfile.mkdtemp(prefix="bench-ws-")
+    workbooks = []
+    for i in range(args.workbooks):
+        path = os.path.join(folder, f"results-{i}.xlsx")
+        # A different number of scored skaters makes every workbook distinct
+        make_workbook(competitors=args.competitors, scored=min(args.competitors, 1 + i * 3), seed=args.seed, path=path)
+        workbooks.append(path)
+
+    print_header()
+    results, clients = [], []
+    async with httpx.AsyncClient(base_url=url.replace("ws", "http", 1), timeout=60) as http:
+        (await http.post("/load_excel", params={"source": SOURCE}, json={"path": workbooks[0]})).raise_for_status()
+        (await http.post("/publish", params={"source": SOURCE})).raise_for_status()
+        try:
+            for count in sorted(args.clients):
+                want_operators = max(1, round(count * args.operator_share))
+                have_operators = sum(1 for c in clients if c.role == "operator")
+                start = time.perf_counter()
+                clients += await open_clients(url, "operator", max(0, want_operators - have_operators), args.connect_batch, args.deflate)
+                clients += await open_clients(url, "public", max(0, count - len(clients)), args.connect_batch, args.deflate)
+                # Ready once every client has the current version of its streams
+                await wait_until(lambda: all(all(s in c.seq for s in c.streams) for c in clients), args.settle)
+                connect_s = round(time.perf_counter() - start, 2)
+                result = {**await run_step(http, clients, workbooks, args, server_pid), "connect_s": connect_s}
+                results.append(result)
+                print_row(result)
+        finally:
+            await asyncio.gather(*(c.ws.close() for c in clients), return_exceptions=True)
+            for c in clients:
+                c.task.cancel()
+    return results
+
+
+def print_header():
+    print(f"{'clients':>8} {'connect s':>10} {'delivered':>16} {'lost':>5} {'resyncs':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'cpu %':>6} {'rss MB':>7}")
+
+
+def print_row(r):
+    cells = [r["p50_ms"], r["p95_ms"], r["p99_ms"], r["max_ms"]]
+    print(f"{r['clients']:>8} {r['connect_s']:>10} {str(r['delivered']) + '/' + str(r['expected']):>16} "
+          f"{r['lost']:>5} {r['resyncs']:>8} " + " ".join(f"{'-' if v is None else v:>8}" for v in cells) +
+          f" {'-' if r['server_cpu_pct'] is None else r['server_cpu_pct']:>6}"
+          f" {'-' if r['server_rss_mb'] is None else r['server_rss_mb']:>7}")
+
+
+def start_server(port):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            sys.exit("The server exited during startup; check that it starts with uvicorn main:app")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/config", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    sys.exit("The server did not start within 60s")
+
+
+def compare(results, baseline_file, tolerance):
+    with open(baseline_file) as f:
+        baseline = {run["clients"]: run for run in json.load(f)["runs"]}
+    regressions = []
+    for run in results:
+        before = baseline.get(run["clients"])
+        if before and before["p95_ms"] and run["p95_ms"] and run["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{run['clients']} clients: p95 {before['p95_ms']}ms -> {run['p95_ms']}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 100, 500, 1000, 5000])
+    parser.add_argument("--operator-share", type=float, default=0.05, help="share of operator clients (at least one)")
+    parser.add_argument("--burst", type=int, default=5, help="load + publish steps fired back to back")
+    parser.add_argument("--rounds", type=int, default=3, help="bursts per client count")
+    parser.add_argument("--competitors", type=int, default=60)
+    parser.add_argument("--workbooks", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--settle", type=float, default=30, help="seconds to wait for the clients to catch up")
+    parser.add_argument("--connect-batch", type=int, default=100)
+    parser.add_argument("--no-deflate", dest="deflate", action="store_false", help="do not negotiate permessage-deflate")
+    parser.add_argument("--url", help="test a running server (ws://host:port) instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, for CPU/RSS")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare p95 latencies with a saved run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown (default 0.25)")
+    args = parser.parse_args()
+    if not WEBSOCKETS_AVAILABLE:
+        sys.exit("The websockets package is required: pip install websockets")
+
+    raise_fd_limit()
+    server = None
+    if args.url:
+        url, server_pid = args.url.rstrip("/"), args.server_pid
+    else:
+        port = free_port()
+        server = start_server(port)
+        url, server_pid = f"ws://127.0.0.1:{port}", server.pid
+    try:
+        results = asyncio.run(run(args, url, server_pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                       "settings": {k: v for k, v in vars(args).items() if k not in ("save", "baseline", "url", "server_pid")},
+                       "runs": results}, f, indent=2)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Synthetic competition workbooks for benchmarks.
+
+The layout mirrors the result workbooks used at competitions: a
+"Final results" sheet with the category line above the table header on
+row 7, and a "Marks" sheet with one Tech/Art/Total/Place block per judge.
+Hidden filler sheets can be added to imitate the heavy scoring workbooks
+that carry calculation sheets the parser never reads.
+"""
+import random
+from io import BytesIO
+from openpyxl import Workbook
+
+COUNTRIES = ["SVK", "CZE", "FRA", "ITA", "POL", "CHN", None]
+TEAMS = ["Team A", "Team B", "Slalom Club", None]
+REMARKS = ["DNS", "fall", "cone", "DSQ"]
+
+
+def make_workbook(competitors=30, scored=None, seed=0, path=None, judges=3,
+                  partial_rate=0.1, remark_rate=0.2, hidden_sheets=0, hidden_rows=300):
+    """
+    Build a workbook and return its bytes (also saved to `path` if given).
+
+    The first `scored` competitors (default: half) have marks from every
+    judge; of the others, about `partial_rate` already have a score from
+    some of the judges. `remark_rate` of the competitors get a remark.
+    """
+    rnd = random.Random(seed)
+    scored = competitors // 2 if scored is None else scored
+    judge_names = [f"Judge {j + 1}" for j in range(judges)]
+
+    wb = Workbook()
+    results = wb.active
+    results.title = "Final results"
+    results["B4"] = "Classic"
+    results["B5"] = "Category Senior Women"
+    header = ["Rank", "Name", "Ctry", "Team"] + judge_names + ["PEN", "Remark"]
+    for col, title in enumerate(header, start=1):
+        results.cell(row=7, column=col, value=title)
+
+    marks = wb.create_sheet("Marks")
+    marks["A1"] = "Marks"
+    for col, title in enumerate(["No", "Name", "Ctry"], start=1):
+        marks.cell(row=7, column=col, value=title)
+    judge_cols = []
+    for j, judge in enumerate(judge_names):
+        col = 4 + j * 4
+        judge_cols.append(col)
+        marks.cell(row=7, column=col, value=judge)
+        for offset, title in enumerate(["Tech", "Art", "Total", "Place"]):
+            marks.cell(row=8, column=col + offset, value=title)
+
+    for i in range(competitors):
+        name = f"Skater {i:04d}"
+        done = i < scored
+        partial = not done and rnd.random() < partial_rate
+        row = 8 + i
+        results.cell(row=row, column=1, value=i + 1)
+        results.cell(row=row, column=2, value=name)
+        results.cell(row=row, column=3, value=rnd.choice(COUNTRIES))
+        results.cell(row=row, column=4, value=rnd.choice(TEAMS))
+        for j in range(judges):
+            results.cell(row=row, column=5 + j, value=rnd.randint(1, competitors) if done else 0)
+        results.cell(row=row, column=5 + judges, value=rnd.choice([None, 0, 0, 1, 2]))
+        if rnd.random() < remark_rate:
+            results.cell(row=row, column=6 + judges, value=rnd.choice(REMARKS))
+
+        marks.cell(row=10 + i, column=1, value=i + 1)
+        marks.cell(row=10 + i, column=2, value=name)
+        for j, col in enumerate(judge_cols):
+            # A partially scored skater is still waiting for the last judge
+            if done or (partial and j < judges - 1):
+                tech, art = rnd.uniform(5, 30), rnd.uniform(5, 30)
+                marks.cell(row=10 + i, column=col, value=round(tech, 1))
+                marks.cell(row=10 + i, column=col + 1, value=round(art, 1))
+                marks.cell(row=10 + i, column=col + 2, value=round(tech + art, 1))
+
+    for k in range(hidden_sheets):
+        sheet = wb.create_sheet(f"Calc {k + 1}")
+        sheet.sheet_state = "hidden"
+        for r in range(1, hidden_rows + 1):
+            sheet.append([rnd.random() for _ in range(20)])
+
+    buffer = BytesIO()
+    wb.save(buffer)
+    content = buffer.getvalue()
+    if path:
+        with open(path, "wb") as f:
+            f.write(content)
+    return content
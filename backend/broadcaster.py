@@ -0,0 +1,289 @@
+"""
+Encode-once, backpressure-aware fan-out of WebSocket messages.
+
+A message is encoded once per wire format and the frame is handed to every
+subscriber. JSON text frames (orjson when installed; the stdlib fallback
+produces the same compact JSON as Starlette's send_json) are the default.
+Clients can ask for binary MessagePack frames with the "slalom.msgpack"
+subprotocol when the optional msgpack package is installed; clients that
+offer no subprotocol, or only "slalom.json", get JSON. permessage-deflate
+is negotiated by the ASGI server (uvicorn with the websockets package) on
+top of either format. Each connection has its own bounded
+outbound queue drained by its own sender task, so publishing never waits
+on the network and a stalled phone on the venue Wi-Fi cannot hold up the
+arena display.
+
+Slow consumers are handled per connection:
+- Messages of a state stream (live or public) are latest-wins: a newer one
+  replaces the queued older ones, so a slow client skips intermediate
+  states but always ends up with the newest. Since a patch only applies to
+  the version before it, a patch that replaces queued messages is sent as
+  the full snapshot of its version instead.
+- A connection whose queue is full, or whose single send takes longer
+  than SEND_TIMEOUT, is evicted: it is removed from its channel and closed
+  with 1013 (try again later) so the client reconnects and resyncs.
+"""
+import json
+import time
+import asyncio
+from collections import deque
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+if ORJSON_AVAILABLE:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# WebSocket subprotocol -> wire format, in order of preference
+SUBPROTOCOLS = {"slalom.msgpack": "msgpack", "slalom.json": "json"}
+
+MAX_QUEUE = 32           # queued messages per connection before it is evicted
+SEND_TIMEOUT = 10        # seconds one send may take before the connection is evicted
+CLOSE_TIMEOUT = 5
+
+# ws -> connection state
+_connections = {}
+# Close handshakes of evicted sockets in flight
+_closing = set()
+fanout_stats = {"published": 0, "frames_queued": 0, "frames_sent": 0, "coalesced": 0,
+                "evicted": 0, "send_errors": 0}
+
+
+def encode(msg):
+    """Serialize a message to the JSON text sent to clients."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(msg, default=str, option=_ORJSON_OPTIONS).decode("utf-8")
+        except TypeError:
+            # e.g. integers beyond 64 bits; let the stdlib encoder deal with them
+            pass
+    return json.dumps(msg, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def encode_msgpack(msg):
+    return msgpack.packb(msg, default=str, use_bin_type=True)
+
+
+def frame(msg):
+    """A message to publish; the JSON text is encoded now, MessagePack on first use."""
+    return {"msg": msg, "json": encode(msg), "msgpack": None, "json_size": None}
+
+
+def _payload(frame, fmt):
+    if fmt == "msgpack":
+        if frame["msgpack"] is None:
+            frame["msgpack"] = encode_msgpack(frame["msg"])
+        return frame["msgpack"]
+    return frame["json"]
+
+
+def _size(frame, fmt):
+    """Bytes of a frame on the wire (before compression), counted once per frame."""
+    if fmt == "msgpack":
+        return len(frame["msgpack"])
+    if frame.get("json_size") is None:
+        frame["json_size"] = len(frame["json"].encode("utf-8"))
+    return frame["json_size"]
+
+
+def choose_subprotocol(offered):
+    """
+    Pick the subprotocol to accept from the ones a client offered.
+
+    Returns (subprotocol, format); subprotocol is None for clients that
+    offered none we know, and those get JSON.
+    """
+    for subprotocol, fmt in SUBPROTOCOLS.items():
+        if subprotocol in offered and (fmt != "msgpack" or MSGPACK_AVAILABLE):
+            return subprotocol, fmt
+    return None, "json"
+
+
+def attach(ws, channel, fmt="json"):
+    """Start the sender of a connection and add it to its channel (a dict keyed by socket)."""
+    conn = _connections.get(ws)
+    if conn is None:
+        conn = {
+            "ws": ws,
+            "channel": channel,
+            "format": fmt,
+            "queue": deque(),
+            "wakeup": asyncio.Event(),
+            "connected_at": time.time(),
+            "sent": 0,
+            "bytes_sent": 0,
+            "coalesced": 0,
+            "busy_since": None,
+            "task": None
+        }
+        conn["task"] = asyncio.create_task(_sender(conn))
+        _connections[ws] = conn
+    channel[ws] = None
+    return conn
+
+
+def detach(ws):
+    """Stop the sender of a connection and remove it from its channel."""
+    conn = _connections.pop(ws, None)
+    if conn is None:
+        return
+    conn["channel"].pop(ws, None)
+    _release(conn)
+    if conn["task"] is not asyncio.current_task():
+        conn["task"].cancel()
+
+
+def _new_delivery(count):
+    """Tracks one published frame until every recipient has it (or gave up on it)."""
+    delivery = {"remaining": count, "delivered_at": None,
+                "future": asyncio.get_running_loop().create_future()}
+    if count == 0:
+        delivery["future"].set_result(None)
+    return delivery
+
+
+def _done(delivery, sent):
+    if sent:
+        delivery["delivered_at"] = time.time()
+    delivery["remaining"] -= 1
+    if delivery["remaining"] <= 0 and not delivery["future"].done():
+        delivery["future"].set_result(delivery["delivered_at"])
+
+
+def _release(conn):
+    while conn["queue"]:
+        _done(conn["queue"].popleft()["delivery"], sent=False)
+
+
+def _evict(conn, reason):
+    print(f"Evicting slow WebSocket client ({reason}), {len(conn['queue'])} frames queued")
+    fanout_stats["evicted"] += 1
+    close(conn["ws"], 1013, reason)
+
+
+def close(ws, code, reason):
+    """Detach a connection and close it in the background."""
+    detach(ws)
+    task = asyncio.create_task(_close(ws, code, reason))
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+async def _close(ws, code, reason):
+    try:
+        await asyncio.wait_for(ws.close(code=code, reason=reason), CLOSE_TIMEOUT)
+    except Exception:
+        pass
+
+
+def _enqueue(conn, stream, frame, snapshot, delivery):
+    queue = conn["queue"]
+    if stream is not None:
+        superseded = [entry for entry in queue if entry["stream"] == stream]
+        for old in superseded:
+            queue.remove(old)
+            _done(old["delivery"], sent=False)
+            conn["coalesced"] += 1
+            fanout_stats["coalesced"] += 1
+        if superseded and snapshot is not None:
+            frame = snapshot()
+    if len(queue) >= MAX_QUEUE:
+        _done(delivery, sent=False)
+        _evict(conn, "outbound queue full")
+        return
+    queue.append({"stream": stream, "frame": frame, "delivery": delivery})
+    fanout_stats["frames_queued"] += 1
+    conn["wakeup"].set()
+
+
+async def _sender(conn):
+    ws, queue = conn["ws"], conn["queue"]
+    while True:
+        if not queue:
+            conn["wakeup"].clear()
+            await conn["wakeup"].wait()
+            continue
+        entry = queue.popleft()
+        conn["busy_since"] = time.time()
+        try:
+            payload = _payload(entry["frame"], conn["format"])
+            sending = ws.send_bytes(payload) if isinstance(payload, bytes) else ws.send_text(payload)
+            await asyncio.wait_for(sending, SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            _done(entry["delivery"], sent=False)
+            raise
+        except asyncio.TimeoutError:
+            _done(entry["delivery"], sent=False)
+            _evict(conn, f"send took longer than {SEND_TIMEOUT}s")
+            return
+        except Exception:
+            # The socket is gone; its handler will see the disconnect
+            _done(entry["delivery"], sent=False)
+            fanout_stats["send_errors"] += 1
+            detach(ws)
+            return
+        conn["busy_since"] = None
+        conn["sent"] += 1
+        conn["bytes_sent"] += _size(entry["frame"], conn["format"])
+        fanout_stats["frames_sent"] += 1
+        _done(entry["delivery"], sent=True)
+
+
+def publish(sockets, frame, stream=None, snapshot=None):
+    """
+    Queue a frame for every socket of a channel and return at once.
+
+    `stream` names the state stream the message belongs to (latest-wins);
+    `snapshot` returns the frame of the full state for connections where
+    the message replaces queued ones. Sockets that were added to the channel
+    without attach() get a sender on first use. Returns a future that
+    resolves once every recipient has been sent the frame, has skipped it
+    for a newer state, or was evicted; its result is the time of the last
+    successful send (or None).
+    """
+    fanout_stats["published"] += 1
+    delivery = _new_delivery(len(sockets))
+    for ws in list(sockets):
+        _enqueue(attach(ws, sockets), stream, frame, snapshot, delivery)
+    return delivery["future"]
+
+
+def send(ws, msg, stream=None):
+    """Queue one message for one attached socket."""
+    conn = _connections.get(ws)
+    if conn is not None:
+        delivery = _new_delivery(1)
+        _enqueue(conn, stream, frame(msg), None, delivery)
+        return delivery["future"]
+
+
+def get_connection_stats(ws):
+    conn = _connections.get(ws)
+    if conn is None:
+        return {}
+    return {"frames_sent": conn["sent"], "bytes_sent": conn["bytes_sent"], "coalesced": conn["coalesced"],
+            "queued": len(conn["queue"])}
+
+
+def get_fanout_stats():
+    now = time.time()
+    busy = [now - c["busy_since"] for c in _connections.values() if c["busy_since"]]
+    formats = {}
+    for c in _connections.values():
+        formats[c["format"]] = formats.get(c["format"], 0) + 1
+    return {
+        **fanout_stats,
+        "connections": len(_connections),
+        "formats": formats,
+        "queued_frames": sum(len(c["queue"]) for c in _connections.values()),
+        "slowest_send_in_progress": round(max(busy), 3) if busy else None
+    }
@@ -0,0 +1,129 @@
+"""
+Registry of the open WebSocket connections, with heartbeats.
+
+Every operator and public socket is registered with its source, role,
+client address, an optional client label (?label=arena-screen on the
+socket URL) and its connection time. Channels and the registry are dicts
+keyed by the socket, so connecting and disconnecting are O(1).
+
+A dead peer used to be noticed only when a broadcast to it failed, and a
+half-open TCP connection (a phone that left the venue Wi-Fi) could stay
+in the channel for a long time. Now the server sends
+{"type": "ping", "id": n} every HEARTBEAT_INTERVAL seconds and the pages
+answer {"type": "pong", "id": n}. Any message from the client counts as
+a sign of life; a connection that stays silent for HEARTBEAT_TIMEOUT
+seconds is closed with 4408 and removed from its channel.
+
+Only connections that answered at least one ping are closed this way:
+pages cached from before the heartbeats and other clients don't know the
+ping message. They are left to the WebSocket protocol pings uvicorn sends
+(--ws-ping-interval and --ws-ping-timeout, 20 seconds each by default),
+which every WebSocket client answers on its own.
+"""
+import time
+import asyncio
+import broadcaster
+
+HEARTBEAT_INTERVAL = 15  # seconds between pings
+HEARTBEAT_TIMEOUT = 45   # seconds without any message from the client before it is dropped
+
+# ws -> connection info
+_connections = {}
+registry_stats = {"registered": 0, "unregistered": 0, "reaped": 0, "pings": 0, "pongs": 0}
+
+
+def register(ws, source_id, role, fmt="json", label=None):
+    """Record a newly accepted connection."""
+    now = time.time()
+    client = getattr(ws, "client", None)
+    headers = getattr(ws, "headers", {})
+    info = {
+        "source": source_id,
+        "role": role,
+        "label": label,
+        "format": fmt,
+        "client": f"{client.host}:{client.port}" if client else None,
+        "user_agent": headers.get("user-agent"),
+        "connected_at": now,
+        "last_seen": now,
+        "last_ack": None,
+        "rtt": None,
+        "ping_id": 0,
+        "ping_sent_at": None
+    }
+    _connections[ws] = info
+    registry_stats["registered"] += 1
+    return info
+
+
+def unregister(ws):
+    if _connections.pop(ws, None) is not None:
+        registry_stats["unregistered"] += 1
+
+
+def touch(ws):
+    """The client sent something, so it is alive."""
+    info = _connections.get(ws)
+    if info is not None:
+        info["last_seen"] = time.time()
+
+
+def record_pong(ws, msg):
+    info = _connections.get(ws)
+    if info is None:
+        return
+    now = time.time()
+    registry_stats["pongs"] += 1
+    info["last_ack"] = now
+    if msg.get("id") == info["ping_id"] and info["ping_sent_at"]:
+        info["rtt"] = round(now - info["ping_sent_at"], 4)
+
+
+def check_heartbeats(now=None):
+    """Drop connections that answered pings and then went silent, ping the others."""
+    now = now or time.time()
+    for ws, info in list(_connections.items()):
+        if info["last_ack"] is not None and now - info["last_seen"] > HEARTBEAT_TIMEOUT:
+            print(f"Closing {info['role']} connection {info['label'] or info['client']} of '{info['source']}': "
+                  f"no heartbeat for {now - info['last_seen']:.0f}s")
+            registry_stats["reaped"] += 1
+            unregister(ws)
+            broadcaster.close(ws, 4408, "heartbeat timeout")
+            continue
+        info["ping_id"] += 1
+        info["ping_sent_at"] = now
+        registry_stats["pings"] += 1
+        broadcaster.send(ws, {"type": "ping", "id": info["ping_id"]})
+
+
+async def heartbeat_loop():
+    """Background task sending the heartbeats."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            check_heartbeats()
+        except Exception as e:
+            print(f"Error checking WebSocket heartbeats: {e}")
+
+
+def list_connections(source_id=None, role=None):
+    """Live connections with their metadata and send counters."""
+    now = time.time()
+    listed = []
+    for ws, info in _connections.items():
+        if (source_id and info["source"] != source_id) or (role and info["role"] != role):
+            continue
+        listed.append({
+            **{key: value for key, value in info.items() if key not in ("ping_id", "ping_sent_at")},
+            "connected_for": round(now - info["connected_at"], 1),
+            "silent_for": round(now - info["last_seen"], 1),
+            **broadcaster.get_connection_stats(ws)
+        })
+    return listed
+
+
+def get_registry_stats():
+    roles = {}
+    for info in _connections.values():
+        roles[info["role"]] = roles.get(info["role"], 0) + 1
+    return {**registry_stats, "connections": len(_connections), "roles": roles}
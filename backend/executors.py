@@ -0,0 +1,74 @@
+"""
+Executor layer that keeps blocking ingest work off the asyncio event loop.
+
+Blocking calls such as MSAL token lookups run in a small thread pool
+(HTTP itself goes through the async client in http_client.py). Workbook
+parsing runs in a process pool so it does not hold the GIL while WebSocket
+fan-out and API requests are being served. Both pools are bounded: callers
+wait on a semaphore instead of piling up an unbounded queue of pending jobs.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+IO_WORKERS = 4
+PARSE_WORKERS = 2
+
+_pools = {"io": None, "parse": None}
+_slots = {}
+
+
+def _get_pool(kind):
+    """Create the requested pool on first use."""
+    if _pools[kind] is None:
+        if kind == "io":
+            _pools[kind] = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="ingest-io")
+        else:
+            _pools[kind] = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    return _pools[kind]
+
+
+def _get_slots(kind):
+    """Semaphore bounding in-flight jobs for a pool, bound to the running loop."""
+    loop = asyncio.get_running_loop()
+    slots = _slots.get(kind)
+    if slots is None or slots[0] is not loop:
+        limit = IO_WORKERS if kind == "io" else PARSE_WORKERS
+        slots = (loop, asyncio.Semaphore(limit))
+        _slots[kind] = slots
+    return slots[1]
+
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking I/O call (token refresh, file access) in the I/O thread pool."""
+    loop = asyncio.get_running_loop()
+    async with _get_slots("io"):
+        return await loop.run_in_executor(_get_pool("io"), functools.partial(func, *args, **kwargs))
+
+
+async def run_parse(func, *args, **kwargs):
+    """
+    Run a CPU-bound call in the parse process pool.
+
+    `func` and its arguments must be picklable, so pass module-level functions.
+    If the process pool cannot be used (e.g. a worker crashed) the call falls
+    back to the I/O thread pool so ingest keeps working.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    async with _get_slots("parse"):
+        try:
+            return await loop.run_in_executor(_get_pool("parse"), call)
+        except BrokenProcessPool as e:
+            print(f"Parse process pool is broken ({e}), recreating it and parsing in a thread")
+            _pools["parse"] = None
+            return await loop.run_in_executor(_get_pool("io"), call)
+
+
+def shutdown_executors():
+    """Stop both pools; pending jobs are cancelled."""
+    for kind, pool in _pools.items():
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+            _pools[kind] = None
@@ -0,0 +1,149 @@
+"""
+Watch local result workbooks (a file on the laptop or a mounted venue share).
+
+Changes are picked up through OS file notifications (inotify on Linux) when
+the optional `watchfiles` package is installed, otherwise by polling the
+file's mtime and size. Notifications do not work on every network share, so
+in notification mode the file is still stat-checked every few seconds.
+
+Excel saves by writing a temporary file and renaming it over the workbook,
+so the directory is watched rather than the file, and a change is only
+reported once the file has stopped changing for DEBOUNCE seconds.
+"""
+import os
+import asyncio
+import logging
+import time
+
+try:
+    from watchfiles import awatch
+    WATCHFILES_AVAILABLE = True
+    # watchfiles logs every batch of changes at INFO
+    logging.getLogger("watchfiles").setLevel(logging.WARNING)
+except ImportError:
+    WATCHFILES_AVAILABLE = False
+
+POLL_INTERVAL = 1.0      # seconds between stat checks when polling
+SAFETY_INTERVAL = 5.0    # seconds between stat checks in notification mode
+DEBOUNCE = 1.0           # the file must be unchanged this long before it is read
+
+# source id -> watcher info
+_watchers = {}
+
+
+def file_signature(path):
+    """(mtime, size) of a file, or None if it cannot be read."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+async def _wakeups(path, force_polling):
+    """Yield whenever the file may have changed."""
+    if WATCHFILES_AVAILABLE and not force_polling:
+        name = os.path.basename(path)
+        async for _ in awatch(os.path.dirname(path), recursive=False,
+                              watch_filter=lambda change, changed: os.path.basename(changed) == name,
+                              rust_timeout=int(SAFETY_INTERVAL * 1000), yield_on_timeout=True):
+            yield
+    else:
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            yield
+
+
+async def _watch(source_id, path, on_change, force_polling):
+    watcher = _watchers[source_id]
+    handled = file_signature(path)
+    async for _ in _wakeups(path, force_polling):
+        signature = file_signature(path)
+        if signature is None or signature == handled:
+            continue
+        watcher["events"] += 1
+
+        # Wait for the save to finish: the file must look the same across DEBOUNCE
+        while True:
+            await asyncio.sleep(DEBOUNCE)
+            settled = file_signature(path)
+            if settled == signature:
+                break
+            signature = settled
+        if signature is None:
+            continue
+
+        try:
+            # on_change returns False to have the same version offered again
+            # on the next wakeup (e.g. while auto-refresh is switched off)
+            if not await on_change(source_id, path):
+                continue
+            watcher["changes"] += 1
+            watcher["last_change"] = time.time()
+            watcher["error"] = None
+        except Exception as e:
+            # A broken workbook is not retried until it is saved again
+            watcher["error"] = str(e)
+            print(f"Error handling change of {path}: {e}")
+        handled = signature
+
+
+def start_watching(source_id, path, on_change, force_polling=False):
+    """
+    Watch `path` for source `source_id`, replacing any previous watcher.
+
+    `on_change(source_id, path)` is awaited after each settled change.
+    """
+    stop_watching(source_id)
+    path = os.path.abspath(path)
+    mode = "notify" if WATCHFILES_AVAILABLE and not force_polling else "poll"
+    _watchers[source_id] = {
+        "path": path,
+        "mode": mode,
+        "events": 0,
+        "changes": 0,
+        "last_change": None,
+        "error": None,
+        "task": None
+    }
+    task = asyncio.create_task(_watch(source_id, path, on_change, force_polling))
+    task.add_done_callback(lambda t: _on_done(source_id, t))
+    _watchers[source_id]["task"] = task
+    print(f"Watching {path} for source '{source_id}' ({mode} mode)")
+
+
+def _on_done(source_id, task):
+    if task.cancelled():
+        return
+    if task.exception() is not None and source_id in _watchers and _watchers[source_id]["task"] is task:
+        _watchers[source_id]["error"] = str(task.exception())
+        print(f"File watcher for '{source_id}' stopped: {task.exception()}")
+
+
+def stop_watching(source_id):
+    """Stop the watcher of a source, if it has one."""
+    watcher = _watchers.pop(source_id, None)
+    if watcher is not None:
+        watcher["task"].cancel()
+        print(f"Stopped watching {watcher['path']}")
+
+
+def stop_all():
+    for source_id in list(_watchers):
+        stop_watching(source_id)
+
+
+def get_watch_status(source_id):
+    """Watcher summary for status endpoints, or None if the source has no watcher."""
+    watcher = _watchers.get(source_id)
+    if watcher is None:
+        return None
+    return {
+        "path": watcher["path"],
+        "mode": watcher["mode"],
+        "running": not watcher["task"].done(),
+        "events": watcher["events"],
+        "changes": watcher["changes"],
+        "last_change": watcher["last_change"],
+        "error": watcher["error"]
+    }
@@ -11,7 +11,7 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-import requests
+import http_client
 
 # Constants
 SCOPES = [
@@ -207,7 +207,7 @@ def complete_auth_flow(code):
                         'redirect_uri': frontend_redirect_uri,
                         'grant_type': 'authorization_code'
                     }
-                    response = requests.post(token_url, data=data)
+                    response = http_client.request_sync("POST", token_url, data=data)
                     if response.status_code != 200:
                         raise Exception(f"Token request failed: {response.text}")
                     
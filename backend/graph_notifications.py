@@ -0,0 +1,191 @@
+"""
+Microsoft Graph change notification (webhook) subscriptions for OneDrive.
+
+Graph calls our notification URL whenever something in the watched drive
+changes. The notification carries no file content, it only tells the
+server to run its conditional fetch right away instead of waiting for the
+next poll. Subscriptions on drive items expire, so they are renewed well
+before expirationDateTime; if creation or renewal fails the server simply
+keeps polling.
+
+With several workers only the ingest leader creates and renews the
+subscription, but Graph posts to whichever worker the load balancer picks.
+The leader therefore shares the subscription id and its clientState over
+the backplane (get_shared_subscription / adopt_subscription), so every
+worker validates notifications against the same values.
+"""
+import secrets
+from datetime import datetime, timedelta, timezone
+import httpx
+import http_client
+
+GRAPH_URL = "https://graph.microsoft.com/v1.0"
+
+# Graph allows up to ~29 days for driveItem subscriptions; stay well below it
+SUBSCRIPTION_LIFETIME = timedelta(days=2)
+# Renew when less than this is left before expiry
+RENEW_BEFORE = timedelta(hours=6)
+
+subscription_state = {
+    "id": None,
+    "resource": None,
+    "expires_at": None,      # datetime (UTC) of expirationDateTime
+    "client_state": secrets.token_urlsafe(24),
+    "last_notification": None,
+    "notification_count": 0,
+    "error": None
+}
+
+
+def _expiration():
+    return (datetime.now(timezone.utc) + SUBSCRIPTION_LIFETIME).strftime("%Y-%m-%dT%H:%M:%S.0000000Z")
+
+
+def _parse_expiration(value):
+    """Parse Graph's expirationDateTime (UTC, up to 7 fractional digits)."""
+    if not value:
+        return None
+    base = value.rstrip("Z").split(".")[0]
+    return datetime.strptime(base, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+async def create_subscription(token, drive_id, notification_url):
+    """Subscribe to updates of the drive that holds the watched workbook."""
+    resource = f"/drives/{drive_id}/root"
+    body = {
+        "changeType": "updated",
+        "notificationUrl": notification_url,
+        "resource": resource,
+        "expirationDateTime": _expiration(),
+        "clientState": subscription_state["client_state"]
+    }
+    # POST is only retried if the connection failed; a lost response would otherwise leave a duplicate subscription
+    resp = await http_client.request("POST", f"{GRAPH_URL}/subscriptions", json=body,
+                                     headers={"Authorization": f"Bearer {token}"}, timeout=30)
+    resp.raise_for_status()
+    data = resp.json()
+    subscription_state.update({
+        "id": data["id"],
+        "resource": resource,
+        "expires_at": _parse_expiration(data.get("expirationDateTime")),
+        "error": None
+    })
+    print(f"Created Graph subscription {data['id']} for {resource}, expires {data.get('expirationDateTime')}")
+    return data
+
+
+async def renew_subscription(token):
+    """Extend the current subscription's expirationDateTime."""
+    sub_id = subscription_state["id"]
+    # Setting the same absolute expiration again is harmless, so the PATCH may be retried
+    resp = await http_client.request("PATCH", f"{GRAPH_URL}/subscriptions/{sub_id}", idempotent=True,
+                                     json={"expirationDateTime": _expiration()},
+                                     headers={"Authorization": f"Bearer {token}"}, timeout=30)
+    resp.raise_for_status()
+    data = resp.json()
+    subscription_state["expires_at"] = _parse_expiration(data.get("expirationDateTime"))
+    subscription_state["error"] = None
+    print(f"Renewed Graph subscription {sub_id}, expires {data.get('expirationDateTime')}")
+    return data
+
+
+async def delete_subscription(token):
+    """Remove the current subscription, ignoring errors (it may already be gone)."""
+    sub_id = subscription_state["id"]
+    if not sub_id:
+        return
+    try:
+        await http_client.request("DELETE", f"{GRAPH_URL}/subscriptions/{sub_id}",
+                                  headers={"Authorization": f"Bearer {token}"}, timeout=10)
+        print(f"Deleted Graph subscription {sub_id}")
+    except httpx.HTTPError as e:
+        print(f"Warning: Failed to delete Graph subscription {sub_id}: {e}")
+    subscription_state.update({"id": None, "resource": None, "expires_at": None})
+
+
+async def ensure_subscription(token, drive_id, notification_url):
+    """
+    Create, replace or renew the subscription as needed for `drive_id`.
+
+    Returns True if a valid subscription is in place afterwards.
+    """
+    try:
+        resource = f"/drives/{drive_id}/root"
+        if subscription_state["id"] and subscription_state["resource"] != resource:
+            await delete_subscription(token)
+        if not subscription_state["id"]:
+            await create_subscription(token, drive_id, notification_url)
+        elif subscription_state["expires_at"] - datetime.now(timezone.utc) < RENEW_BEFORE:
+            try:
+                await renew_subscription(token)
+            except httpx.HTTPStatusError as e:
+                # Expired or deleted on Graph's side, start over
+                print(f"Renewal failed ({e}), creating a new subscription")
+                subscription_state["id"] = None
+                await create_subscription(token, drive_id, notification_url)
+        return True
+    except Exception as e:
+        subscription_state["error"] = str(e)
+        print(f"Graph subscription unavailable, falling back to polling: {e}")
+        return False
+
+
+def is_active():
+    """True while a subscription exists and has not expired."""
+    expires_at = subscription_state["expires_at"]
+    return bool(subscription_state["id"] and expires_at and expires_at > datetime.now(timezone.utc))
+
+
+def accept_notifications(payload):
+    """
+    Validate a notification payload and return how many notifications belong to us.
+
+    Notifications with a foreign subscriptionId or wrong clientState are ignored.
+    """
+    accepted = 0
+    for item in payload.get("value", []):
+        if item.get("clientState") != subscription_state["client_state"]:
+            print("Ignoring Graph notification with invalid clientState")
+            continue
+        if subscription_state["id"] and item.get("subscriptionId") != subscription_state["id"]:
+            continue
+        accepted += 1
+    if accepted:
+        subscription_state["last_notification"] = datetime.now(timezone.utc).isoformat()
+        subscription_state["notification_count"] += accepted
+    return accepted
+
+
+def get_shared_subscription():
+    """The subscription as the other workers need it to validate notifications."""
+    expires_at = subscription_state["expires_at"]
+    return {
+        "id": subscription_state["id"],
+        "resource": subscription_state["resource"],
+        "client_state": subscription_state["client_state"],
+        "expires_at": expires_at.isoformat() if expires_at else None
+    }
+
+
+def adopt_subscription(shared):
+    """Use the subscription that another worker (the ingest leader) created or renewed."""
+    expires_at = shared.get("expires_at")
+    subscription_state.update({
+        "id": shared.get("id"),
+        "resource": shared.get("resource"),
+        "client_state": shared.get("client_state") or subscription_state["client_state"],
+        "expires_at": datetime.fromisoformat(expires_at) if expires_at else None
+    })
+
+
+def get_subscription_status():
+    """Summary of the subscription for status endpoints."""
+    expires_at = subscription_state["expires_at"]
+    return {
+        "active": is_active(),
+        "subscription_id": subscription_state["id"],
+        "expires_at": expires_at.isoformat() if expires_at else None,
+        "last_notification": subscription_state["last_notification"],
+        "notification_count": subscription_state["notification_count"],
+        "error": subscription_state["error"]
+    }
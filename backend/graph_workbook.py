@@ -0,0 +1,147 @@
+"""
+Range-limited reads of result workbooks through the Graph workbook API.
+
+Instead of downloading the whole .xlsx, only the used ranges of the sheets
+the parser needs are requested as JSON. Excel Online keeps the workbook
+open in a session that is reused across polls, so later reads do not pay
+for opening the file again. Sessions are created without persistChanges
+(we only read) and are replaced when Graph has dropped them after a few
+minutes of inactivity.
+"""
+import time
+import json
+import hashlib
+from urllib.parse import quote
+import httpx
+import http_client
+from results_parser import trim_rows
+
+GRAPH_URL = "https://graph.microsoft.com/v1.0"
+
+# Graph closes idle sessions after about five minutes; start a new one before that
+SESSION_IDLE_TIMEOUT = 240
+# Error codes Graph returns when a session id is no longer valid
+SESSION_ERRORS = {"InvalidSessionNotFound", "InvalidSession", "SessionNotFound"}
+
+# (drive_id, item_id) -> {"id", "created", "last_used"}
+_sessions = {}
+range_stats = {"reads": 0, "bytes": 0, "sessions_created": 0, "session_errors": 0, "fallbacks": 0, "last_read": None}
+
+
+class SessionExpired(Exception):
+    pass
+
+
+def _workbook_url(drive_id, item_id):
+    return f"{GRAPH_URL}/drives/{drive_id}/items/{item_id}/workbook"
+
+
+async def _create_session(token, drive_id, item_id):
+    resp = await http_client.request("POST", f"{_workbook_url(drive_id, item_id)}/createSession",
+                                     json={"persistChanges": False},
+                                     headers={"Authorization": f"Bearer {token}"}, timeout=30)
+    resp.raise_for_status()
+    session = {"id": resp.json()["id"], "created": time.time(), "last_used": time.time()}
+    _sessions[(drive_id, item_id)] = session
+    range_stats["sessions_created"] += 1
+    print(f"Opened workbook session for item {item_id}")
+    return session
+
+
+async def get_session(token, drive_id, item_id):
+    """Return a live workbook session for the item, creating one if needed."""
+    session = _sessions.get((drive_id, item_id))
+    if session is None or time.time() - session["last_used"] > SESSION_IDLE_TIMEOUT:
+        session = await _create_session(token, drive_id, item_id)
+    return session
+
+
+def drop_session(drive_id, item_id):
+    _sessions.pop((drive_id, item_id), None)
+
+
+def column_index(letters):
+    """Zero-based column index for an A1-style column name."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter.upper()) - ord("A") + 1
+    return index - 1
+
+
+def range_to_rows(address, values):
+    """
+    Place a range's values at their sheet position (row 1, column A first).
+
+    `address` is e.g. "'Final results'!B4:I30". Empty cells come back from
+    Graph as "" and become None, as they do when reading the file itself.
+    """
+    top_left = address.rsplit("!", 1)[-1].split(":")[0].replace("$", "")
+    letters = "".join(c for c in top_left if c.isalpha())
+    first_row = int(top_left[len(letters):])
+    first_col = column_index(letters)
+    rows = [[] for _ in range(first_row - 1)]
+    for values_row in values:
+        rows.append([None] * first_col + [None if v == "" else v for v in values_row])
+    return trim_rows(rows)
+
+
+async def _read_used_range(token, drive_id, item_id, sheet, session):
+    url = (f"{_workbook_url(drive_id, item_id)}/worksheets/{quote(sheet, safe='')}"
+           "/usedRange(valuesOnly=true)?$select=address,values")
+    resp = await http_client.request("GET", url, headers={
+        "Authorization": f"Bearer {token}",
+        "workbook-session-id": session["id"]
+    }, timeout=30)
+    if resp.status_code in (400, 404):
+        try:
+            code = resp.json()["error"]["code"]
+        except Exception:
+            code = ""
+        if code in SESSION_ERRORS:
+            raise SessionExpired(code)
+        if resp.status_code == 404:
+            return None
+    resp.raise_for_status()
+    session["last_used"] = time.time()
+    range_stats["bytes"] += len(resp.content)
+    data = resp.json()
+    return range_to_rows(data["address"], data["values"])
+
+
+async def read_sheets(token, drive_id, item_id, sheets):
+    """
+    Read the used ranges of `sheets` and return {sheet: rows}.
+
+    A sheet that does not exist maps to None. An expired session is
+    replaced once; any other error is raised so the caller can fall back
+    to downloading the file.
+    """
+    for attempt in range(2):
+        session = await get_session(token, drive_id, item_id)
+        try:
+            result = {}
+            # Sequential on purpose: one session serves one request at a time
+            for sheet in sheets:
+                result[sheet] = await _read_used_range(token, drive_id, item_id, sheet, session)
+            range_stats["reads"] += 1
+            range_stats["last_read"] = time.time()
+            return result
+        except SessionExpired as e:
+            range_stats["session_errors"] += 1
+            drop_session(drive_id, item_id)
+            if attempt:
+                raise
+            print(f"Workbook session expired ({e}), opening a new one")
+        except httpx.HTTPError:
+            drop_session(drive_id, item_id)
+            raise
+
+
+def rows_hash(sheet_rows):
+    """Stable digest of range contents, used like the content hash of a download."""
+    encoded = json.dumps(sheet_rows, sort_keys=True, default=str).encode("utf-8")
+    return "ranges:" + hashlib.sha256(encoded).hexdigest()
+
+
+def get_range_status():
+    return {**range_stats, "open_sessions": len(_sessions)}
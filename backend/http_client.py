@@ -0,0 +1,131 @@
+"""
+Application-wide HTTP clients for Graph, World Skate and generic URL loads.
+
+All outbound requests go through one pooled async client (and a sync twin
+for code that runs in worker threads, such as the rankings scrapers), so
+connections are kept alive per host instead of paying a TLS handshake on
+every poll. HTTP/2 is used when the optional `h2` package is installed.
+
+`request()` / `request_sync()` add a retry policy on top: connection errors,
+timeouts and 429/502/503/504 responses are retried with exponential backoff,
+honouring Retry-After when the server sends one. Only idempotent methods
+are retried, since a retried POST or PATCH whose first response was lost
+could repeat its side effect; callers pass idempotent=True for calls that
+are safe to repeat anyway. A connection that failed before the request was
+sent is retried for every method.
+"""
+import asyncio
+import itertools
+import time
+import httpx
+
+try:
+    import h2  # noqa: F401 - only needed to enable HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+TIMEOUT = httpx.Timeout(15.0, connect=10.0, read=60.0)
+LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=120)
+
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5       # seconds, doubled on every attempt
+MAX_RETRY_AFTER = 30     # never sleep longer than this on a Retry-After header
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Failures that happen before the request reaches the server
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+_clients = {"async": None, "sync": None}
+
+
+def get_async_client():
+    """Return the shared async client, creating it on first use."""
+    if _clients["async"] is None or _clients["async"].is_closed:
+        _clients["async"] = httpx.AsyncClient(http2=HTTP2_AVAILABLE, timeout=TIMEOUT, limits=LIMITS,
+                                              follow_redirects=True)
+    return _clients["async"]
+
+
+def get_sync_client():
+    """Return the shared sync client for code running outside the event loop."""
+    if _clients["sync"] is None or _clients["sync"].is_closed:
+        _clients["sync"] = httpx.Client(http2=HTTP2_AVAILABLE, timeout=TIMEOUT, limits=LIMITS,
+                                        follow_redirects=True)
+    return _clients["sync"]
+
+
+def retry_delay(attempt, response=None):
+    """Seconds to wait before the next attempt, preferring the server's Retry-After."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), MAX_RETRY_AFTER)
+    return BACKOFF_BASE * (2 ** attempt)
+
+
+def next_retry(method, url, attempt, retries, idempotent, response=None, error=None):
+    """
+    Seconds to wait before sending a request again, or None if the response
+    (or error) is final: the attempts are used up, the status is not worth
+    retrying, or the request may have reached the server and is not safe to
+    repeat. Shared by request() and request_sync().
+    """
+    if response is not None and response.status_code not in RETRY_STATUSES:
+        return None
+    if attempt >= retries:
+        return None
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    if not idempotent and not isinstance(error, NOT_SENT_ERRORS):
+        return None
+    delay = retry_delay(attempt, response)
+    if response is not None:
+        print(f"{method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+    else:
+        print(f"{method} {url} failed ({error.__class__.__name__}), retrying in {delay:.1f}s")
+    return delay
+
+
+async def request(method, url, retries=MAX_RETRIES, idempotent=None, **kwargs):
+    """Send a request with the shared async client and the retry policy."""
+    client = get_async_client()
+    for attempt in itertools.count():
+        try:
+            response = await client.request(method, url, **kwargs)
+        except (httpx.TransportError, httpx.TimeoutException) as e:
+            delay = next_retry(method, url, attempt, retries, idempotent, error=e)
+            if delay is None:
+                raise
+        else:
+            delay = next_retry(method, url, attempt, retries, idempotent, response=response)
+            if delay is None:
+                return response
+        await asyncio.sleep(delay)
+
+
+def request_sync(method, url, retries=MAX_RETRIES, idempotent=None, **kwargs):
+    """Send a request with the shared sync client and the retry policy."""
+    client = get_sync_client()
+    for attempt in itertools.count():
+        try:
+            response = client.request(method, url, **kwargs)
+        except (httpx.TransportError, httpx.TimeoutException) as e:
+            delay = next_retry(method, url, attempt, retries, idempotent, error=e)
+            if delay is None:
+                raise
+        else:
+            delay = next_retry(method, url, attempt, retries, idempotent, response=response)
+            if delay is None:
+                return response
+        time.sleep(delay)
+
+
+async def close_clients():
+    """Close both shared clients and their connection pools."""
+    if _clients["async"] is not None:
+        await _clients["async"].aclose()
+        _clients["async"] = None
+    if _clients["sync"] is not None:
+        _clients["sync"].close()
+        _clients["sync"] = None
@@ -6,19 +6,52 @@ import asyncio
 import platform
 from datetime import datetime
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, BackgroundTasks, Query, Request, Response
-from fastapi.responses import JSONResponse, RedirectResponse, FileResponse, HTMLResponse
+from fastapi.responses import JSONResponse, RedirectResponse, FileResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
-import pandas as pd
-from io import BytesIO
-from openpyxl import load_workbook
-import requests
-import msal
+import httpx
 # Import the Google Sheets module
 from google_sheets import initiate_auth_flow, complete_auth_flow, get_credentials, fetch_spreadsheet_data, parse_registration_data
+# Import the streaming results workbook parser
+from results_parser import parse_results_from_excel, parse_results_from_rows, RESULTS_SHEET, MARKS_SHEET
+# Import the executor layer for blocking ingest work
+from executors import run_io, run_parse, shutdown_executors
+# Import Graph change notification (webhook) support
+import graph_notifications
+# Import the shared pooled HTTP client
+import http_client
+# Import the content-addressed workbook cache
+import workbook_cache
+# Import the adaptive refresh schedule
+import refresh_scheduler
+# Import the local workbook file watcher
+import file_watcher
+# Import the long-lived MSAL client / token manager
+import token_manager
+# Import range-limited reads through the Graph workbook API
+import graph_workbook
+# Import per-stage latency tracing of the refresh pipeline
+import pipeline_metrics
+# Import encode-once WebSocket broadcasting
+import broadcaster
+# Import sequence-numbered state diffs for live/public updates
+import state_deltas
+
+# Import the pub/sub backplane that shares updates between workers
+import backplane
+
+# Import the cacheable public snapshot and Server-Sent Events feed
+import public_feed
+
+# Import the registry of open WebSocket connections and their heartbeats
+import connection_registry
+
+# Import the in-memory index of the latest rankings
+import rankings_index
+
 # Import rankings module
-from rankings import fetch_rankings, get_latest_rankings_folder, format_date_for_folder, get_discipline_file_path, get_download_progress, fetch_skater_database, get_skater_db_progress
-import csv
+from rankings import fetch_rankings, get_latest_rankings_folder, format_date_for_folder, get_download_progress, fetch_skater_database, get_skater_db_progress
 from bs4 import BeautifulSoup
 
 # Load configuration
@@ -46,6 +79,25 @@ os.makedirs(STATIC_DIR, exist_ok=True)
 AUTHORITY = "https://login.microsoftonline.com/common"
 SCOPES = ["Files.Read", "Files.Read.All"]
 
+# Graph change notifications (push mode); polling stays as a slow fallback
+PUSH_SETTINGS = config.get("graph_notifications", {})
+PUSH_ENABLED = bool(PUSH_SETTINGS.get("enabled") and PUSH_SETTINGS.get("notification_url"))
+PUSH_FALLBACK_INTERVAL = PUSH_SETTINGS.get("fallback_interval", 60)
+
+# Read only the used ranges of the result sheets instead of downloading the file
+RANGE_READS_ENABLED = bool(config.get("graph_ranges", {}).get("enabled", False))
+
+# Local workbook watching; force_polling is needed on shares without change notifications
+WATCH_FORCE_POLLING = bool(config.get("file_watcher", {}).get("force_polling", False))
+
+# Cache lifetime of the public snapshot document for browsers and proxies
+PUBLIC_FEED_SETTINGS = config.get("public_feed", {})
+PUBLIC_CACHE_CONTROL = (f"public, max-age={PUBLIC_FEED_SETTINGS.get('max_age', 2)}, "
+                        f"stale-while-revalidate={PUBLIC_FEED_SETTINGS.get('stale_while_revalidate', 10)}")
+
+# Pub/sub between server processes; "local" keeps everything in this process
+backplane.configure(config.get("backplane", {}))
+
 # FastAPI app
 app = FastAPI()
 
@@ -252,22 +304,91 @@ state = {
     "background_url": None,
     "last_file_check": 0,    # timestamp of last file check
     "last_modified": None,   # last modified timestamp of the file
+    "etag": None,            # Graph eTag of the last fetched item version
+    "ctag": None,            # Graph cTag (content tag) of the last downloaded content
+    "content_hash": None,    # SHA-256 of the last downloaded content
     "auto_refresh_enabled": True, # enable/disable auto refresh
-    "auto_refresh_interval": 5   # seconds between checks
+    "auto_refresh_interval": 5,  # seconds between checks (fixed mode, and the back-off start)
+    "auto_refresh_adaptive": True,    # poll fast while the file changes, back off while idle
+    "auto_refresh_min_interval": 2,   # seconds between checks while results are coming in
+    "auto_refresh_max_interval": 60,  # longest back-off while nothing changes
+    "schedule": refresh_scheduler.new_schedule(5)
 }
 if os.path.exists(BACKGROUND_IMAGE_PATH):
     # Use the frontend path format for the background URL
     state["background_url"] = f"/backgrounds/{DEFAULT_BACKGROUND_NAME}"
 
-operator_connections = []
-public_connections = []
+# Channels are dicts keyed by socket (ordered sets); see connection_registry
+operator_connections = {}
+public_connections = {}
+
+# Watched workbooks. The default source is `state` itself; more sources
+# (another rink, Classic and Battle in parallel) can be added via /sources.
+# Each source has its own live/public state and its own WebSocket channels.
+DEFAULT_SOURCE = "default"
+sources = {DEFAULT_SOURCE: state}
+connections = {DEFAULT_SOURCE: {"operator": operator_connections, "public": public_connections}}
+
+
+def new_source():
+    """Create the per-workbook part of the state for an additional source."""
+    return {
+        "current_file": None,
+        "drive_id": None,
+        "item_id": None,
+        "live": {"category": None, "discipline": None, "competitors": [], "category_complete": False},
+        "public": {"category": None, "discipline": None, "competitors": [], "category_complete": False, "message": "", "display_mode": "results"},
+        "last_file_check": 0,
+        "schedule": refresh_scheduler.new_schedule(state["auto_refresh_interval"]),
+        "last_modified": None,
+        "etag": None,
+        "ctag": None,
+        "content_hash": None
+    }
+
+
+def add_source(source_id):
+    """Register a new watched workbook source (no-op if it exists)."""
+    if source_id not in sources:
+        sources[source_id] = new_source()
+        connections[source_id] = {"operator": {}, "public": {}}
+        print(f"Added source '{source_id}'")
+    return sources[source_id]
+
+
+def remove_source(source_id):
+    """Forget a source; its WebSocket lists are dropped with it."""
+    file_watcher.stop_watching(source_id)
+    sources.pop(source_id, None)
+    connections.pop(source_id, None)
+    state_deltas.forget(source_id)
+    public_feed.forget(source_id)
+    print(f"Removed source '{source_id}'")
+
+
+def get_refresh_settings():
+    """Auto-refresh settings in the form refresh_scheduler expects."""
+    return {
+        "adaptive": state["auto_refresh_adaptive"],
+        "interval": state["auto_refresh_interval"],
+        "min_interval": state["auto_refresh_min_interval"],
+        "max_interval": state["auto_refresh_max_interval"]
+    }
+
 
-# Authentication state
-auth_state = {"flow": None, "token": None, "expires_at": 0, "is_authenticated": False}
+def unknown_source(source_id):
+    return JSONResponse(status_code=404, content={"error": f"Unknown source '{source_id}'"})
+
+# Authentication state (the token itself lives in token_manager)
+auth_state = {"flow": None, "is_authenticated": False}
+token_manager.configure(secrets["microsoft"]["client_id"], AUTHORITY, SCOPES, TOKEN_CACHE_FILE)
 
 # Background tasks
 background_tasks = set()
 
+# Set by the Graph webhook to wake check_file_updates immediately
+file_changed_event = asyncio.Event()
+
 # Registration state
 reg_state = {
     "current_sheet_url": None,
@@ -275,80 +396,19 @@ reg_state = {
     "skaters": []
 }
 
-def load_token_cache():
-    """Load the token cache from base64-encoded JSON file if it exists."""
-    print(f"Attempting to load token cache from: {TOKEN_CACHE_FILE}")
-    if not os.path.exists(TOKEN_CACHE_FILE):
-        print("Token cache file does not exist")
-        return None
-    try:
-        encoded = open(TOKEN_CACHE_FILE, 'r').read()
-        decoded = base64.b64decode(encoded).decode('utf-8')
-        cache = msal.SerializableTokenCache()
-        cache.deserialize(decoded)
-        print("Successfully loaded token cache")
-        return cache
-    except Exception as e:
-        print(f"Failed to load token cache: {e}")
-        return None
-
-
-def save_token_cache(cache):
-    """Save the token cache to base64-encoded JSON file only if we have a valid token."""
-    try:
-        # Check if we have any accounts in the cache
-        accounts = cache.find(msal.TokenCache.CredentialType.ACCOUNT)
-        if not accounts:
-            print("No accounts in cache, skipping save")
-            return
-
-        print(f"Attempting to save token cache to: {TOKEN_CACHE_FILE}")
-        serialized = cache.serialize()
-        encoded = base64.b64encode(serialized.encode('utf-8')).decode('utf-8')
-        with open(TOKEN_CACHE_FILE, 'w') as f:
-            f.write(encoded)
-        print("Successfully saved token cache")
-    except Exception as e:
-        print(f"Failed to save token cache: {e}")
-
-
 def get_user_token():
     """Get an access token using device code flow."""
-    global auth_state
-    now = time.time()
-    if auth_state["token"] and now < auth_state["expires_at"]:
-        print("Using cached token from memory")
-        return auth_state["token"]
+    # Normally the background refresh keeps a valid token in memory
+    token = token_manager.cached_token()
+    if token:
+        return token
 
     print("No valid token in memory, attempting to load from cache")
-    cache = load_token_cache() or msal.SerializableTokenCache()
-    client = msal.PublicClientApplication(
-        secrets["microsoft"]["client_id"],
-        authority=AUTHORITY,
-        token_cache=cache
-    )
-
-    accounts = client.get_accounts()
-    if accounts:
-        print(f"Found {len(accounts)} accounts in token cache")
-        try:
-            result = client.acquire_token_silent(SCOPES, account=accounts[0])
-            if result and "access_token" in result:
-                print("Successfully acquired token silently")
-                auth_state.update({
-                    "token": result["access_token"],
-                    "expires_at": now + result.get("expires_in", 3600),
-                    "is_authenticated": True
-                })
-                save_token_cache(cache)  # Only save if we got a valid token
-                return result["access_token"]
-            else:
-                print("Silent token acquisition failed")
-                if "error" in result:
-                    print(f"Error: {result['error']}")
-                    print(f"Error description: {result.get('error_description', 'No description')}")
-        except Exception as e:
-            print(f"Error during silent token acquisition: {e}")
+    token = token_manager.acquire_silent()
+    if token:
+        print("Successfully acquired token silently")
+        auth_state["is_authenticated"] = True
+        return token
 
     if auth_state["flow"]:
         print("Attempting to complete device flow")
@@ -356,7 +416,7 @@ def get_user_token():
             # Check if the flow has expired
             flow_expiry = auth_state["flow"].get("expires_in", 60)  # Default 60 seconds
             flow_start = auth_state["flow"].get("_start_time", 0)
-            time_elapsed = now - flow_start
+            time_elapsed = time.time() - flow_start
             print(f"Flow started {time_elapsed:.1f} seconds ago, expires in {flow_expiry} seconds")
             
             if time_elapsed > flow_expiry:
@@ -364,18 +424,12 @@ def get_user_token():
                 auth_state["flow"] = None
                 raise Exception("Device code has expired. Please initiate a new authentication flow.")
 
-            result = client.acquire_token_by_device_flow(auth_state["flow"])
+            result = token_manager.acquire_by_device_flow(auth_state["flow"])
             print(f"Device flow result: {json.dumps(result, indent=2)}")
             
             if result and "access_token" in result:
                 print("Successfully acquired token through device flow")
-                auth_state.update({
-                    "token": result["access_token"],
-                    "expires_at": now + result.get("expires_in", 3600),
-                    "is_authenticated": True,
-                    "flow": None
-                })
-                save_token_cache(cache)  # Only save if we got a valid token
+                auth_state.update({"is_authenticated": True, "flow": None})
                 return result["access_token"]
             else:
                 print("Device flow token acquisition failed")
@@ -396,98 +450,121 @@ def get_user_token():
     raise Exception("Not authenticated. Please initiate /auth/initiate")
 
 
-def cleanup_debug_files(keep_count=2):
-    """Keep only the most recent debug Excel files."""
-    try:
-        files = [f for f in os.listdir(BASE_DIR) if f.startswith("debug_excel_") and f.endswith(".xlsx")]
-        if len(files) > keep_count:
-            files.sort(reverse=True)
-            for old in files[keep_count:]:
-                os.remove(os.path.join(BASE_DIR, old))
-                print(f"Removed old debug file: {old}")
-    except Exception as e:
-        print(f"Warning: Failed to cleanup debug files: {e}")
-
-
-def resolve_drive_item_ids(share_url: str):
+async def resolve_drive_item_ids(share_url: str):
     """Resolve and cache driveId and itemId from a 1drv.ms sharing URL."""
-    token = get_user_token()
+    token = await run_io(get_user_token)
     b64 = base64.urlsafe_b64encode(share_url.encode('utf-8')).decode().rstrip('=')
     share_id = f"u!{b64}"
     meta_url = f"https://graph.microsoft.com/v1.0/shares/{share_id}/driveItem?$select=id,parentReference"
     headers = {"Authorization": f"Bearer {token}"}
     print(f"Resolving drive and item IDs via: {meta_url}")
-    resp = requests.get(meta_url, headers=headers)
+    resp = await http_client.request("GET", meta_url, headers=headers)
     resp.raise_for_status()
     data = resp.json()
     drive_id = data["parentReference"]["driveId"]
     item_id = data["id"]
     print(f"Resolved driveId={drive_id}, itemId={item_id}")
-    state.update({"drive_id": drive_id, "item_id": item_id})
     return drive_id, item_id
 
 
-def download_latest_excel(share_url: str):
+async def get_item_metadata(share_url: str, only_if_changed: bool, source: dict):
     """
-    Download the latest Excel content from OneDrive via Graph, bypassing caching.
+    Fetch the watched item's metadata, or None if its content has not changed.
+
+    With only_if_changed=True the request is conditional on the last seen
+    eTag, and a metadata-only change (same cTag) also counts as unchanged.
+    Returns (token, metadata).
     """
-    token = get_user_token()
-    if state.get("current_file") != share_url:
-        state["current_file"] = share_url
-        state["drive_id"], state["item_id"] = resolve_drive_item_ids(share_url)
-    
-    # Use the drive item endpoint with select parameter to get latest metadata
-    meta_url = f"https://graph.microsoft.com/v1.0/drives/{state['drive_id']}/items/{state['item_id']}?select=id,lastModifiedDateTime,size"
+    token = await run_io(get_user_token)
+    if source.get("current_file") != share_url:
+        source["current_file"] = share_url
+        with pipeline_metrics.span("resolve"):
+            source["drive_id"], source["item_id"] = await resolve_drive_item_ids(share_url)
+        source.update({"etag": None, "ctag": None, "content_hash": None})
+
+    meta_url = (f"https://graph.microsoft.com/v1.0/drives/{source['drive_id']}/items/{source['item_id']}"
+                "?select=id,eTag,cTag,lastModifiedDateTime,size,@microsoft.graph.downloadUrl")
     headers = {
         "Authorization": f"Bearer {token}",
         "Accept": "application/json"
     }
-    
-    # Get latest metadata
-    meta_resp = requests.get(meta_url, headers=headers)
+    if only_if_changed and source.get("etag"):
+        headers["If-None-Match"] = source["etag"]
+
+    # Polls are not retried here; the refresh scheduler backs off instead
+    with pipeline_metrics.span("metadata") as info:
+        meta_resp = await http_client.request("GET", meta_url, headers=headers,
+                                              retries=0 if only_if_changed else http_client.MAX_RETRIES)
+        info["status_code"] = meta_resp.status_code
+    if meta_resp.status_code == 304:
+        print("File not modified (eTag unchanged)")
+        return None
     meta_resp.raise_for_status()
     meta_data = meta_resp.json()
     last_modified = meta_data.get("lastModifiedDateTime")
     file_size = meta_data.get("size", 0)
-    print(f"File last modified: {last_modified}, size: {file_size} bytes")
-    
+    etag, ctag = meta_data.get("eTag"), meta_data.get("cTag")
+    print(f"File last modified: {last_modified}, size: {file_size} bytes, cTag: {ctag}")
+
+    source["last_modified"] = last_modified
+    pipeline_metrics.annotate(file_modified=last_modified)
+    # The cTag only changes with the content, not with metadata-only autosaves
+    if only_if_changed and ctag and ctag == source.get("ctag"):
+        print("File metadata changed but content is the same (cTag unchanged)")
+        source["etag"] = etag
+        return None
+
     if file_size == 0:
         raise Exception("File appears to be empty or inaccessible. Please check file permissions.")
-    
-    # Download content with proper headers
-    url = f"https://graph.microsoft.com/v1.0/drives/{state['drive_id']}/items/{state['item_id']}/content"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        "Cache-Control": "no-cache"  # Only use basic cache control
-    }
-    
-    print(f"Downloading latest file from: {url}")
+    return token, meta_data
+
+
+async def download_latest_excel(share_url: str, only_if_changed: bool = False, source: dict = None):
+    """
+    Download the latest Excel content from OneDrive via Graph.
+
+    A single metadata request returns the item's eTag/cTag together with a
+    pre-authenticated download URL, so there is no separate metadata call
+    before the content is fetched. With only_if_changed=True the request is
+    conditional on the last seen eTag, and None is returned when the file
+    content has not changed (304, same cTag, or same SHA-256 as last time).
+    Tags are tracked on `source`, which defaults to the default source.
+    """
+    source = state if source is None else source
+    meta = await get_item_metadata(share_url, only_if_changed, source)
+    if meta is None:
+        return None
+    return await download_item_content(meta, only_if_changed, source)
+
+
+async def download_item_content(meta, only_if_changed: bool, source: dict):
+    """Download the item described by get_item_metadata; None if the bytes are unchanged."""
+    token, meta_data = meta
+    etag, ctag = meta_data.get("eTag"), meta_data.get("cTag")
+    file_size = meta_data.get("size", 0)
+
+    # Prefer the pre-authenticated download URL from the metadata response
+    url = meta_data.get("@microsoft.graph.downloadUrl")
+    headers = {"Cache-Control": "no-cache"}
+    if not url:
+        url = f"https://graph.microsoft.com/v1.0/drives/{source['drive_id']}/items/{source['item_id']}/content"
+        headers.update({
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        })
+
+    print(f"Downloading latest file ({file_size} bytes)")
     try:
-        # Calculate optimal chunk size based on file size
-        # Use 1MB chunks for files up to 10MB, 5MB chunks for larger files
-        chunk_size = 1024 * 1024 if file_size <= 10 * 1024 * 1024 else 5 * 1024 * 1024
-        print(f"Using chunk size of {chunk_size/1024/1024:.1f}MB for download")
-        
-        resp = requests.get(url, headers=headers, stream=True)
-        resp.raise_for_status()
-        
-        # Check content type
-        content_type = resp.headers.get('content-type', '')
-        print(f"Response content type: {content_type}")
-        
-        # Read content in chunks
-        content = bytearray()
-        total_downloaded = 0
         start_time = time.time()
+        with pipeline_metrics.span("download") as info:
+            resp = await http_client.request("GET", url, headers=headers)
+            resp.raise_for_status()
+            content = resp.content
+            info["bytes"] = len(content)
         
-        for chunk in resp.iter_content(chunk_size=chunk_size):
-            if chunk:
-                content.extend(chunk)
-                total_downloaded += len(chunk)
-                elapsed = time.time() - start_time
-                speed = total_downloaded / (1024 * 1024 * elapsed) if elapsed > 0 else 0
-                print(f"Downloaded {total_downloaded/1024/1024:.1f}MB of {file_size/1024/1024:.1f}MB ({speed:.1f}MB/s)")
+        elapsed = time.time() - start_time
+        speed = len(content) / (1024 * 1024 * elapsed) if elapsed > 0 else 0
+        print(f"Downloaded {len(content)/1024/1024:.1f}MB in {elapsed:.2f}s ({speed:.1f}MB/s)")
         
         if len(content) == 0:
             raise Exception("Received empty file from OneDrive. Please check file permissions and try again.")
@@ -496,186 +573,258 @@ def download_latest_excel(share_url: str):
             print(f"Warning: Downloaded content seems too small ({len(content)} bytes). Content preview: {content[:100]}")
             raise Exception("Downloaded file appears to be invalid. Please check file permissions and try again.")
 
-        # Save debug copy with timestamp
-        ts = int(time.time())
-        debug_path = os.path.join(BASE_DIR, f"debug_excel_{ts}.xlsx")
-        with open(debug_path, 'wb') as f:
-            f.write(content)
-        print(f"Downloaded {len(content)} bytes; saved debug copy to {debug_path}")
-        cleanup_debug_files()
+        content_hash = workbook_cache.content_hash(content)
+        unchanged = content_hash == source.get("content_hash")
+        # Only remember the tags once the content has actually been fetched
+        source.update({"etag": etag, "ctag": ctag, "content_hash": content_hash})
+        if only_if_changed and unchanged:
+            print("Downloaded content is identical to the last version, skipping parse")
+            return None
+
         return content
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error downloading file: {str(e)}")
-        if hasattr(e.response, 'text'):
+        if isinstance(e, httpx.HTTPStatusError):
             print(f"Response text: {e.response.text}")
         raise Exception(f"Failed to download file: {str(e)}")
 
 
-def parse_results_from_excel(file_path=None, file_bytes=None):
-    """Parse the 'Final results' sheet into discipline, category and competitor list."""
-    category = None
-    discipline = None
-    wb = load_workbook(filename=BytesIO(file_bytes) if file_bytes else file_path, data_only=True)
-    sheet = wb["Final results"]
-    
-    # Dictionary to track skaters who have performed (have received points)
-    skater_points = {}
-    
-    # Try to find the last skater from the Marks sheet
-    last_skater_name = None
-    if "Marks" in wb.sheetnames:
+async def parse_workbook(content, source=None):
+    """
+    Parse workbook bytes, memoized by content hash.
+
+    The bytes are kept in the workbook cache; a version that was parsed
+    before (e.g. a judge undoing a change) is returned without parsing.
+    """
+    with pipeline_metrics.span("cache"):
+        digest = await run_io(workbook_cache.store, content, source)
+    result = workbook_cache.get_parsed(digest)
+    if result is not None:
+        print(f"Using cached parse result for workbook {digest[:12]}")
+        return result
+    with pipeline_metrics.span("parse", competitors=None) as info:
+        result = await run_parse(parse_results_from_excel, file_bytes=content)
+        info["competitors"] = len(result[2])
+    workbook_cache.set_parsed(digest, result)
+    return result
+
+
+def read_local_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def read_item_ranges(meta, only_if_changed: bool, source: dict):
+    """Parse the item from the used ranges of its two sheets; None if they are unchanged."""
+    token, meta_data = meta
+    start_time = time.time()
+    with pipeline_metrics.span("ranges"):
+        sheets = await graph_workbook.read_sheets(token, source["drive_id"], source["item_id"], [RESULTS_SHEET, MARKS_SHEET])
+    if sheets[RESULTS_SHEET] is None:
+        raise Exception(f"Worksheet '{RESULTS_SHEET}' not found")
+    print(f"Read used ranges of {', '.join(s for s in sheets if sheets[s] is not None)} in {time.time() - start_time:.2f}s")
+
+    digest = graph_workbook.rows_hash(sheets)
+    unchanged = digest == source.get("content_hash")
+    source.update({"etag": meta_data.get("eTag"), "ctag": meta_data.get("cTag"), "content_hash": digest})
+    if only_if_changed and unchanged:
+        print("Sheet contents are identical to the last version, skipping parse")
+        return None
+    with pipeline_metrics.span("parse", competitors=None) as info:
+        result = await run_parse(parse_results_from_rows, sheets[RESULTS_SHEET], sheets[MARKS_SHEET])
+        info["competitors"] = len(result[2])
+    return result
+
+
+async def fetch_latest_results(share_url: str, only_if_changed: bool = False, source: dict = None):
+    """
+    Fetch and parse the latest version of a OneDrive workbook.
+
+    Returns (discipline, category, competitors), or None when only_if_changed
+    is set and the content has not changed. With range reads enabled only the
+    used ranges of the two sheets are read through the workbook API; if that
+    fails the whole file is downloaded instead.
+    """
+    source = state if source is None else source
+    meta = await get_item_metadata(share_url, only_if_changed, source)
+    if meta is None:
+        return None
+    if RANGE_READS_ENABLED:
         try:
-            # Skip the first 6 rows to get to the headers
-            marks_df = pd.read_excel(
-                BytesIO(file_bytes) if file_bytes else file_path,
-                sheet_name="Marks",
-                engine="openpyxl", 
-                skiprows=6
-            )
-            
-            # Skip the next row which contains the subheadings (Tech, Art, Total, Place)
-            marks_header = marks_df.iloc[0]
-            marks_subheader = marks_df.iloc[1]
-            marks_df = marks_df.iloc[2:]  # Skip both header rows
-            
-            # Drop rows with all NaN
-            marks_df = marks_df.dropna(how='all')
-            
-            # Find the column indexes for each judge's Total score
-            judge_total_cols = []
-            
-            # Identify main column headers for judges
-            judge_cols = []
-            for col in marks_df.columns:
-                if 'Judge' in str(col):
-                    judge_cols.append(col)
-            
-            # Find corresponding Total columns for each judge
-            for j, judge_col in enumerate(judge_cols):
-                col_idx = list(marks_df.columns).index(judge_col)
-                # The "Total" column is 2 columns after the main judge column (Tech, Art, Total, Place)
-                if col_idx + 2 < len(marks_df.columns):
-                    judge_total_cols.append(marks_df.columns[col_idx + 2])
-            
-            # Find the name column
-            name_col = None
-            for col in marks_df.columns:
-                if 'Name' in str(col):
-                    name_col = col
-                    break
-            
-            # Find the last skater who has non-zero Total scores from all three judges
-            if name_col and len(judge_total_cols) == 3:
-                last_skater_row = None
-                
-                for idx, row in marks_df.iterrows():
-                    skater_name = str(row[name_col]).strip() if pd.notna(row[name_col]) else ""
-                    if not skater_name:
-                        continue
-                        
-                    # Check if all three judges have assigned non-zero Total scores
-                    has_all_scores = all(
-                        pd.notna(row[col]) and float(row[col]) > 0 
-                        for col in judge_total_cols if col in row
-                    )
-                    
-                    # Store the scores for each skater - even if not all judges have scored
-                    total_points = [float(row[col]) if pd.notna(row[col]) else 0 for col in judge_total_cols if col in row]
-                    skater_points[skater_name] = sum(total_points)
-                    
-                    if has_all_scores:
-                        last_skater_row = row
-                
-                # Get the name of the last skater if found
-                if last_skater_row is not None and name_col in last_skater_row:
-                    last_skater_name = str(last_skater_row[name_col]).strip()
-                    print(f"Found last skater: {last_skater_name}")
-                else:
-                    print("No skater with complete scores found")
-                    
-            print(f"Skaters with points: {len([k for k,v in skater_points.items() if v > 0])}")
+            return await read_item_ranges(meta, only_if_changed, source)
         except Exception as e:
-            print(f"Error processing Marks sheet: {e}")
-            # Continue with the rest of the function even if Marks sheet processing fails
-    
-    # Find Category line
-    for i in range(1, 10):
-        for j in range(1, 6):
-            v = sheet.cell(row=i, column=j).value
-            if isinstance(v, str) and v.strip().startswith("Category"):
-                category = v.strip().split(" ", 1)[1].strip()
-                # Get discipline from the cell above if it exists
-                if i > 1:
-                    discipline_cell = sheet.cell(row=i-1, column=j).value
-                    if discipline_cell and isinstance(discipline_cell, str):
-                        discipline = discipline_cell.strip()
-                break
-        if category:
-            break
+            graph_workbook.range_stats["fallbacks"] += 1
+            print(f"Range read failed ({e}), downloading the whole file instead")
+    content = await download_item_content(meta, only_if_changed, source)
+    if content is None:
+        return None
+    return await parse_workbook(content, share_url)
+
+
+async def broadcast_to_operators(msg: dict, source_id: str = DEFAULT_SOURCE):
+    channel = connections.get(source_id)
+    if channel is None:
+        return
+    operators = channel["operator"]
+    with pipeline_metrics.span("broadcast", recipients=len(operators), channel="operator") as info:
+        # Encode once, then send the same frame to every operator
+        frame = broadcaster.frame(msg)
+        info["bytes"] = len(frame["json"])
+        # Queued per connection; a slow client never holds up the others
+        pipeline_metrics.track_delivery(broadcaster.publish(operators, frame, msg.get("type")))
+
+
+async def broadcast_to_public(msg: dict, source_id: str = DEFAULT_SOURCE):
+    channel = connections.get(source_id)
+    if channel is None:
+        return
+    viewers = channel["public"]
+    with pipeline_metrics.span("broadcast", recipients=len(viewers), channel="public") as info:
+        frame = broadcaster.frame(msg)
+        info["bytes"] = len(frame["json"])
+        pipeline_metrics.track_delivery(broadcaster.publish(viewers, frame, msg.get("type")))
+
+
+async def broadcast_state(source_id: str, stream: str, **extra):
+    """
+    Send the new version of a source's live or public state as a patch
+    against the previous version (or a snapshot when that is smaller).
+    The public state goes to the public screens and the operators, the
+    live state to the operators only.
+    """
+    channel = connections.get(source_id)
+    if channel is None:
+        return
+    frame, snapshot = state_deltas.next_update(source_id, stream, sources[source_id][stream], broadcaster.frame, **extra)
+    if stream == "public":
+        # Same frames for the HTTP snapshot and SSE spectators
+        public_feed.publish(source_id, frame, snapshot)
+    targets = ["public", "operator"] if stream == "public" else ["operator"]
+    for name in targets:
+        sockets = channel[name]
+        with pipeline_metrics.span("broadcast", recipients=len(sockets), channel=name, bytes=len(frame["json"])):
+            pipeline_metrics.track_delivery(broadcaster.publish(sockets, frame, stream, snapshot))
+
+
+def send_snapshot(ws, source_id: str, stream: str):
+    """Queue the current version of a stream for one client (on connect or resync)."""
+    source = sources.get(source_id)
+    if source is not None:
+        broadcaster.send(ws, state_deltas.current_snapshot(source_id, stream, source[stream]), stream)
+
+
+def handle_client_message(ws, source_id: str, text: str, streams):
+    """
+    Clients answer heartbeats ({"type": "pong", "id": n}) and ask for a
+    snapshot when they missed a patch ({"type": "resync", "stream": "live"}).
+    """
+    connection_registry.touch(ws)
+    try:
+        msg = json.loads(text)
+    except ValueError:
+        return
+    if not isinstance(msg, dict):
+        return
+    if msg.get("type") == "pong":
+        connection_registry.record_pong(ws, msg)
+    elif msg.get("type") == "resync" and msg.get("stream") in streams:
+        send_snapshot(ws, source_id, msg["stream"])
 
-    df = pd.read_excel(BytesIO(file_bytes) if file_bytes else file_path,
-                       sheet_name="Final results", engine="openpyxl", skiprows=6)
-    df = df.dropna(how="all")
-    df = df.loc[:, ~df.columns.str.startswith("Unnamed")]
-    required = ["Name", "Rank", "Judge 1", "Judge 2", "Judge 3"]
-    df = df.dropna(subset=required)
 
-    competitors = []
-    for _, r in df.iterrows():
-        try:
-            # Convert numeric values to integers, handling NaN values
-            rank = int(float(r["Rank"])) if pd.notna(r["Rank"]) else 0
-            penalty = int(float(r.get("PEN", 0))) if pd.notna(r.get("PEN")) else 0
-            judge1 = int(float(r["Judge 1"])) if pd.notna(r["Judge 1"]) else 0
-            judge2 = int(float(r["Judge 2"])) if pd.notna(r["Judge 2"]) else 0
-            judge3 = int(float(r["Judge 3"])) if pd.notna(r["Judge 3"]) else 0
-            
-            skater_name = str(r["Name"]).strip()
-            
-            # Skip skaters who have zero total points (haven't performed yet)
-            if skater_name in skater_points and skater_points[skater_name] == 0:
-                print(f"Skipping {skater_name} - has not performed yet")
-                continue
-            
-            # Check if this competitor is the last skater
-            is_last_skater = False
-            if last_skater_name and skater_name == last_skater_name:
-                is_last_skater = True
-            
-            competitors.append({
-                "rank": rank,
-                "name": skater_name,
-                "team": str(r.get("Team", "") or ""),
-                "country": str(r.get("Ctry", "") or ""),
-                "penalty": penalty,
-                "judge1": judge1,
-                "judge2": judge2,
-                "judge3": judge3,
-                "remark": str(r.get("Remark", "") or ""),
-                "last_skater": is_last_skater  # Add the last_skater flag
-            })
-        except (ValueError, TypeError) as e:
-            print(f"Error processing row: {e}")
-            continue
-
-    print(f"Total competitors after filtering: {len(competitors)}")
-    return discipline, category, competitors
-
-
-async def broadcast_to_operators(msg: dict):
-    for ws in operator_connections[:]:
-        try:
-            await ws.send_json(msg)
-        except:
-            operator_connections.remove(ws)
+# Settings shared by all workers through the backplane
+SHARED_SETTINGS = ("background_url", "auto_refresh_enabled", "auto_refresh_interval", "auto_refresh_adaptive",
+                   "auto_refresh_min_interval", "auto_refresh_max_interval")
 
 
-async def broadcast_to_public(msg: dict):
-    for ws in public_connections[:]:
-        try:
-            await ws.send_json(msg)
-        except:
-            public_connections.remove(ws)
+async def publish_state(source_id: str, stream: str, **extra):
+    """
+    Broadcast a new version of a stream to this worker's clients and hand it
+    to the other workers, which broadcast it to theirs.
+    """
+    await broadcast_state(source_id, stream, **extra)
+    source = sources.get(source_id)
+    if source is not None:
+        await backplane.publish(
+            {"kind": "state", "source": source_id, "stream": stream, "data": source[stream], "extra": extra},
+            retain=f"state:{source_id}:{stream}")
+
+
+async def publish_source(source_id: str, removed: bool = False):
+    """Tell the other workers which file a source watches (or that it is gone)."""
+    source = sources.get(source_id, {})
+    await backplane.publish(
+        {"kind": "source", "source": source_id, "removed": removed,
+         **{key: source.get(key) for key in ("current_file", "drive_id", "item_id")}},
+        retain=f"source:{source_id}")
+
+
+async def publish_settings():
+    await backplane.publish({"kind": "settings", "values": {key: state[key] for key in SHARED_SETTINGS}},
+                            retain="settings")
+
+
+def reset_schedules():
+    for s in sources.values():
+        s["schedule"].update({"interval": state["auto_refresh_interval"], "next_check": 0, "idle_polls": 0})
+
+
+def watch_local_source(source_id):
+    """Local workbooks are watched by the ingest leader only."""
+    path = sources[source_id]["current_file"]
+    if path and os.path.isfile(path) and backplane.is_leader():
+        file_watcher.start_watching(source_id, path, refresh_local_file, force_polling=WATCH_FORCE_POLLING)
+    else:
+        file_watcher.stop_watching(source_id)
+
+
+def on_leader_change(leader):
+    """Take over (or hand off) the local file watchers when the ingest leader changes."""
+    for source_id in sources:
+        watch_local_source(source_id)
+
+
+async def handle_backplane_message(msg):
+    """Apply an update published by another worker and pass it on to our clients."""
+    kind = msg.get("kind")
+    source_id = msg.get("source")
+    if kind == "state":
+        if source_id not in sources:
+            return
+        sources[source_id][msg["stream"]] = msg["data"]
+        await broadcast_state(source_id, msg["stream"], **msg.get("extra", {}))
+    elif kind == "source":
+        if msg.get("removed"):
+            if source_id in sources and source_id != DEFAULT_SOURCE:
+                for ws in [*connections[source_id]["operator"], *connections[source_id]["public"]]:
+                    try:
+                        await ws.close()
+                    except Exception:
+                        pass
+                remove_source(source_id)
+            return
+        source = add_source(source_id)
+        if source["current_file"] != msg.get("current_file"):
+            # Another worker loaded a different file; our tags describe the old one
+            source.update({"etag": None, "ctag": None, "content_hash": None})
+        for key in ("current_file", "drive_id", "item_id"):
+            source[key] = msg.get(key)
+        watch_local_source(source_id)
+    elif kind == "settings":
+        values = msg.get("values", {})
+        background_changed = values.get("background_url") != state["background_url"]
+        state.update({key: values[key] for key in SHARED_SETTINGS if key in values})
+        reset_schedules()
+        if background_changed:
+            for source_id in connections:
+                await broadcast_to_public({"type": "background_update", "url": state["background_url"]}, source_id)
+                await broadcast_to_operators({"type": "background_update", "url": state["background_url"]}, source_id)
+    elif kind == "file_changed":
+        file_changed_event.set()
+    elif kind == "subscription":
+        graph_notifications.adopt_subscription(msg["subscription"])
+    elif kind == "rankings":
+        # Workers sharing the rankings folder pick up the new index; reload() skips an unchanged folder
+        await run_io(rankings_index.reload)
 
 
 @app.post("/auth/initiate")
@@ -699,25 +848,13 @@ async def initiate_auth():
             print(error_msg)
             return JSONResponse(status_code=500, content={"error": error_msg})
 
-        cache = load_token_cache() or msal.SerializableTokenCache()
-        print("Creating MSAL PublicClientApplication...")
-        client = msal.PublicClientApplication(
-            client_id,
-            authority=AUTHORITY,
-            token_cache=cache
-        )
-        
         # Clear any existing flow and token
-        auth_state.update({
-            "flow": None,
-            "token": None,
-            "expires_at": 0,
-            "is_authenticated": False
-        })
+        auth_state.update({"flow": None, "is_authenticated": False})
+        token_manager.clear_token()
         
         print("Initiating device flow...")
         try:
-            flow = client.initiate_device_flow(scopes=SCOPES)
+            flow = await run_io(token_manager.initiate_device_flow)
             print(f"Device flow response: {json.dumps(flow, indent=2)}")
         except Exception as e:
             print(f"Error initiating device flow: {str(e)}")
@@ -739,7 +876,6 @@ async def initiate_auth():
         print(f"Flow expiry: {flow.get('expires_in', 60)} seconds")
             
         auth_state.update({"flow": flow, "is_authenticated": False})
-        save_token_cache(cache)
         
         print(f"Device flow initiated successfully")
         print(f"User code: {flow['user_code']}")
@@ -767,7 +903,7 @@ async def get_auth_status():
         print("Checking authentication status...")
         token_source = "memory"  # Default source
         try:
-            token = get_user_token()
+            token = await run_io(get_user_token)
             if token is None:  # Authorization still pending
                 flow = auth_state.get("flow")
                 if flow:
@@ -803,14 +939,7 @@ async def get_auth_status():
                 print("Token was acquired through device flow")
             
             # Try to get account info from MSAL
-            cache = load_token_cache() or msal.SerializableTokenCache()
-            client = msal.PublicClientApplication(
-                secrets["microsoft"]["client_id"],
-                authority=AUTHORITY,
-                token_cache=cache
-            )
-            
-            accounts = client.get_accounts()
+            accounts = await run_io(token_manager.get_accounts)
             print(f"Found {len(accounts)} accounts in token cache")
             
             if accounts:
@@ -832,16 +961,18 @@ async def get_auth_status():
             
             return {
                 "is_authenticated": True,
-                "token_expires_at": auth_state["expires_at"],
+                "token_expires_at": token_manager.token_state["expires_at"],
                 "token_source": token_source,
+                "token_metrics": token_manager.get_token_metrics(),
                 "account": account_info,
                 "message": "Successfully authenticated"
             }
         
         return {
             "is_authenticated": True,
-            "token_expires_at": auth_state["expires_at"],
+            "token_expires_at": token_manager.token_state["expires_at"],
             "token_source": token_source,
+            "token_metrics": token_manager.get_token_metrics(),
             "account": auth_state.get("account_info", {}),
             "message": "Successfully authenticated"
         }
@@ -850,94 +981,305 @@ async def get_auth_status():
         return {"is_authenticated": False, "message": str(e)}
 
 
+@app.get("/auth/metrics")
+async def get_auth_metrics():
+    """Access token age and background refresh statistics."""
+    return token_manager.get_token_metrics()
+
+
+async def apply_auto_refresh(source_id, discipline, category, comps):
+    """Store an automatically refreshed result in a source and notify its operators."""
+    source = sources[source_id]
+    # Update state with new data
+    source["live"]["category"], source["live"]["discipline"], source["live"]["competitors"] = category, discipline, comps
+
+    # Notify all connected clients
+    print(f"Broadcasting update to {len(connections[source_id]['operator'])} operators of '{source_id}'")
+    await publish_state(source_id, "live", auto_refreshed=True, timestamp=datetime.now().isoformat())
+
+
+async def refresh_local_file(source_id, path):
+    """
+    File watcher callback: re-parse a local workbook after it was saved.
+
+    Returns False while auto-refresh is disabled so the change is picked up
+    once it is switched back on.
+    """
+    source = sources.get(source_id)
+    if source is None or source["current_file"] != path:
+        return True
+    if not state["auto_refresh_enabled"]:
+        return False
+    source["last_file_check"] = time.time()
+    trace = pipeline_metrics.start_trace("watch", [source_id])
+    try:
+        with pipeline_metrics.span("read"):
+            content = await run_io(read_local_file, path)
+        digest = workbook_cache.content_hash(content)
+        if digest == source["content_hash"]:
+            print(f"No content changes in {path}.")
+            pipeline_metrics.annotate(status="unchanged")
+            return True
+        print(f"Local file has been updated: {path}")
+        modified = os.path.getmtime(path)
+        pipeline_metrics.annotate(status="updated", file_modified=modified)
+        discipline, category, comps = await parse_workbook(content, path)
+        source["content_hash"] = digest
+        source["last_modified"] = datetime.fromtimestamp(modified).isoformat()
+        await apply_auto_refresh(source_id, discipline, category, comps)
+        print(f"Auto-refresh successful: {len(comps)} competitors")
+        return True
+    except Exception as e:
+        pipeline_metrics.annotate(status="error", error=str(e))
+        raise
+    finally:
+        pipeline_metrics.finish_trace(trace)
+
+
+async def refresh_watched_file(source_ids):
+    """
+    Conditionally fetch one watched workbook and update every source watching it.
+
+    The first source does the fetch; the others copy its tags so they stay in
+    sync and never fetch the same file themselves.
+    """
+    leader = sources[source_ids[0]]
+    now = time.time()
+    for source_id in source_ids:
+        sources[source_id]["last_file_check"] = now
+
+    def reschedule(record, *args, **kwargs):
+        for source_id in source_ids:
+            if source_id in sources:
+                record(sources[source_id]["schedule"], get_refresh_settings(), *args, **kwargs)
+
+    # With push notifications active, polling is only a slow safety net
+    floor = PUSH_FALLBACK_INTERVAL if graph_notifications.is_active() else 0
+    trace = pipeline_metrics.start_trace("poll", source_ids)
+    try:
+        # Conditional fetch: returns None unless the content changed
+        result = await fetch_latest_results(leader["current_file"], only_if_changed=True, source=leader)
+        reschedule(refresh_scheduler.record_poll, result is not None, time.time(), floor)
+        if result is None:
+            print(f"No file changes detected for {', '.join(source_ids)}.")
+            pipeline_metrics.annotate(status="unchanged")
+            return
+        print(f"File has been updated: {leader['last_modified']}")
+        pipeline_metrics.annotate(status="updated")
+        discipline, category, comps = result
+
+        for source_id in source_ids:
+            source = sources.get(source_id)
+            if source is None:  # Removed while we were fetching
+                continue
+            for key in ("etag", "ctag", "content_hash", "last_modified"):
+                source[key] = leader[key]
+            await apply_auto_refresh(source_id, discipline, category, comps)
+
+        print(f"Auto-refresh successful: {len(comps)} competitors")
+    except httpx.HTTPStatusError as e:
+        # Respect Graph throttling (429/503 with Retry-After)
+        retry_after = None
+        if e.response.status_code in (429, 503):
+            retry_after = refresh_scheduler.parse_retry_after(e.response) or state["auto_refresh_max_interval"]
+            print(f"Graph is throttling requests, pausing polls for {retry_after}s")
+        else:
+            print(f"Error during auto-refresh: {str(e)}")
+        pipeline_metrics.annotate(status="throttled" if retry_after else "error", error=str(e))
+        reschedule(refresh_scheduler.record_error, time.time(), retry_after)
+    except Exception as e:
+        print(f"Error during auto-refresh: {str(e)}")
+        pipeline_metrics.annotate(status="error", error=str(e))
+        reschedule(refresh_scheduler.record_error, time.time())
+    finally:
+        pipeline_metrics.finish_trace(trace)
+
+
 async def check_file_updates():
     """
-    Background task that periodically checks if the Excel file has been updated.
-    If updates are detected, it automatically refreshes the data and notifies clients.
+    Background task that periodically checks if the watched Excel files have been
+    updated. If updates are detected, it automatically refreshes the data and
+    notifies the clients of each affected source.
     """
     while True:
         try:
-            # Only check if auto-refresh is enabled and we have a current file
-            if state["auto_refresh_enabled"] and state["current_file"]:
+            # Only check if auto-refresh is enabled; with several workers only the ingest leader checks
+            if state["auto_refresh_enabled"] and backplane.is_leader():
                 now = time.time()
-                # Only check every auto_refresh_interval seconds
-                if now - state["last_file_check"] >= state["auto_refresh_interval"]:
-                    print(f"Checking for file updates at {datetime.now().isoformat()}")
-                    state["last_file_check"] = now
-                    
-                    # Get file metadata
-                    token = get_user_token()
-                    if "1drv.ms" in state["current_file"] and state["drive_id"] and state["item_id"]:
-                        meta_url = f"https://graph.microsoft.com/v1.0/drives/{state['drive_id']}/items/{state['item_id']}?select=id,lastModifiedDateTime,size"
-                        headers = {
-                            "Authorization": f"Bearer {token}",
-                            "Accept": "application/json",
-                            "Cache-Control": "no-cache"
-                        }
-                        
-                        meta_resp = requests.get(meta_url, headers=headers)
-                        meta_resp.raise_for_status()
-                        meta_data = meta_resp.json()
-                        last_modified = meta_data.get("lastModifiedDateTime")
-                        
-                        # Check if file has been modified
-                        if state["last_modified"] != last_modified:
-                            print(f"File has been updated: {last_modified}")
-                            print(f"Previous modification: {state['last_modified']}")
-                            
-                            # Update last_modified timestamp
-                            state["last_modified"] = last_modified
-                            
-                            # Refresh data from the updated file
-                            try:
-                                content = download_latest_excel(state["current_file"])
-                                discipline, category, comps = parse_results_from_excel(file_bytes=content)
-                                
-                                # Update state with new data
-                                state["live"]["category"], state["live"]["discipline"], state["live"]["competitors"] = category, discipline, comps
-                                
-                                # Notify all connected clients
-                                print(f"Broadcasting update to {len(operator_connections)} operators")
-                                await broadcast_to_operators({
-                                    "type": "live_update", 
-                                    "data": state["live"],
-                                    "auto_refreshed": True,
-                                    "timestamp": datetime.now().isoformat()
-                                })
-                                
-                                print(f"Auto-refresh successful: {len(comps)} competitors")
-                            except Exception as e:
-                                print(f"Error during auto-refresh: {str(e)}")
-                        else:
-                            print(f"No file changes detected.")
+                notified = file_changed_event.is_set()
+                file_changed_event.clear()
+
+                # Group due sources by file so each workbook is fetched once per check,
+                # even when several sources watch it
+                due = {}
+                for source_id, source in sources.items():
+                    url = source["current_file"]
+                    if not (url and "1drv.ms" in url and source["drive_id"] and source["item_id"]):
+                        continue
+                    # Check when the schedule says so, or right away when Graph notified us
+                    # (unless Graph is throttling us)
+                    schedule = source["schedule"]
+                    if refresh_scheduler.is_due(schedule, now) or (notified and now >= schedule["throttled_until"]):
+                        due.setdefault(url, []).append(source_id)
+
+                if due:
+                    print(f"Checking {len(due)} file(s) for updates at {datetime.now().isoformat()}" + (" (change notification)" if notified else ""))
+                    await asyncio.gather(*(refresh_watched_file(source_ids) for source_ids in due.values()))
             
-            # Sleep before next check
-            await asyncio.sleep(5)  # Check every 5 seconds
+            # Sleep until the next scheduled check, waking early on a change notification
+            next_check = min((s["schedule"]["next_check"] for s in sources.values()), default=0)
+            timeout = min(5, max(0.5, next_check - time.time()))
+            try:
+                await asyncio.wait_for(file_changed_event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
             
         except Exception as e:
             print(f"Error in background task: {str(e)}")
             await asyncio.sleep(10)  # Wait longer if there's an error
 
+async def manage_graph_subscription():
+    """
+    Background task that creates and renews the Graph change notification
+    subscription for the watched OneDrive file. While no subscription is
+    active check_file_updates keeps polling at the normal interval.
+    """
+    while True:
+        try:
+            # One subscription covers the drive of the first watched OneDrive source
+            drive_id = next((s["drive_id"] for s in sources.values()
+                             if s["drive_id"] and s["current_file"] and "1drv.ms" in s["current_file"]), None)
+            if state["auto_refresh_enabled"] and drive_id and backplane.is_leader():
+                await update_graph_subscription(drive_id)
+        except Exception as e:
+            print(f"Error managing Graph subscription: {str(e)}")
+        await asyncio.sleep(60)
+
+
+async def update_graph_subscription(drive_id):
+    """Create or renew the subscription and share it with the other workers."""
+    before = graph_notifications.get_shared_subscription()
+    token = await run_io(get_user_token)
+    if token:
+        await graph_notifications.ensure_subscription(token, drive_id, PUSH_SETTINGS["notification_url"])
+    await publish_subscription(before)
+
+
+async def publish_subscription(before=None):
+    """
+    Hand the subscription id and clientState to the other workers if they
+    changed; Graph may deliver notifications to any of them.
+    """
+    shared = graph_notifications.get_shared_subscription()
+    if shared != before:
+        await backplane.publish({"kind": "subscription", "subscription": shared}, retain="subscription")
+
+
+@app.post("/graph/notifications")
+async def graph_notification_webhook(request: Request, validationToken: str = Query(None)):
+    """
+    Receiver for Microsoft Graph change notifications.
+
+    Answers the subscription validation handshake, and for real notifications
+    wakes the file update checker. Graph expects a reply within seconds, so
+    the refresh itself runs in the background loop.
+    """
+    if validationToken:
+        return PlainTextResponse(validationToken)
+    try:
+        payload = await request.json()
+    except Exception:
+        return JSONResponse(status_code=400, content={"error": "Invalid notification payload"})
+    if graph_notifications.accept_notifications(payload):
+        print("Graph change notification received, triggering refresh")
+        file_changed_event.set()
+        # The notification may have reached a worker that is not the ingest leader
+        await backplane.publish({"kind": "file_changed"})
+    return Response(status_code=202)
+
 @app.on_event("startup")
 async def startup_event():
     """Start background tasks when the app starts."""
     print("Starting background tasks...")
+
+    # Share updates with the other workers (no-op for the local backplane)
+    await backplane.start(handle_backplane_message, on_leader_change)
     
     # Start file update checker
     task = asyncio.create_task(check_file_updates())
     background_tasks.add(task)
     task.add_done_callback(background_tasks.discard)
-    
+
+    # Ping WebSocket clients and drop the ones that stopped answering
+    task = asyncio.create_task(connection_registry.heartbeat_loop())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+    # Renew the Graph access token before it expires
+    task = asyncio.create_task(token_manager.refresh_loop())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+    # Keep the Graph change notification subscription alive
+    if PUSH_ENABLED:
+        task = asyncio.create_task(manage_graph_subscription())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+    # Load the rankings index once; after this it is only swapped by reload_rankings_index
+    await run_io(rankings_index.reload)
+
     print("Background tasks started successfully.")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks and the ingest executors."""
+    for task in list(background_tasks):
+        task.cancel()
+    # Followers know the leader's subscription too, but only the leader owns it
+    if graph_notifications.is_active() and backplane.is_leader():
+        try:
+            token = await run_io(get_user_token)
+            await graph_notifications.delete_subscription(token)
+            # The next leader creates a new one instead of renewing a deleted subscription
+            await publish_subscription()
+        except Exception as e:
+            print(f"Warning: Could not remove Graph subscription: {e}")
+    file_watcher.stop_all()
+    public_feed.close_all()
+    await backplane.stop()
+    await http_client.close_clients()
+    shutdown_executors()
+
 @app.get("/auto_refresh/status")
 async def get_auto_refresh_status():
     """Get the current auto-refresh settings."""
+    schedule = refresh_scheduler.get_schedule_status(state["schedule"])
     return {
         "enabled": state["auto_refresh_enabled"],
         "interval": state["auto_refresh_interval"],
+        "adaptive": state["auto_refresh_adaptive"],
+        "min_interval": state["auto_refresh_min_interval"],
+        "max_interval": state["auto_refresh_max_interval"],
+        "current_interval": schedule["interval"],
+        "next_check": schedule["next_check"],
+        "backoff": schedule,
         "last_check": state["last_file_check"],
-        "last_modified": state["last_modified"]
+        "last_modified": state["last_modified"],
+        "push_enabled": PUSH_ENABLED,
+        "push": graph_notifications.get_subscription_status(),
+        "range_reads_enabled": RANGE_READS_ENABLED,
+        "range_reads": graph_workbook.get_range_status(),
+        "backplane": backplane.get_status(),
+        "sources": {
+            source_id: {
+                "last_check": s["last_file_check"],
+                "last_modified": s["last_modified"],
+                "schedule": refresh_scheduler.get_schedule_status(s["schedule"]),
+                "watcher": file_watcher.get_watch_status(source_id)
+            }
+            for source_id, s in sources.items()
+        }
     }
 
 @app.post("/auto_refresh/settings")
@@ -950,76 +1292,211 @@ async def update_auto_refresh_settings(settings: dict):
         interval = int(settings["interval"])
         if interval >= 5:  # Minimum 5 seconds
             state["auto_refresh_interval"] = interval
+
+    if "adaptive" in settings:
+        state["auto_refresh_adaptive"] = bool(settings["adaptive"])
+
+    if "min_interval" in settings:
+        min_interval = float(settings["min_interval"])
+        if min_interval >= 1:  # Minimum 1 second
+            state["auto_refresh_min_interval"] = min_interval
+
+    if "max_interval" in settings:
+        max_interval = float(settings["max_interval"])
+        if max_interval >= state["auto_refresh_min_interval"]:
+            state["auto_refresh_max_interval"] = max_interval
+
+    # Apply the new settings from the next check on
+    reset_schedules()
+    await publish_settings()
     
     return {
         "enabled": state["auto_refresh_enabled"],
-        "interval": state["auto_refresh_interval"]
+        "interval": state["auto_refresh_interval"],
+        "adaptive": state["auto_refresh_adaptive"],
+        "min_interval": state["auto_refresh_min_interval"],
+        "max_interval": state["auto_refresh_max_interval"]
+    }
+
+@app.get("/sources")
+async def list_sources():
+    """List watched workbook sources with their live/public summary."""
+    return {"sources": [
+        {
+            "id": source_id,
+            "file": s["current_file"],
+            "category": s["live"]["category"],
+            "discipline": s["live"]["discipline"],
+            "competitors": len(s["live"]["competitors"]),
+            "published_category": s["public"]["category"],
+            "last_modified": s["last_modified"],
+            "operators": len(connections[source_id]["operator"]),
+            "viewers": len(connections[source_id]["public"]),
+            "feed_viewers": public_feed.subscriber_count(source_id)
+        }
+        for source_id, s in sources.items()
+    ]}
+
+@app.post("/sources")
+async def create_source(data: dict):
+    """Add a watched workbook source and load its file: {"id": ..., "url": ...} or {"id": ..., "path": ...}."""
+    source_id = str(data.get("id") or "").strip()
+    if not source_id:
+        return JSONResponse(status_code=400, content={"error": "Source id is required."})
+    if source_id in sources:
+        return JSONResponse(status_code=400, content={"error": f"Source '{source_id}' already exists."})
+    add_source(source_id)
+    result = await load_excel({"url": data.get("url"), "path": data.get("path")}, source_id)
+    if isinstance(result, JSONResponse):
+        remove_source(source_id)
+    return result
+
+@app.delete("/sources/{source_id}")
+async def delete_source(source_id: str):
+    """Stop watching a source and disconnect its clients."""
+    if source_id == DEFAULT_SOURCE:
+        return JSONResponse(status_code=400, content={"error": "The default source cannot be removed."})
+    if source_id not in sources:
+        return unknown_source(source_id)
+    for ws in [*connections[source_id]["operator"], *connections[source_id]["public"]]:
+        try:
+            await ws.close()
+        except Exception:
+            pass
+    remove_source(source_id)
+    await publish_source(source_id, removed=True)
+    return {"status": "ok", "removed": source_id}
+
+@app.get("/connections")
+async def list_connections(source: str = None, role: str = None):
+    """Open WebSocket connections with their label, heartbeat and send counters."""
+    return {
+        "stats": connection_registry.get_registry_stats(),
+        "connections": connection_registry.list_connections(source, role)
     }
 
+@app.get("/workbook_cache")
+async def get_workbook_cache():
+    """List cached workbook versions and cache statistics."""
+    return {
+        "stats": workbook_cache.get_cache_stats(),
+        "versions": workbook_cache.list_versions()
+    }
+
+@app.get("/pipeline/metrics")
+async def get_pipeline_metrics(limit: int = 50, status: str = None, kind: str = None):
+    """
+    Latency of the refresh pipeline: recent traces with their stage spans,
+    p50/p95 per stage over the ring buffer and cumulative histograms.
+    Filter traces with status (updated, unchanged, error) or kind
+    (load, refresh, poll, watch).
+    """
+    return {
+        "summary": pipeline_metrics.get_summary(),
+        "histograms": pipeline_metrics.get_histograms(),
+        "fan_out": broadcaster.get_fanout_stats(),
+        "deltas": state_deltas.get_delta_stats(),
+        "public_feed": public_feed.get_feed_stats(),
+        "connections": connection_registry.get_registry_stats(),
+        "traces": pipeline_metrics.get_traces(limit, status, kind)
+    }
+
+
 @app.post("/load_excel")
-async def load_excel(source: dict):
-    url = source.get("url")
-    path = source.get("path")
+async def load_excel(data: dict, source_id: str = Query(DEFAULT_SOURCE, alias="source")):
+    url = data.get("url")
+    path = data.get("path")
+    # The operator console sends local paths in the URL field
+    if url and not path and not url.startswith(("http://", "https://")) and "1drv.ms" not in url:
+        url, path = None, url.strip().strip('"')
+    # Sources are created through POST /sources, not by loading into an unknown id
+    source = sources.get(source_id)
+    if source is None:
+        return unknown_source(source_id)
+    trace = pipeline_metrics.start_trace("load", [source_id])
     try:
+        result = content = None
         if url and "1drv.ms" in url:
             print(f"Loading Excel from OneDrive URL: {url}")
             try:
-                content = download_latest_excel(url)
+                result = await fetch_latest_results(url, source=source)
             except Exception as e:
                 error_msg = f"Failed to download from OneDrive: {str(e)}"
                 print(error_msg)
+                pipeline_metrics.annotate(status="error", error=error_msg)
                 return JSONResponse(status_code=400, content={"error": error_msg})
         elif url:
             print(f"Loading Excel from URL: {url}")
-            r = requests.get(url)
-            r.raise_for_status()
-            content = r.content
+            with pipeline_metrics.span("download") as info:
+                r = await http_client.request("GET", url)
+                r.raise_for_status()
+                content = r.content
+                info["bytes"] = len(content)
+        elif path:
+            path = os.path.abspath(path)
+            print(f"Loading Excel from local file: {path}")
+            if not os.path.isfile(path):
+                return JSONResponse(status_code=400, content={"error": f"File not found: {path}"})
+            with pipeline_metrics.span("read"):
+                content = await run_io(read_local_file, path)
+            source["current_file"] = path
+            source["content_hash"] = workbook_cache.content_hash(content)
+            modified = os.path.getmtime(path)
+            source["last_modified"] = datetime.fromtimestamp(modified).isoformat()
+            pipeline_metrics.annotate(file_modified=modified)
         else:
-            content = None
             print("No URL provided, using default data file")
         
-        if content:
+        if result:
+            discipline, category, comps = result
+            print(f"Successfully parsed {len(comps)} competitors")
+        elif content:
             print("Parsing Excel content")
-            discipline, category, comps = parse_results_from_excel(file_bytes=content)
+            discipline, category, comps = await parse_workbook(content, url or path)
             print(f"Successfully parsed {len(comps)} competitors")
         else:
             print("Using default data file")
-            discipline, category, comps = parse_results_from_excel(file_path=DEFAULT_DATA_FILE)
+            discipline, category, comps = await run_parse(parse_results_from_excel, file_path=DEFAULT_DATA_FILE)
         
-        # Update state with last_modified timestamp for auto-refresh
-        if url and "1drv.ms" in url and state["drive_id"] and state["item_id"]:
-            try:
-                token = get_user_token()
-                meta_url = f"https://graph.microsoft.com/v1.0/drives/{state['drive_id']}/items/{state['item_id']}?select=lastModifiedDateTime"
-                headers = {
-                    "Authorization": f"Bearer {token}",
-                    "Accept": "application/json"
-                }
-                meta_resp = requests.get(meta_url, headers=headers)
-                meta_resp.raise_for_status()
-                state["last_modified"] = meta_resp.json().get("lastModifiedDateTime")
-                print(f"File last modified timestamp: {state['last_modified']}")
-            except Exception as e:
-                print(f"Warning: Could not get last_modified timestamp: {str(e)}")
-        
-        state["live"] = {"category": category, "discipline": discipline, "competitors": comps, "category_complete": False}
-        await broadcast_to_operators({"type": "live_update", "data": state["live"]})
-        return {"status": "ok", "category": category, "count": len(comps)}
+        source["live"] = {"category": category, "discipline": discipline, "competitors": comps, "category_complete": False}
+        # Other workers learn about the source before its first state
+        await publish_source(source_id)
+        await publish_state(source_id, "live")
+        # Local files are watched for saves; OneDrive files are polled by check_file_updates
+        if path:
+            watch_local_source(source_id)
+        else:
+            file_watcher.stop_watching(source_id)
+        return {"status": "ok", "source": source_id, "category": category, "count": len(comps)}
     except Exception as e:
         error_msg = f"Error processing file: {str(e)}"
         print(error_msg)
+        pipeline_metrics.annotate(status="error", error=error_msg)
         return JSONResponse(status_code=400, content={"error": error_msg})
+    finally:
+        pipeline_metrics.finish_trace(trace)
 
 
 @app.post("/refresh_data")  
-async def refresh_data():
-    if not state.get("current_file"):
+async def refresh_data(source_id: str = Query(DEFAULT_SOURCE, alias="source")):
+    source = sources.get(source_id)
+    if source is None:
+        return unknown_source(source_id)
+    if not source.get("current_file"):
         return JSONResponse(status_code=400, content={"error": "No data source loaded."})
+    trace = pipeline_metrics.start_trace("refresh", [source_id])
     try:
-        print(f"Refreshing data from: {state['current_file']}")
-        if "1drv.ms" in state["current_file"]:
+        print(f"Refreshing data from: {source['current_file']}")
+        result = None
+        if "1drv.ms" in source["current_file"]:
             print("Using OneDrive download for refresh")
-            content = download_latest_excel(state["current_file"])
+            result = await fetch_latest_results(source["current_file"], source=source)
+        elif os.path.isfile(source["current_file"]):
+            print("Reading local file for refresh")
+            with pipeline_metrics.span("read"):
+                content = await run_io(read_local_file, source["current_file"])
+            source["content_hash"] = workbook_cache.content_hash(content)
+            pipeline_metrics.annotate(file_modified=os.path.getmtime(source["current_file"]))
         else:
             print("Using regular download for refresh")
             headers = {
@@ -1029,65 +1506,81 @@ async def refresh_data():
                 "If-None-Match": "*",
                 "If-Modified-Since": "0"
             }
-            r = requests.get(state["current_file"], headers=headers)
-            r.raise_for_status()
-            content = r.content
-        print("Parsing refreshed Excel content")
-        discipline, category, comps = parse_results_from_excel(file_bytes=content)
+            with pipeline_metrics.span("download") as info:
+                r = await http_client.request("GET", source["current_file"], headers=headers)
+                r.raise_for_status()
+                content = r.content
+                info["bytes"] = len(content)
+        if result is None:
+            print("Parsing refreshed Excel content")
+            result = await parse_workbook(content, source["current_file"])
+        discipline, category, comps = result
         print(f"Parsed {len(comps)} competitors from refreshed data")
-        state["live"] = {"category": category, "discipline": discipline, "competitors": comps, "category_complete": False}
-        await broadcast_to_operators({"type": "live_update", "data": state["live"]})
+        source["live"] = {"category": category, "discipline": discipline, "competitors": comps, "category_complete": False}
+        await publish_state(source_id, "live")
         return {"status": "ok", "updated_count": len(comps)}
     except Exception as e:
         print(f"Error in refresh_data: {e}")
+        pipeline_metrics.annotate(status="error", error=str(e))
         return JSONResponse(status_code=500, content={"error": str(e)})
+    finally:
+        pipeline_metrics.finish_trace(trace)
 
 
 @app.post("/publish")
-async def publish_public():
-    if not state["live"]["competitors"]:
+async def publish_public(source_id: str = Query(DEFAULT_SOURCE, alias="source")):
+    source = sources.get(source_id)
+    if source is None:
+        return unknown_source(source_id)
+    if not source["live"]["competitors"]:
         return JSONResponse(status_code=400, content={"error": "No results to publish."})
     limit = config.get("style", {}).get("publicDisplayLimit")
-    state["public"] = {
-        "category": state["live"]["category"],
-        "discipline": state["live"]["discipline"],
-        "competitors": state["live"]["competitors"][:limit] if limit else state["live"]["competitors"],
-        "category_complete": state["live"]["category_complete"],
+    source["public"] = {
+        "category": source["live"]["category"],
+        "discipline": source["live"]["discipline"],
+        "competitors": source["live"]["competitors"][:limit] if limit else source["live"]["competitors"],
+        "category_complete": source["live"]["category_complete"],
         "message": "",
         "display_mode": "results"  # Set to results mode when publishing
     }
-    await broadcast_to_public({"type": "public_update", "data": state["public"]})
-    await broadcast_to_operators({"type": "public_update", "data": state["public"]})
-    return {"status": "ok", "published_count": len(state["public"]["competitors"])}
+    await publish_state(source_id, "public")
+    return {"status": "ok", "published_count": len(source["public"]["competitors"])}
 
 
 @app.post("/mark_complete")
-async def mark_complete(data: dict = None):
+async def mark_complete(data: dict = None, source_id: str = Query(DEFAULT_SOURCE, alias="source")):
+    source = sources.get(source_id)
+    if source is None:
+        return unknown_source(source_id)
     # Default to True if no data is provided, otherwise use the provided value
     complete_status = True if data is None else data.get("category_complete", True)
-    state["live"]["category_complete"] = complete_status
-    await broadcast_to_operators({"type": "live_update", "data": state["live"]})
+    source["live"]["category_complete"] = complete_status
+    await publish_state(source_id, "live")
     return {"status": "ok", "category_complete": complete_status}
 
 
 @app.post("/display_message")
-async def display_message(msg: dict):
-    state["public"]["message"] = msg.get("message", "")
-    state["public"]["display_mode"] = "message"  # Set to message mode
-    await broadcast_to_public({"type": "public_update", "data": state["public"]})
-    await broadcast_to_operators({"type": "public_update", "data": state["public"]})
-    return {"status": "ok", "message": state["public"]["message"], "display_mode": "message"}
+async def display_message(msg: dict, source_id: str = Query(DEFAULT_SOURCE, alias="source")):
+    source = sources.get(source_id)
+    if source is None:
+        return unknown_source(source_id)
+    source["public"]["message"] = msg.get("message", "")
+    source["public"]["display_mode"] = "message"  # Set to message mode
+    await publish_state(source_id, "public")
+    return {"status": "ok", "message": source["public"]["message"], "display_mode": "message"}
 
 
 @app.post("/switch_display_mode")
-async def switch_display_mode(data: dict):
+async def switch_display_mode(data: dict, source_id: str = Query(DEFAULT_SOURCE, alias="source")):
+    source = sources.get(source_id)
+    if source is None:
+        return unknown_source(source_id)
     mode = data.get("mode", "results")
     if mode not in ["results", "message"]:
         return JSONResponse(status_code=400, content={"error": "Invalid display mode. Must be 'results' or 'message'."})
     
-    state["public"]["display_mode"] = mode
-    await broadcast_to_public({"type": "public_update", "data": state["public"]})
-    await broadcast_to_operators({"type": "public_update", "data": state["public"]})
+    source["public"]["display_mode"] = mode
+    await publish_state(source_id, "public")
     return {"status": "ok", "display_mode": mode}
 
 
@@ -1109,8 +1602,11 @@ async def upload_background(file: UploadFile = File(...)):
     # This will be resolved relative to the frontend application
     state["background_url"] = f"/backgrounds/{filename}"
     
-    await broadcast_to_public({"type": "background_update", "url": state["background_url"]})
-    await broadcast_to_operators({"type": "background_update", "url": state["background_url"]})
+    # The background is shared by all sources
+    for source_id in connections:
+        await broadcast_to_public({"type": "background_update", "url": state["background_url"]}, source_id)
+        await broadcast_to_operators({"type": "background_update", "url": state["background_url"]}, source_id)
+    await publish_settings()
     return {"status": "ok", "background_url": state["background_url"]}
 
 
@@ -1124,36 +1620,94 @@ async def get_config():
     }
 
 
+@app.get("/public/snapshot")
+async def public_snapshot(request: Request, source_id: str = Query(DEFAULT_SOURCE, alias="source")):
+    """
+    The public state as a cacheable JSON document for spectators' phones.
+    Answers 304 when If-None-Match has the current ETag.
+    """
+    source = sources.get(source_id)
+    if source is None:
+        return unknown_source(source_id)
+    public_feed.feed_stats["snapshot_requests"] += 1
+    snapshot = state_deltas.current_snapshot(source_id, "public", source["public"])
+    etag = public_feed.document_etag(source_id, snapshot["seq"])
+    headers = {"ETag": etag, "Cache-Control": PUBLIC_CACHE_CONTROL}
+    if public_feed.is_not_modified(request.headers.get("if-none-match"), etag):
+        public_feed.feed_stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    document = public_feed.get_document(source_id, snapshot)
+    return Response(document["body"], media_type="application/json", headers=headers)
+
+
+@app.get("/public/events")
+async def public_events(source_id: str = Query(DEFAULT_SOURCE, alias="source")):
+    """Server-Sent Events stream of the public state (public_update / public_patch events)."""
+    source = sources.get(source_id)
+    if source is None:
+        return unknown_source(source_id)
+
+    def make_snapshot():
+        return broadcaster.frame(state_deltas.current_snapshot(source_id, "public", source["public"]))
+
+    return StreamingResponse(public_feed.events(source_id, make_snapshot), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.websocket("/ws/operator")
-async def operator_ws(ws: WebSocket):
-    await ws.accept()
-    operator_connections.append(ws)
-    if state["live"]["competitors"]:
-        await ws.send_json({"type": "live_update", "data": state["live"]})
-    if state["public"]["competitors"]:
-        await ws.send_json({"type": "public_update", "data": state["public"]})
+async def operator_ws(ws: WebSocket, source_id: str = Query(DEFAULT_SOURCE, alias="source"), label: str = None):
+    source = sources.get(source_id)
+    if source is None:
+        await ws.close(code=4404)
+        return
+    # Clients opt into MessagePack frames via subprotocol; everybody else gets JSON
+    subprotocol, fmt = broadcaster.choose_subprotocol(ws.scope.get("subprotocols", []))
+    await ws.accept(subprotocol=subprotocol)
+    connection_registry.register(ws, source_id, "operator", fmt, label)
+    broadcaster.attach(ws, connections[source_id]["operator"], fmt)
+    for stream in ("live", "public"):
+        if source[stream]["competitors"] or state_deltas.has_stream(source_id, stream):
+            send_snapshot(ws, source_id, stream)
     if state["background_url"]:
-        await ws.send_json({"type": "background_update", "url": state["background_url"]})
+        broadcaster.send(ws, {"type": "background_update", "url": state["background_url"]})
     try:
         while True:
-            await ws.receive_text()
+            handle_client_message(ws, source_id, await ws.receive_text(), ("live", "public"))
     except WebSocketDisconnect:
-        operator_connections.remove(ws)
+        pass
+    except Exception as e:
+        # Closed by the heartbeat reaper or a failed send, or a broken connection
+        print(f"WebSocket connection ended: {e}")
+    finally:
+        broadcaster.detach(ws)
+        connection_registry.unregister(ws)
 
 
 @app.websocket("/ws/public")
-async def public_ws(ws: WebSocket):
-    await ws.accept()
-    public_connections.append(ws)
-    if state["public"]["competitors"]:
-        await ws.send_json({"type": "public_update", "data": state["public"]})
+async def public_ws(ws: WebSocket, source_id: str = Query(DEFAULT_SOURCE, alias="source"), label: str = None):
+    source = sources.get(source_id)
+    if source is None:
+        await ws.close(code=4404)
+        return
+    subprotocol, fmt = broadcaster.choose_subprotocol(ws.scope.get("subprotocols", []))
+    await ws.accept(subprotocol=subprotocol)
+    connection_registry.register(ws, source_id, "public", fmt, label)
+    broadcaster.attach(ws, connections[source_id]["public"], fmt)
+    if source["public"]["competitors"] or state_deltas.has_stream(source_id, "public"):
+        send_snapshot(ws, source_id, "public")
     if state["background_url"]:
-        await ws.send_json({"type": "background_update", "url": state["background_url"]})
+        broadcaster.send(ws, {"type": "background_update", "url": state["background_url"]})
     try:
         while True:
-            await ws.receive_text()
+            handle_client_message(ws, source_id, await ws.receive_text(), ("public",))
     except WebSocketDisconnect:
-        public_connections.remove(ws)
+        pass
+    except Exception as e:
+        # Closed by the heartbeat reaper or a failed send, or a broken connection
+        print(f"WebSocket connection ended: {e}")
+    finally:
+        broadcaster.detach(ws)
+        connection_registry.unregister(ws)
 
 
 # Add new endpoints for registration handling
@@ -1350,33 +1904,19 @@ async def get_rankings_info():
         # Base URL of the World Skate rankings application from config
         base_url = config.get("worldSkateRankingsUrl", "https://app-69b8883b-99d4-4935-9b2b-704880862424.cleverapps.io")
         
-        # Find the latest rankings directory by scanning folder names
-        rankings_dir = "rankings"
-        os.makedirs(rankings_dir, exist_ok=True)
+        os.makedirs(rankings_index.RANKINGS_DIR, exist_ok=True)
         
-        # Find the latest rankings directory by scanning folder names
-        latest_rankings_path = get_latest_rankings_folder(rankings_dir)
-        latest_date = None
-        available_disciplines = []
-        
-        # Check if we found a latest rankings directory
-        if latest_rankings_path and os.path.exists(latest_rankings_path):
-            # Get the folder name (which will be in "YYYY-MM_Month" format)
-            latest_date = os.path.basename(latest_rankings_path)
-            
-            # List all available disciplines from the latest rankings directory
-            for file in os.listdir(latest_rankings_path):
-                if file.endswith('.csv'):
-                    # Remove the .csv extension
-                    discipline = file[:-4]
-                    available_disciplines.append(discipline)
+        # The latest rankings folder ("YYYY-MM_Month") and its disciplines, from the in-memory index
+        index = rankings_index._current["index"]
+        latest_date = index["latest_update"] if index["folder"] else None
+        available_disciplines = list(index["disciplines"]) if index["folder"] else []
         
         # Check the World Skate website for the most recent rankings date
         external_latest_date = None
         newer_available = False
         
         try:
-            response = requests.get(base_url, timeout=10)
+            response = await http_client.request("GET", base_url, timeout=10)
             if response.status_code == 200:
                 soup = BeautifulSoup(response.text, 'html.parser')
                 
@@ -1397,7 +1937,8 @@ async def get_rankings_info():
             "latest_date": latest_date,
             "external_latest_date": external_latest_date,
             "newer_available": newer_available,
-            "available_disciplines": sorted(available_disciplines)
+            "available_disciplines": sorted(available_disciplines),
+            "index": rankings_index.get_index_status()
         }
     except Exception as e:
         print(f"Error getting rankings info: {e}")
@@ -1406,12 +1947,29 @@ async def get_rankings_info():
             content={"error": f"Failed to get rankings info: {str(e)}"}
         )
 
+# Set while fetch_rankings writes the folder, so the index is not reloaded from half-written files
+rankings_update = {"running": False}
+
+def fetch_rankings_and_reindex():
+    """Download the rankings, then swap in an index of the new folder."""
+    rankings_update["running"] = True
+    try:
+        fetch_rankings()
+    finally:
+        rankings_update["running"] = False
+        rankings_index.reload()
+
+async def update_rankings_in_background():
+    """Download and reindex the rankings, then let the other workers reindex the new folder."""
+    await run_in_threadpool(fetch_rankings_and_reindex)
+    await backplane.publish({"kind": "rankings"})
+
 @app.post("/rankings/update")
 async def update_rankings(background_tasks: BackgroundTasks):
     """Trigger a rankings update in the background"""
     try:
         # Use background tasks to run the rankings update without blocking
-        background_tasks.add_task(fetch_rankings)
+        background_tasks.add_task(update_rankings_in_background)
         
         return {"status": "updating", "message": "Rankings update has been initiated"}
     except Exception as e:
@@ -1445,6 +2003,25 @@ async def api_rankings_update(background_tasks: BackgroundTasks):
     """API version of the rankings update endpoint"""
     return await update_rankings(background_tasks)
 
+@app.post("/api/rankings/reload")
+async def reload_rankings_index():
+    """Reload the rankings index, e.g. after a rankings folder was copied in by hand"""
+    if rankings_update["running"]:
+        return JSONResponse(
+            status_code=409,
+            content={"error": "A rankings download is running; the index is reloaded when it finishes"}
+        )
+    try:
+        await run_io(rankings_index.reload)
+        await backplane.publish({"kind": "rankings"})
+        return rankings_index.get_index_status()
+    except Exception as e:
+        print(f"Error reloading rankings index: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Failed to reload rankings index: {str(e)}"}
+        )
+
 # Make sure this endpoint is properly registered
 @app.get("/api/rankings/download-zip", response_class=Response)
 async def api_rankings_download_zip():
@@ -1515,28 +2092,22 @@ async def download_rankings_zip():
 async def get_table_metadata():
     """Get the table metadata for World Skate rankings"""
     try:
-        # Find the latest rankings directory
-        rankings_dir = "rankings"
-        latest_rankings_path = get_latest_rankings_folder(rankings_dir)
+        index = rankings_index._current["index"]
         
-        if not latest_rankings_path or not os.path.exists(latest_rankings_path):
+        if not index["folder"]:
             return JSONResponse(
                 status_code=404,
                 content={"error": "No rankings data found"}
             )
         
-        # Read the table metadata file
-        metadata_file = os.path.join(latest_rankings_path, "table_metadata.json")
-        if not os.path.exists(metadata_file):
+        # The table metadata file is read with the index
+        if index["metadata"] is None:
             return JSONResponse(
                 status_code=404,
                 content={"error": "Table metadata not found"}
             )
         
-        with open(metadata_file, 'r') as f:
-            metadata = json.load(f)
-        
-        return metadata
+        return index["metadata"]
     except Exception as e:
         print(f"Error getting table metadata: {e}")
         return JSONResponse(
@@ -1547,61 +2118,18 @@ async def get_table_metadata():
 @app.get("/api/rankings/all/combined")
 async def get_all_rankings():
     """Get all rankings in a single combined JSON response"""
-    print(f"[DEBUG] Processing /api/rankings/all/combined request")
     try:
-        # Find the latest rankings directory
-        rankings_dir = "rankings"
-        latest_rankings_path = get_latest_rankings_folder(rankings_dir)
+        index = rankings_index._current["index"]
         
-        if not latest_rankings_path or not os.path.exists(latest_rankings_path):
-            print(f"[DEBUG] No rankings found at path: {rankings_dir}")
+        if not index["folder"]:
+            print(f"[DEBUG] No rankings found at path: {rankings_index.RANKINGS_DIR}")
             return JSONResponse(
                 status_code=404,
                 content={"error": "No rankings data found"}
             )
         
-        # Dictionary to store all rankings by discipline
-        all_rankings = {}
-        latest_update = os.path.basename(latest_rankings_path)
-        print(f"[DEBUG] Found rankings directory: {latest_update}")
-        
-        # Read all CSV files in the directory
-        file_count = 0
-        for file in os.listdir(latest_rankings_path):
-            if file.endswith('.csv'):
-                file_count += 1
-                # Get discipline name from filename (without extension)
-                discipline = file[:-4]
-                file_path = os.path.join(latest_rankings_path, file)
-                
-                try:
-                    # Read the CSV file
-                    df = pd.read_csv(file_path, quoting=csv.QUOTE_ALL)
-                    
-                    # Create a mapping of World Skate IDs to rankings
-                    id_to_rank = {}
-                    for _, row in df.iterrows():
-                        ws_id = str(row["ID"]).strip()
-                        if ws_id:  # Only process entries with valid World Skate IDs
-                            id_to_rank[ws_id] = {
-                                "rank": row["Rank"],
-                                "name": row["Name"],
-                                "country": row["Nat."],
-                                "points": row["Best"]
-                            }
-                    
-                    # Add to the overall dictionary
-                    all_rankings[discipline] = id_to_rank
-                    
-                except Exception as e:
-                    print(f"[DEBUG] Error reading {file}: {e}")
-                    continue
-        
-        print(f"[DEBUG] Successfully processed {file_count} ranking files, found {len(all_rankings)} disciplines")
-        return {
-            "latest_update": latest_update,
-            "rankings": all_rankings
-        }
+        # Encoded once per index: {"latest_update", "rankings": {discipline: {World Skate ID: entry}}}
+        return Response(content=rankings_index.combined_document(index), media_type="application/json")
     except Exception as e:
         print(f"[DEBUG] Error getting all rankings: {e}")
         return JSONResponse(
@@ -1613,31 +2141,16 @@ async def get_all_rankings():
 async def get_discipline_rankings(discipline: str):
     """Get the rankings data for a specific discipline"""
     try:
-        # Get the file path for the specified discipline
-        file_path = get_discipline_file_path(discipline)
+        index = rankings_index._current["index"]
+        name, table = rankings_index.find_discipline(index, discipline)
         
-        if not file_path or not os.path.exists(file_path):
+        if table is None:
             return JSONResponse(
                 status_code=404,
                 content={"error": f"Discipline '{discipline}' not found in rankings data"}
             )
         
-        # Read the CSV file using pandas
-        import pandas as pd
-        df = pd.read_csv(file_path, quoting=csv.QUOTE_ALL)
-        
-        # Convert to list of dictionaries for JSON response
-        rankings = []
-        for _, row in df.iterrows():
-            rankings.append({
-                "rank": row["Rank"],
-                "name": row["Name"],
-                "country": row["Nat."],
-                "world_skate_id": row["ID"],
-                "best_points": row["Best"]
-            })
-        
-        return {"rankings": rankings}
+        return Response(content=rankings_index.discipline_document(index, name), media_type="application/json")
     except Exception as e:
         print(f"Error getting discipline rankings: {e}")
         return JSONResponse(
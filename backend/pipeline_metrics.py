@@ -0,0 +1,193 @@
+"""
+Per-stage latency of the refresh pipeline.
+
+Every load, manual refresh, poll and local file save is recorded as a
+trace: a list of timed spans (metadata, download, ranges, read, cache,
+parse, broadcast) plus the outcome. The trace being recorded lives in a
+context variable, so the stages deep in the call chain add their spans
+without passing it around, and concurrent refreshes (one asyncio task per
+watched file) keep separate traces. Finished traces go into a ring buffer;
+the span durations also feed cumulative histograms.
+
+For updates the trace records when the workbook was modified (Graph's
+lastModifiedDateTime or the local mtime) and when the last client was sent
+the update, giving the end-to-end latency of an update. Broadcasts are
+queued per connection, so that moment may come after the trace finished;
+the end-to-end figure is filled in once every tracked delivery is done.
+"""
+import time
+import itertools
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+BUFFER_SIZE = 500
+# Histogram bucket upper bounds in milliseconds
+BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+_traces = deque(maxlen=BUFFER_SIZE)
+_histograms = {}
+_ids = itertools.count(1)
+_current = ContextVar("pipeline_trace", default=None)
+
+
+def start_trace(kind, source_ids):
+    """Begin a trace for the current task; `kind` is load, refresh, poll or watch."""
+    trace = {
+        "id": next(_ids),
+        "kind": kind,
+        "sources": list(source_ids),
+        "started": time.time(),
+        "status": "ok",
+        "spans": [],
+        "pending_deliveries": 0,
+        "delivered_at": None,
+        "_t0": time.perf_counter(),
+        "_token": None
+    }
+    trace["_token"] = _current.set(trace)
+    return trace
+
+
+def annotate(**fields):
+    """Set fields (status, error, file_modified, ...) on the current trace, if any."""
+    trace = _current.get()
+    if trace is not None:
+        trace.update(fields)
+
+
+@contextmanager
+def span(stage, **info):
+    """
+    Time a pipeline stage of the current trace; does nothing outside a trace.
+
+    Yields the span's info dict so the stage can add details such as the
+    number of bytes downloaded.
+    """
+    trace = _current.get()
+    if trace is None:
+        yield info
+        return
+    start = time.perf_counter()
+    try:
+        yield info
+    except BaseException as e:
+        info["error"] = str(e)
+        raise
+    finally:
+        end = time.perf_counter()
+        trace["spans"].append({
+            "stage": stage,
+            "start_ms": round((start - trace["_t0"]) * 1000, 2),
+            "duration_ms": round((end - start) * 1000, 2),
+            **info
+        })
+
+
+def track_delivery(future):
+    """Count a broadcast of the current trace as delivered once `future` resolves."""
+    trace = _current.get()
+    if trace is None or future is None:
+        return
+    trace["pending_deliveries"] += 1
+
+    def delivered(f):
+        trace["pending_deliveries"] -= 1
+        if not f.cancelled() and f.result():
+            trace["delivered_at"] = max(trace["delivered_at"] or 0, f.result())
+        # The callback can run before or after finish_trace; whichever is last records
+        if trace["pending_deliveries"] == 0 and "duration_ms" in trace:
+            _record_end_to_end(trace)
+
+    future.add_done_callback(delivered)
+
+
+def to_timestamp(value):
+    """Epoch seconds for a Graph/ISO timestamp or a number; None if unknown."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _observe(name, ms):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = _histograms[name] = {"counts": [0] * (len(BUCKETS) + 1), "count": 0, "sum_ms": 0.0}
+    index = next((i for i, bound in enumerate(BUCKETS) if ms <= bound), len(BUCKETS))
+    histogram["counts"][index] += 1
+    histogram["count"] += 1
+    histogram["sum_ms"] += ms
+
+
+def finish_trace(trace):
+    """Close a trace started with start_trace and store it."""
+    _current.reset(trace.pop("_token"))
+    t0 = trace.pop("_t0")
+    trace["duration_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    trace["file_modified"] = to_timestamp(trace.get("file_modified"))
+    trace["recipients"] = sum(s.get("recipients", 0) for s in trace["spans"] if s["stage"] == "broadcast")
+    trace["end_to_end_ms"] = None
+    for s in trace["spans"]:
+        _observe(s["stage"], s["duration_ms"])
+    _observe(f"{trace['kind']}_total", trace["duration_ms"])
+    _traces.append(trace)
+    if trace["pending_deliveries"] == 0:
+        _record_end_to_end(trace)
+
+
+def _record_end_to_end(trace):
+    # Only automatic updates: a manual load may pick up a file saved hours ago
+    if trace["status"] != "updated" or not trace["delivered_at"] or not trace["file_modified"]:
+        return
+    # Wall clocks of Graph and this machine differ a little; never report negative latency
+    trace["end_to_end_ms"] = round(max(0, trace["delivered_at"] - trace["file_modified"]) * 1000, 2)
+    _observe("end_to_end", trace["end_to_end_ms"])
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def get_histograms():
+    """Cumulative bucket counts per stage since the server started."""
+    return {
+        name: {
+            "count": h["count"],
+            "mean_ms": round(h["sum_ms"] / h["count"], 2),
+            "buckets": [{"le_ms": bound, "count": c} for bound, c in zip(BUCKETS + ["+Inf"], h["counts"])]
+        }
+        for name, h in _histograms.items()
+    }
+
+
+def get_summary():
+    """p50/p95/max per stage over the traces still in the ring buffer."""
+    durations = {}
+    for trace in _traces:
+        for s in trace["spans"]:
+            durations.setdefault(s["stage"], []).append(s["duration_ms"])
+        durations.setdefault(f"{trace['kind']}_total", []).append(trace["duration_ms"])
+        if trace["end_to_end_ms"] is not None:
+            durations.setdefault("end_to_end", []).append(trace["end_to_end_ms"])
+    return {
+        name: {"count": len(values), "p50_ms": _percentile(values, 0.5),
+               "p95_ms": _percentile(values, 0.95), "max_ms": max(values)}
+        for name, values in durations.items()
+    }
+
+
+def get_traces(limit=50, status=None, kind=None):
+    """The most recent traces, newest first, optionally filtered."""
+    result = []
+    for trace in reversed(_traces):
+        if (status and trace["status"] != status) or (kind and trace["kind"] != kind):
+            continue
+        result.append(trace)
+        if len(result) >= limit:
+            break
+    return result
@@ -0,0 +1,140 @@
+"""
+Public results for spectators' phones over plain HTTP.
+
+Thousands of phones should not each hold a WebSocket to the server, so the
+public state is also offered in two forms a reverse proxy or CDN can carry:
+
+- GET /public/snapshot: the public state as a JSON document with its seq,
+  encoded once per version. Its ETag comes from the source and the seq, so
+  revalidations are answered with 304 without encoding anything, and the
+  short max-age lets a proxy serve most requests from its cache. A client
+  can continue from the document with the events whose base is its seq.
+- GET /public/events: a Server-Sent Events stream with the same messages the
+  public WebSocket gets (public_update snapshots and public_patch patches,
+  "id" is the seq). Each event is encoded once and the same bytes are
+  written to every subscriber. A subscriber holds at most one pending
+  event; when a newer one arrives first, it gets the snapshot of the newer
+  version instead, like slow WebSocket clients do.
+"""
+import time
+import asyncio
+import hashlib
+from broadcaster import encode
+
+KEEPALIVE = 15           # seconds between comment lines that keep idle proxies from closing the stream
+RETRY_MS = 2000          # how soon EventSource reconnects after the stream drops
+
+# source id -> {"seq": int, "body": bytes, "etag": str} of the current public state
+_documents = {}
+# source id -> function returning the snapshot frame of the current version
+_snapshots = {}
+# source id -> {id(subscriber): subscriber}
+_subscribers = {}
+feed_stats = {"snapshot_requests": 0, "not_modified": 0, "documents_encoded": 0,
+              "events_published": 0, "events_coalesced": 0, "subscribers_total": 0}
+
+
+def _sse(frame):
+    """The SSE bytes of a broadcaster frame, encoded once and kept on the frame."""
+    if "sse" not in frame:
+        msg = frame["msg"]
+        frame["sse"] = f"id: {msg['seq']}\nevent: {msg['type']}\ndata: {frame['json']}\n\n".encode("utf-8")
+    return frame["sse"]
+
+
+def document_etag(source_id, seq):
+    """The ETag of one version of a source's public state."""
+    return f'"{hashlib.sha256(f"{source_id}:{seq}".encode("utf-8")).hexdigest()[:32]}"'
+
+
+def get_document(source_id, snapshot):
+    """The encoded snapshot document of a public_update message and its ETag."""
+    document = _documents.get(source_id)
+    if document is None or document["seq"] != snapshot["seq"]:
+        seq = snapshot["seq"]
+        body = encode({"source": source_id, "seq": seq, "data": snapshot["data"]}).encode("utf-8")
+        document = _documents[source_id] = {"seq": seq, "body": body, "etag": document_etag(source_id, seq)}
+        feed_stats["documents_encoded"] += 1
+    return document
+
+
+def is_not_modified(if_none_match, etag):
+    """True if an If-None-Match header matches the current ETag."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def publish(source_id, frame, snapshot):
+    """
+    A new version of a source's public state was broadcast: drop the cached
+    document and hand the frame to the SSE subscribers.
+    """
+    _documents.pop(source_id, None)
+    _snapshots[source_id] = snapshot
+    subscribers = _subscribers.get(source_id)
+    if not subscribers:
+        return
+    feed_stats["events_published"] += 1
+    event = _sse(frame)
+    for subscriber in subscribers.values():
+        if subscriber["pending"] is None:
+            subscriber["pending"] = event
+        else:
+            # The pending event was not written yet, so a patch would not fit
+            subscriber["pending"] = _sse(snapshot())
+            feed_stats["events_coalesced"] += 1
+        subscriber["wakeup"].set()
+
+
+async def events(source_id, make_snapshot):
+    """
+    Async generator of SSE bytes for one subscriber, starting with the
+    current snapshot. `make_snapshot` builds the snapshot frame if nothing
+    was published for the source yet.
+    """
+    if source_id not in _snapshots:
+        cached = make_snapshot()
+        _snapshots[source_id] = lambda: cached
+    subscriber = {"pending": None, "wakeup": asyncio.Event(), "closed": False,
+                  "connected_at": time.time(), "events_sent": 0}
+    _subscribers.setdefault(source_id, {})[id(subscriber)] = subscriber
+    feed_stats["subscribers_total"] += 1
+    try:
+        yield f"retry: {RETRY_MS}\n\n".encode("utf-8") + _sse(_snapshots[source_id]())
+        while not subscriber["closed"]:
+            try:
+                await asyncio.wait_for(subscriber["wakeup"].wait(), KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            subscriber["wakeup"].clear()
+            event, subscriber["pending"] = subscriber["pending"], None
+            if event is not None:
+                subscriber["events_sent"] += 1
+                yield event
+    finally:
+        _subscribers.get(source_id, {}).pop(id(subscriber), None)
+
+
+def forget(source_id):
+    """End the streams of a removed source."""
+    _documents.pop(source_id, None)
+    _snapshots.pop(source_id, None)
+    for subscriber in _subscribers.pop(source_id, {}).values():
+        subscriber["closed"] = True
+        subscriber["wakeup"].set()
+
+
+def close_all():
+    for source_id in list(_subscribers):
+        forget(source_id)
+
+
+def subscriber_count(source_id):
+    return len(_subscribers.get(source_id, {}))
+
+
+def get_feed_stats():
+    return {**feed_stats, "subscribers": {source_id: len(s) for source_id, s in _subscribers.items()}}
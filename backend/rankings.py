@@ -1,6 +1,8 @@
-import requests
+import httpx
 from bs4 import BeautifulSoup
 import json, pandas as pd, logging, os
+import html
+from html.entities import html5
 from urllib.parse import urljoin
 import time
 import csv
@@ -8,7 +10,10 @@ import sys
 import platform
 import re
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from http_client import request_sync
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
@@ -16,13 +21,23 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(me
 # Global variable for DataTables request counter
 gi_drawNumber = 1
 
+# Discipline tables are downloaded in parallel, but politely: at most
+# DOWNLOAD_WORKERS requests in flight and at least REQUEST_INTERVAL seconds
+# between two request starts
+DOWNLOAD_WORKERS = 6
+REQUEST_INTERVAL = 0.2
+
 # Global variable for tracking download progress
 download_progress = {
     "current_discipline": None,
+    "active_disciplines": [],
+    "failed_disciplines": [],
     "total_disciplines": 0,
     "completed_disciplines": 0,
     "is_complete": False
 }
+# Guards download_progress while several downloads update it
+progress_lock = threading.Lock()
 
 # Add the global variable for tracking skater database download progress
 skater_db_progress = {
@@ -36,6 +51,8 @@ def reset_download_progress():
     global download_progress
     download_progress = {
         "current_discipline": None,
+        "active_disciplines": [],
+        "failed_disciplines": [],
         "total_disciplines": 0,
         "completed_disciplines": 0,
         "is_complete": False
@@ -43,8 +60,25 @@ def reset_download_progress():
 
 def get_download_progress():
     """Get the current download progress"""
-    global download_progress
-    return download_progress
+    with progress_lock:
+        return {**download_progress,
+                "active_disciplines": list(download_progress["active_disciplines"]),
+                "failed_disciplines": list(download_progress["failed_disciplines"])}
+
+def _discipline_started(discipline_name):
+    with progress_lock:
+        download_progress["active_disciplines"].append(discipline_name)
+        download_progress["current_discipline"] = discipline_name
+
+def _discipline_finished(discipline_name, failed=False):
+    with progress_lock:
+        active = download_progress["active_disciplines"]
+        if discipline_name in active:
+            active.remove(discipline_name)
+        if failed:
+            download_progress["failed_disciplines"].append(discipline_name)
+        download_progress["completed_disciplines"] += 1
+        download_progress["current_discipline"] = active[-1] if active else None
 
 def reset_skater_db_progress():
     """Reset the skater database download progress tracking"""
@@ -91,11 +125,121 @@ def build_datatables_params(num_cols=7):
     gi_drawNumber += 1
     return params
 
+def make_rate_limiter(interval):
+    """
+    Return a function that blocks until the next request may start, so that
+    request starts are at least `interval` seconds apart across all threads.
+    """
+    lock = threading.Lock()
+    next_start = [0.0]
+
+    def wait():
+        with lock:
+            now = time.monotonic()
+            start = max(now, next_start[0])
+            next_start[0] = start + interval
+        if start > now:
+            time.sleep(start - now)
+    return wait
+
+def download_discipline(discipline_name, data_url, params, wait_turn):
+    """Download the DataTables JSON of one discipline table (runs in a download thread)."""
+    wait_turn()
+    _discipline_started(discipline_name)
+    logging.info(f"Downloading JSON data for {discipline_name}")
+    response = request_sync("GET", data_url, params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+def save_discipline_csv(discipline_name, data, output_dir):
+    """Clean the rows of one discipline table and write its CSV. Returns False if there were no rows."""
+    if not data.get("data"):
+        logging.warning(f"No data found for {discipline_name}")
+        return False
+
+    # Convert to DataFrame and save as CSV in one step
+    filename = normalize_filename(discipline_name)
+    csv_path = os.path.join(output_dir, f"{filename}.csv")
+
+    # Create DataFrame from raw data
+    df = pd.DataFrame(data["data"])
+
+    # Clean the data by stripping HTML tags from all columns
+    cleaned_data = {
+        'Rank': clean_cells(df[0]),  # Current world rank
+        'Prev': clean_cells(df[1]),  # Previous world rank
+        'Best': clean_cells(df[2]),  # Sum of 4 best scores
+        'Name': clean_cells(df[3]),  # Surname + First name
+        'Nat.': clean_cells(df[4]),  # 3-letter country code
+        'ID': clean_cells(df[5]),    # World Skate ID
+        'Total': clean_cells(df[6])  # Total points in last year
+    }
+
+    # Create formatted DataFrame with cleaned data
+    formatted_df = pd.DataFrame(cleaned_data)
+
+    # Save to CSV with proper formatting
+    formatted_df.to_csv(csv_path, index=False, quoting=csv.QUOTE_ALL)
+    logging.info(f"Saved CSV for {discipline_name}: {csv_path}")
+    return True
+
+# World Skate cells carry simple markup (links, spans, flag images) and
+# entities; those are stripped with a regex. Anything a regex could get
+# wrong goes to BeautifulSoup.
+HTML_TAG = re.compile(r"</?[A-Za-z][^<>]*>")
+COMPLEX_HTML = re.compile(r"<(?:script|style|textarea)", re.IGNORECASE)
+# An "&" and the complete reference it starts, if any
+ENTITY = re.compile(r"&(?:#([0-9]+);|#[xX]([0-9a-fA-F]+);|([A-Za-z][A-Za-z0-9]*;))?")
+
+def strip_html_soup(html_str):
+    """Strip HTML tags with BeautifulSoup (the slow path for complex cells)"""
+    return BeautifulSoup(html_str, 'html.parser').get_text(strip=True)
+
+def plain_entities(html_str):
+    """
+    True if every "&" starts a reference that html.unescape decodes like
+    BeautifulSoup does: a name HTML5 defines, or a code point of ordinary
+    text. Bare "&", unknown names and control or non-BMP code points are
+    left to BeautifulSoup.
+    """
+    for match in ENTITY.finditer(html_str):
+        decimal, hexadecimal, name = match.groups()
+        if name is not None:
+            if name not in html5:
+                return False
+        elif decimal is not None or hexadecimal is not None:
+            code = int(decimal) if decimal is not None else int(hexadecimal, 16)
+            if not (0x20 <= code < 0x7f or 0xa0 <= code < 0xd800 or 0xe000 <= code < 0xfdd0 or 0xfdf0 <= code < 0xfffe):
+                return False
+        else:
+            return False
+    return True
+
 def strip_html(html_str):
     """Helper function to strip HTML tags from a string"""
     if not html_str:
         return ""
-    return BeautifulSoup(html_str, 'html.parser').get_text(strip=True)
+    if "&" in html_str and not plain_entities(html_str):
+        return strip_html_soup(html_str)
+    if "<" not in html_str and ">" not in html_str:
+        return html.unescape(html_str).strip() if "&" in html_str else html_str.strip()
+    pieces = HTML_TAG.split(html_str)
+    # Comments, stray brackets or ">" inside attribute values
+    if COMPLEX_HTML.search(html_str) or any("<" in piece or ">" in piece for piece in pieces):
+        return strip_html_soup(html_str)
+    # Same result as get_text(strip=True): every text piece stripped, joined without separator
+    return "".join(html.unescape(piece).strip() for piece in pieces)
+
+def clean_cells(values):
+    """Strip the markup of a column of cells; repeated cells (flags, ranks) are cleaned once."""
+    cleaned = {}
+    result = []
+    for value in values:
+        text = str(value)
+        if text not in cleaned:
+            cleaned[text] = strip_html(text)
+        result.append(cleaned[text])
+    return result
 
 def normalize_filename(discipline_name):
     """Transform discipline name to a standardized format for filenames"""
@@ -220,14 +364,22 @@ def fetch_rankings(base_url=None):
     Returns:
         tuple: (latest_date, output_dir) - The date of the rankings and the path to the folder
     """
+    # Reset progress tracking at the start
+    reset_download_progress()
+    try:
+        return _fetch_rankings(base_url)
+    finally:
+        # Mark download as complete, also after an error anywhere in the fetch, so pollers stop
+        with progress_lock:
+            download_progress["is_complete"] = True
+            download_progress["current_discipline"] = None
+            download_progress["active_disciplines"] = []
+
+def _fetch_rankings(base_url):
     try:
-        # Reset progress tracking at the start
-        reset_download_progress()
-        
         # If no base_url is provided, try to load from config
         if base_url is None:
             try:
-                import json
                 with open("config.json") as f:
                     config = json.load(f)
                 base_url = config.get("worldSkateRankingsUrl", "https://app-69b8883b-99d4-4935-9b2b-704880862424.cleverapps.io")
@@ -235,13 +387,10 @@ def fetch_rankings(base_url=None):
                 logging.error(f"Failed to load URL from config, using default: {e}")
                 base_url = "https://app-69b8883b-99d4-4935-9b2b-704880862424.cleverapps.io"
         
-        # Create a session for better performance
-        session = requests.Session()
-                
         logging.info(f"Fetching rankings page: {base_url}")
-        response = session.get(base_url, timeout=10)
+        response = request_sync("GET", base_url, timeout=10)
         response.raise_for_status()  # Raise HTTPError for bad status codes
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logging.error(f"Failed to fetch the rankings page: {e}")
         raise
 
@@ -322,8 +471,8 @@ def fetch_rankings(base_url=None):
         })
     
     # Update total disciplines count
-    global download_progress
-    download_progress["total_disciplines"] = len(disciplines)
+    with progress_lock:
+        download_progress["total_disciplines"] = len(disciplines)
     
     # Create output directory
     output_dir = os.path.join("rankings", folder_date)
@@ -337,55 +486,24 @@ def fetch_rankings(base_url=None):
             "tables": table_metadata
         }, f, indent=2)
     
-    # Process each discipline
-    for i, (discipline_name, data_url) in enumerate(disciplines):
-        try:
-            # Update current discipline and progress
-            download_progress["current_discipline"] = discipline_name
-            download_progress["completed_disciplines"] = i  # Update completed count before processing
-            
-            logging.info(f"Downloading JSON data for {discipline_name}")
-            response = session.get(data_url, params=build_datatables_params(), timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            if not data.get("data"):
-                logging.warning(f"No data found for {discipline_name}")
-                continue
-                
-            # Convert to DataFrame and save as CSV in one step
-            filename = normalize_filename(discipline_name)
-            csv_path = os.path.join(output_dir, f"{filename}.csv")
-            
-            # Create DataFrame from raw data
-            df = pd.DataFrame(data["data"])
-            
-            # Clean the data by stripping HTML tags from all columns
-            cleaned_data = {
-                'Rank': df[0].apply(lambda x: strip_html(str(x))),  # Current world rank
-                'Prev': df[1].apply(lambda x: strip_html(str(x))),  # Previous world rank
-                'Best': df[2].apply(lambda x: strip_html(str(x))),  # Sum of 4 best scores
-                'Name': df[3].apply(lambda x: strip_html(str(x))),  # Surname + First name
-                'Nat.': df[4].apply(lambda x: strip_html(str(x))),  # 3-letter country code
-                'ID': df[5].apply(lambda x: strip_html(str(x))),    # World Skate ID
-                'Total': df[6].apply(lambda x: strip_html(str(x)))  # Total points in last year
-            }
-            
-            # Create formatted DataFrame with cleaned data
-            formatted_df = pd.DataFrame(cleaned_data)
-            
-            # Save to CSV with proper formatting
-            formatted_df.to_csv(csv_path, index=False, quoting=csv.QUOTE_ALL)
-            logging.info(f"Saved CSV for {discipline_name}: {csv_path}")
-            
-        except Exception as e:
-            logging.error(f"Error processing {discipline_name}: {e}")
-            continue
-    
-    # Mark download as complete and set final count
-    download_progress["is_complete"] = True
-    download_progress["current_discipline"] = None
-    download_progress["completed_disciplines"] = len(disciplines)  # Set final count
+    # Download the tables in parallel; this thread cleans and writes each one
+    # as soon as it arrives, while the other downloads continue
+    started = time.time()
+    wait_turn = make_rate_limiter(REQUEST_INTERVAL)
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="rankings") as pool:
+        futures = {
+            pool.submit(download_discipline, discipline_name, data_url, build_datatables_params(), wait_turn): discipline_name
+            for discipline_name, data_url in disciplines
+        }
+        for future in as_completed(futures):
+            discipline_name = futures[future]
+            try:
+                save_discipline_csv(discipline_name, future.result(), output_dir)
+                _discipline_finished(discipline_name)
+            except Exception as e:
+                logging.error(f"Error processing {discipline_name}: {e}")
+                _discipline_finished(discipline_name, failed=True)
+    logging.info(f"Downloaded {len(disciplines)} ranking tables in {time.time() - started:.1f}s")
     
     return folder_date, output_dir
 
@@ -418,15 +536,12 @@ def fetch_skater_database(base_url=None):
         output_file = "rankings/skater-db.json"
         logging.info(f"Will save skater database to: {output_file}")
         
-        # Create a session for better performance
-        session = requests.Session()
-        
         # First, make a request to get the total number of skaters
         logging.info(f"Fetching initial skater data to determine total count")
         initial_url = f"{base_url}/athletes.json"
         params = build_datatables_params(num_cols=7)
         params["length"] = "1"  # Just get one record to get the total count
-        response = session.get(initial_url, params=params, timeout=10)
+        response = request_sync("GET", initial_url, params=params, timeout=10)
         response.raise_for_status()
         
         data = response.json()
@@ -457,24 +572,27 @@ def fetch_skater_database(base_url=None):
             chunk_params["length"] = str(chunk_size)
             
             # Make the request
-            chunk_response = session.get(initial_url, params=chunk_params, timeout=15)
+            chunk_response = request_sync("GET", initial_url, params=chunk_params, timeout=15)
             chunk_response.raise_for_status()
             
             chunk_data = chunk_response.json()
             skaters_chunk = chunk_data.get("data", [])
             
-            # Process skater data - clean HTML
+            # Process skater data - clean HTML column by column
+            family_names, first_names, nationalities, ids, birth_dates = (
+                clean_cells(skater[col] for skater in skaters_chunk) for col in range(5))
+            edit_urls = clean_cells(skater[6] if len(skater) > 6 else "" for skater in skaters_chunk)
             processed_skaters = []
-            for skater in skaters_chunk:
+            for i, skater in enumerate(skaters_chunk):
                 # Convert each skater from a list to a dictionary with meaningful property names
                 processed_skater = {
-                    "family_name": strip_html(str(skater[0])),
-                    "first_name": strip_html(str(skater[1])),
-                    "nationality": strip_html(str(skater[2])),
-                    "world_skate_id": strip_html(str(skater[3])),
-                    "birth_date": strip_html(str(skater[4])),
+                    "family_name": family_names[i],
+                    "first_name": first_names[i],
+                    "nationality": nationalities[i],
+                    "world_skate_id": ids[i],
+                    "birth_date": birth_dates[i],
                     "previous_ids": skater[5] if len(skater) > 5 and skater[5] else [],
-                    "edit_url": strip_html(str(skater[6])) if len(skater) > 6 else ""
+                    "edit_url": edit_urls[i]
                 }
                 processed_skaters.append(processed_skater)
             
@@ -0,0 +1,169 @@
+"""
+In-memory index of the latest World Skate rankings.
+
+The rankings endpoints used to find the latest folder, list it and read
+every CSV with pandas on each request, and the registration pages request
+all rankings every time they open. The latest folder is now loaded once
+into one immutable index:
+
+- per discipline, one list per column (rank, name, country, id, best)
+- per discipline, a World Skate ID -> row hash map
+- the table metadata, and the JSON documents of the combined and
+  per-discipline responses, encoded on first use
+
+A new index is built completely before it replaces the old one with a
+single assignment, so requests never see a half-loaded index. Requests
+only read _current["index"] and never touch the disk. The index is
+loaded at startup and swapped by reload(), which runs after
+fetch_rankings has written the whole folder, and on
+POST /api/rankings/reload after a folder was copied in by hand.
+"""
+import os
+import csv
+import json
+import math
+import time
+import threading
+import pandas as pd
+from broadcaster import encode
+from rankings import get_latest_rankings_folder, normalize_filename
+
+RANKINGS_DIR = "rankings"
+COLUMNS = {"rank": "Rank", "name": "Name", "country": "Nat.", "id": "ID", "best": "Best"}
+
+# The index requests read; empty until the startup load
+_current = {"index": {"version": None, "folder": None}}
+_load_lock = threading.Lock()
+index_stats = {"loads": 0, "last_load_ms": None}
+
+
+def _value(value):
+    """Native Python value for JSON; empty cells become None."""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _load_discipline(path):
+    df = pd.read_csv(path, quoting=csv.QUOTE_ALL)
+    table = {key: [_value(v) for v in df[column].tolist()] for key, column in COLUMNS.items()}
+    table["by_id"] = {}
+    for row, ws_id in enumerate(table["id"]):
+        key = str(ws_id).strip() if ws_id is not None else ""
+        if key:  # Only entries with valid World Skate IDs
+            table["by_id"][key] = row
+    return table
+
+
+def _folder_version(main_dir):
+    """What the index depends on: the latest subfolder and its files (rewritten files change too)."""
+    try:
+        latest = get_latest_rankings_folder(main_dir)
+        if not latest:
+            return None
+        with os.scandir(latest) as entries:
+            files = sorted((e.name, e.stat().st_mtime_ns, e.stat().st_size) for e in entries if e.is_file())
+        return latest, tuple(files)
+    except OSError:
+        return None
+
+
+def build_index(main_dir=RANKINGS_DIR, version=None):
+    """Read the latest rankings folder into a new index (with folder None if there is none)."""
+    version = version or _folder_version(main_dir)
+    latest = version[0] if version else None
+    if not latest or not os.path.isdir(latest):
+        return {"version": version, "folder": None}
+    disciplines = {}
+    for file in sorted(os.listdir(latest)):
+        if file.endswith(".csv"):
+            try:
+                disciplines[file[:-4]] = _load_discipline(os.path.join(latest, file))
+            except Exception as e:
+                print(f"Error reading rankings file {file}: {e}")
+    metadata = None
+    metadata_file = os.path.join(latest, "table_metadata.json")
+    if os.path.exists(metadata_file):
+        with open(metadata_file) as f:
+            metadata = json.load(f)
+    return {
+        "version": version,
+        "folder": latest,
+        "latest_update": os.path.basename(latest),
+        "disciplines": disciplines,
+        "lookup": {name.lower(): name for name in disciplines},
+        "metadata": metadata,
+        "documents": {},
+        "loaded_at": time.time()
+    }
+
+
+def reload(main_dir=RANKINGS_DIR):
+    """Build an index of the latest folder and swap it in, unless the current one already is."""
+    with _load_lock:
+        # Checked under the lock: a second caller that waited here finds the index already rebuilt
+        version = _folder_version(main_dir)
+        if version is not None and _current["index"]["version"] == version:
+            return _current["index"]
+        start = time.perf_counter()
+        index = build_index(main_dir, version)
+        _current["index"] = index
+        index_stats["loads"] += 1
+        index_stats["last_load_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        print(f"Loaded rankings index from {index['folder']}: {len(index.get('disciplines', {}))} disciplines "
+              f"in {index_stats['last_load_ms']}ms")
+        return index
+
+
+def find_discipline(index, discipline):
+    """The discipline table for a name as used in the URLs (normalized or not)."""
+    if not index["folder"]:
+        return None, None
+    name = normalize_filename(discipline)
+    name = name if name in index["disciplines"] else index["lookup"].get(name.lower())
+    return name, index["disciplines"].get(name)
+
+
+def _document(index, key, build):
+    """JSON bytes of a response, encoded once per index."""
+    documents = index["documents"]
+    if key not in documents:
+        documents[key] = encode(build()).encode("utf-8")
+    return documents[key]
+
+
+def combined_document(index):
+    """All rankings keyed by discipline and World Skate ID (/api/rankings/all/combined)."""
+    def build():
+        rankings = {}
+        for name, table in index["disciplines"].items():
+            rankings[name] = {
+                ws_id: {"rank": table["rank"][row], "name": table["name"][row],
+                        "country": table["country"][row], "points": table["best"][row]}
+                for ws_id, row in table["by_id"].items()
+            }
+        return {"latest_update": index["latest_update"], "rankings": rankings}
+    return _document(index, "combined", build)
+
+
+def discipline_document(index, name):
+    """The rows of one discipline (/api/rankings/{discipline})."""
+    table = index["disciplines"][name]
+
+    def build():
+        return {"rankings": [
+            {"rank": rank, "name": skater, "country": country, "world_skate_id": ws_id, "best_points": best}
+            for rank, skater, country, ws_id, best in
+            zip(table["rank"], table["name"], table["country"], table["id"], table["best"])
+        ]}
+    return _document(index, f"discipline:{name}", build)
+
+
+def get_index_status():
+    index = _current["index"]
+    return {
+        **index_stats,
+        "folder": index["folder"],
+        "disciplines": len(index.get("disciplines", {})),
+        "loaded_at": index.get("loaded_at")
+    }
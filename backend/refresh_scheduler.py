@@ -0,0 +1,91 @@
+"""
+Adaptive polling schedule for watched workbooks.
+
+While a workbook keeps changing (skaters are getting marks) it is polled at
+the minimum interval. After a few unchanged polls the interval doubles on
+every further idle poll up to the maximum, so breaks between categories
+cost only a handful of Graph calls. Every delay gets some jitter so several
+sources do not poll in lockstep, and a 429/503 with Retry-After pushes the
+next poll past the throttling window.
+"""
+import random
+
+# Unchanged polls tolerated at the current interval before backing off
+ACTIVE_GRACE_POLLS = 3
+BACKOFF_FACTOR = 2
+JITTER = 0.15
+
+
+def new_schedule(interval):
+    """Schedule state for one source, starting at the base interval."""
+    return {
+        "interval": interval,
+        "next_check": 0,
+        "idle_polls": 0,
+        "mode": "idle",          # active, idle, backoff or throttled
+        "last_change": None,
+        "throttled_until": 0
+    }
+
+
+def is_due(schedule, now):
+    return now >= schedule["next_check"] and now >= schedule["throttled_until"]
+
+
+def _plan_next(schedule, now, floor=0):
+    delay = max(schedule["interval"], floor)
+    delay *= random.uniform(1 - JITTER, 1 + JITTER)
+    schedule["next_check"] = now + delay
+
+
+def record_poll(schedule, settings, changed, now, floor=0):
+    """
+    Update the schedule after a successful poll.
+
+    `settings` holds adaptive, interval, min_interval and max_interval.
+    `floor` is a lower bound on the delay, used while push notifications
+    make polling a fallback only.
+    """
+    if not settings["adaptive"]:
+        schedule.update({"interval": settings["interval"], "mode": "idle", "idle_polls": 0})
+    elif changed:
+        schedule.update({"interval": settings["min_interval"], "mode": "active", "idle_polls": 0, "last_change": now})
+    else:
+        schedule["idle_polls"] += 1
+        if schedule["idle_polls"] > ACTIVE_GRACE_POLLS:
+            schedule["interval"] = min(settings["max_interval"],
+                                       max(settings["min_interval"], schedule["interval"] * BACKOFF_FACTOR))
+            schedule["mode"] = "backoff" if schedule["interval"] < settings["max_interval"] else "idle"
+    _plan_next(schedule, now, floor)
+
+
+def record_error(schedule, settings, now, retry_after=None):
+    """Back off after a failed poll; honour Retry-After when the server sent one."""
+    schedule["interval"] = min(settings["max_interval"], max(settings["interval"], schedule["interval"] * BACKOFF_FACTOR))
+    if retry_after is not None:
+        schedule["mode"] = "throttled"
+        schedule["throttled_until"] = now + retry_after
+        _plan_next(schedule, now, retry_after)
+    else:
+        schedule["mode"] = "backoff"
+        _plan_next(schedule, now)
+
+
+def parse_retry_after(response):
+    """Seconds from a Retry-After header, or None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if value and value.strip().isdigit():
+        return int(value.strip())
+    return None
+
+
+def get_schedule_status(schedule):
+    """Schedule summary for status endpoints."""
+    return {
+        "interval": round(schedule["interval"], 2),
+        "next_check": schedule["next_check"],
+        "mode": schedule["mode"],
+        "idle_polls": schedule["idle_polls"],
+        "last_change": schedule["last_change"],
+        "throttled_until": schedule["throttled_until"] or None
+    }
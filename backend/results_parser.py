@@ -0,0 +1,306 @@
+"""
+Streaming parser for competition result workbooks.
+
+The workbook is opened once in read-only mode and only the "Final results"
+and "Marks" sheets are read. Each sheet is streamed row by row as plain
+values, so no cell objects are created and no other sheet is decompressed.
+The tables are then processed column-wise: numbers are coerced per column
+and "scored by all three judges" is a boolean mask rather than a row loop.
+
+The output is the same (discipline, category, competitors) tuple the
+pandas based parser used to produce, including its handling of empty cells.
+"""
+from io import BytesIO
+import numpy as np
+from openpyxl import load_workbook
+
+RESULTS_SHEET = "Final results"
+MARKS_SHEET = "Marks"
+
+# Number of rows above the table header on both sheets
+HEADER_OFFSET = 6
+
+# Strings pandas.read_excel treats as missing values by default
+NA_STRINGS = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null"
+})
+
+
+def is_missing(value):
+    """Return True if a cell value counts as empty (NaN in pandas terms)."""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value in NA_STRINGS
+    return isinstance(value, float) and value != value
+
+
+def trim_rows(rows):
+    """Turn value rows into lists with trailing blank cells and rows removed."""
+    trimmed = []
+    for values in rows:
+        row = list(values)
+        while row and (row[-1] is None or row[-1] == ""):
+            row.pop()
+        trimmed.append(row)
+    while trimmed and not trimmed[-1]:
+        trimmed.pop()
+    return trimmed
+
+
+def read_sheet_rows(sheet):
+    """Stream a worksheet into a list of value rows with trailing blanks trimmed."""
+    return trim_rows(sheet.iter_rows(values_only=True))
+
+
+def build_table(rows, skiprows=HEADER_OFFSET):
+    """
+    Turn raw sheet rows into (columns, values, present) like read_excel(skiprows=...).
+
+    `values` is a 2-D object array of the raw cells below the header and
+    `present` the matching boolean mask of non-missing cells.
+    """
+    width = max((len(r) for r in rows), default=0)
+    body = rows[skiprows:]
+    if not body:
+        return [], np.empty((0, 0), dtype=object), np.empty((0, 0), dtype=bool)
+
+    columns = []
+    seen = {}
+    for i in range(width):
+        value = body[0][i] if i < len(body[0]) else None
+        name = f"Unnamed: {i}" if is_missing(value) else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+
+    values = np.empty((len(body) - 1, width), dtype=object)
+    for i, row in enumerate(body[1:]):
+        values[i, :len(row)] = row
+    # value == value is False only for NaN
+    present = (values != None) & (values == values) & ~_is_na_string(values).astype(bool)  # noqa: E711
+    return columns, values, present
+
+
+_is_na_string = np.frompyfunc(NA_STRINGS.__contains__, 1, 1)
+
+
+def drop_empty_rows(values, present):
+    keep = present.any(axis=1)
+    return values[keep], present[keep]
+
+
+def coerce_column(values, present):
+    """
+    Convert an object column to floats; missing cells become NaN.
+
+    Returns (numbers, errors) where errors maps a row to the exception
+    float() raised for it. The whole column is converted at once and only
+    falls back to converting cell by cell when it contains a bad value.
+    """
+    column = np.where(present, values, np.nan)
+    try:
+        return column.astype(float), {}
+    except (ValueError, TypeError):
+        pass
+    numbers = np.full(len(column), np.nan)
+    errors = {}
+    for row, value in enumerate(column.tolist()):
+        try:
+            numbers[row] = float(value)
+        except (ValueError, TypeError) as e:
+            errors[row] = e
+    return numbers, errors
+
+
+def to_text(value):
+    """Render an optional text cell the way str(value or "") did on a pandas row."""
+    if value is None:
+        return "nan"
+    if not value:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def text_column(values, present):
+    return [to_text(v) if p else "nan" for v, p in zip(values.tolist(), present.tolist())]
+
+
+def name_column(values, present):
+    return [str(v).strip() if p else "" for v, p in zip(values.tolist(), present.tolist())]
+
+
+def find_category(rows):
+    """Find the 'Category ...' line in the top-left corner and the discipline above it."""
+    category = None
+    discipline = None
+    for i in range(min(len(rows), 9)):
+        for j in range(min(len(rows[i]), 5)):
+            v = rows[i][j]
+            if isinstance(v, str) and v.strip().startswith("Category"):
+                category = v.strip().split(" ", 1)[1].strip()
+                # Get discipline from the cell above if it exists
+                if i > 0 and j < len(rows[i - 1]):
+                    discipline_cell = rows[i - 1][j]
+                    if discipline_cell and isinstance(discipline_cell, str):
+                        discipline = discipline_cell.strip()
+                break
+        if category:
+            break
+    return discipline, category
+
+
+def parse_marks(rows):
+    """
+    Collect total points per skater and the last skater scored by all three judges.
+
+    Returns (skater_points, last_skater_name). Processing stops at the first
+    malformed score, keeping the points collected for the rows above it.
+    """
+    skater_points = {}
+    last_skater_name = None
+    try:
+        columns, values, present = build_table(rows)
+        # Skip the two sub-heading rows (Tech, Art, Total, Place)
+        values, present = drop_empty_rows(values[2:], present[2:])
+
+        # The "Total" column is 2 columns after the main judge column
+        judge_total_idx = [i + 2 for i, col in enumerate(columns)
+                           if "Judge" in str(col) and i + 2 < len(columns)]
+        name_idx = next((i for i, col in enumerate(columns) if "Name" in str(col)), None)
+
+        if name_idx is not None and len(judge_total_idx) == 3:
+            names = name_column(values[:, name_idx], present[:, name_idx])
+            named = np.array([bool(name) for name in names], dtype=bool)
+            totals = np.empty((len(names), 3))
+            # Rows without a name are skipped, so only their scores cannot fail
+            failures = []
+            for col, i in enumerate(judge_total_idx):
+                totals[:, col], errors = coerce_column(values[:, i], present[:, i])
+                failures.extend((row, col, e) for row, e in errors.items() if named[row])
+
+            stop = min(failures, key=lambda f: f[:2])[0] if failures else len(names)
+            scored = named[:stop]
+            points = np.nan_to_num(totals[:stop], nan=0.0)
+            points = points[:, 0] + points[:, 1] + points[:, 2]
+            skater_points.update(zip((n for n, s in zip(names, scored) if s), points[scored].tolist()))
+            if failures:
+                raise min(failures, key=lambda f: f[:2])[2]
+
+            complete = np.flatnonzero(named & (totals > 0).all(axis=1))
+            if complete.size:
+                last_skater_name = names[complete[-1]]
+                print(f"Found last skater: {last_skater_name}")
+            else:
+                print("No skater with complete scores found")
+
+        print(f"Skaters with points: {len([k for k, v in skater_points.items() if v > 0])}")
+    except Exception as e:
+        print(f"Error processing Marks sheet: {e}")
+    return skater_points, last_skater_name
+
+
+def parse_competitors(rows, skater_points, last_skater_name):
+    """Build the competitor list from the 'Final results' table."""
+    columns, values, present = build_table(rows)
+
+    index = {}
+    for i, col in enumerate(columns):
+        if not (isinstance(col, str) and col.startswith("Unnamed")):
+            index.setdefault(col, i)
+
+    required = ["Name", "Rank", "Judge 1", "Judge 2", "Judge 3"]
+    missing = [col for col in required if col not in index]
+    if missing:
+        raise KeyError(missing)
+
+    keep = present[:, [index[col] for col in required]].all(axis=1)
+    values, present = values[keep], present[keep]
+    count = len(values)
+
+    # Converted in the order the per-row conversions used to run in, so a
+    # row with several bad cells reports the same one
+    numbers = {}
+    errors = {}
+    for col in ["Rank", "PEN", "Judge 1", "Judge 2", "Judge 3"]:
+        if col not in index:
+            numbers[col] = [0] * count
+            continue
+        column, column_errors = coerce_column(values[:, index[col]], present[:, index[col]])
+        numbers[col] = np.nan_to_num(column, nan=0.0).tolist()
+        for row, e in column_errors.items():
+            errors.setdefault(row, e)
+
+    names = name_column(values[:, index["Name"]], present[:, index["Name"]])
+    texts = {col: text_column(values[:, index[col]], present[:, index[col]]) if col in index else [""] * count
+             for col in ("Team", "Ctry", "Remark")}
+
+    competitors = []
+    for row, skater_name in enumerate(names):
+        if row in errors:
+            print(f"Error processing row: {errors[row]}")
+            continue
+
+        # Skip skaters who have zero total points (haven't performed yet)
+        if skater_name in skater_points and skater_points[skater_name] == 0:
+            print(f"Skipping {skater_name} - has not performed yet")
+            continue
+
+        competitors.append({
+            "rank": int(numbers["Rank"][row]),
+            "name": skater_name,
+            "team": texts["Team"][row],
+            "country": texts["Ctry"][row],
+            "penalty": int(numbers["PEN"][row]),
+            "judge1": int(numbers["Judge 1"][row]),
+            "judge2": int(numbers["Judge 2"][row]),
+            "judge3": int(numbers["Judge 3"][row]),
+            "remark": texts["Remark"][row],
+            "last_skater": bool(last_skater_name) and skater_name == last_skater_name
+        })
+    return competitors
+
+
+def parse_results_from_excel(file_path=None, file_bytes=None):
+    """Parse the 'Final results' sheet into discipline, category and competitor list."""
+    wb = load_workbook(filename=BytesIO(file_bytes) if file_bytes else file_path,
+                       read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = wb[RESULTS_SHEET]
+        # Some writers store a wrong sheet dimension, which would truncate streaming reads
+        sheet.reset_dimensions()
+        results_rows = read_sheet_rows(sheet)
+
+        marks_rows = None
+        if MARKS_SHEET in wb.sheetnames:
+            marks_sheet = wb[MARKS_SHEET]
+            marks_sheet.reset_dimensions()
+            marks_rows = read_sheet_rows(marks_sheet)
+    finally:
+        wb.close()
+    return parse_results_from_rows(results_rows, marks_rows)
+
+
+def parse_results_from_rows(results_rows, marks_rows=None):
+    """
+    Parse already extracted sheet rows (row 1 first, column A first).
+
+    `marks_rows` is None when the workbook has no Marks sheet.
+    """
+    # Dictionary to track skaters who have performed (have received points)
+    skater_points, last_skater_name = {}, None
+    if marks_rows is not None:
+        skater_points, last_skater_name = parse_marks(marks_rows)
+
+    discipline, category = find_category(results_rows)
+    competitors = parse_competitors(results_rows, skater_points, last_skater_name)
+
+    print(f"Total competitors after filtering: {len(competitors)}")
+    return discipline, category, competitors
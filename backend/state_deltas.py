@@ -0,0 +1,138 @@
+"""
+Versioned live/public state updates sent as compact diffs.
+
+Every change of a source's live or public state gets the next sequence
+number of its stream. Clients receive either a full snapshot
+(live_update / public_update, as before, now with "seq") or a patch
+(live_patch / public_patch) that lists only what changed since "base":
+
+    {"type": "live_patch", "seq": 42, "base": 41,
+     "fields": {"category_complete": true},
+     "competitors": {"upsert": [...], "remove": ["Name"], "order": ["Name", ...]}}
+
+Competitors are keyed by name; "order" is only sent when the order differs
+from the old order with removed names dropped and new names appended.
+A client whose seq is not the patch's base asks for a snapshot with
+{"type": "resync", "stream": "live"}.
+
+The state last sent on each stream is kept as a copy, so patches are
+computed against exactly what the clients have even though the handlers
+mutate source["live"] and source["public"] in place.
+"""
+
+SNAPSHOT_TYPES = {"live": "live_update", "public": "public_update"}
+PATCH_TYPES = {"live": "live_patch", "public": "public_patch"}
+
+# (source_id, stream) -> {"seq": int, "state": copy of the last sent state}
+_streams = {}
+delta_stats = {"snapshots": 0, "patches": 0, "patch_bytes_saved": 0}
+
+
+def copy_state(state):
+    """Copy deep enough that later in-place edits do not reach the copy."""
+    copied = dict(state)
+    if isinstance(copied.get("competitors"), list):
+        copied["competitors"] = [dict(c) for c in copied["competitors"]]
+    return copied
+
+
+def _names(competitors):
+    names = [c.get("name") for c in competitors]
+    # Patches need a unique key per competitor; anything else gets a snapshot
+    if None in names or len(set(names)) != len(names):
+        return None
+    return names
+
+
+def diff_state(old, new):
+    """
+    The changes turning `old` into `new`, or None if only a snapshot can
+    describe them (no common competitor key).
+    """
+    changes = {}
+    fields = {k: v for k, v in new.items() if k != "competitors" and (k not in old or old[k] != v)}
+    removed_fields = [k for k in old if k not in new]
+    if fields:
+        changes["fields"] = fields
+    if removed_fields:
+        changes["removed_fields"] = removed_fields
+
+    old_comps, new_comps = old.get("competitors") or [], new.get("competitors") or []
+    if old_comps != new_comps:
+        old_names, new_names = _names(old_comps), _names(new_comps)
+        if old_names is None or new_names is None:
+            return None
+        by_name = dict(zip(old_names, old_comps))
+        kept = set(new_names)
+        competitors = {
+            "upsert": [c for name, c in zip(new_names, new_comps) if by_name.get(name) != c],
+            "remove": [name for name in old_names if name not in kept]
+        }
+        expected = [name for name in old_names if name in kept] + [name for name in new_names if name not in by_name]
+        if new_names != expected:
+            competitors["order"] = new_names
+        changes["competitors"] = competitors
+    return changes
+
+
+def _snapshot_message(stream, entry, extra):
+    return {"type": SNAPSHOT_TYPES[stream], "seq": entry["seq"], "data": entry["state"], **extra}
+
+
+def next_update(source_id, stream, state, make_frame, **extra):
+    """
+    Record a new version of a stream and build the messages for it.
+
+    `make_frame` turns a message into a broadcaster frame (with its JSON
+    text under "json"). Returns (frame, snapshot): the frame to send (a
+    patch when its JSON is smaller than the snapshot's) and a function
+    returning the snapshot frame of the same version, for clients that
+    cannot take the patch. `extra` fields (auto_refreshed, timestamp) go
+    into either message.
+    """
+    entry = _streams.get((source_id, stream))
+    previous = entry["state"] if entry else None
+    seq = entry["seq"] + 1 if entry else 1
+    entry = _streams[(source_id, stream)] = {"seq": seq, "state": copy_state(state)}
+
+    cached = {}
+
+    def snapshot():
+        if "frame" not in cached:
+            cached["frame"] = make_frame(_snapshot_message(stream, entry, extra))
+        return cached["frame"]
+
+    changes = diff_state(previous, entry["state"]) if previous is not None else None
+    if changes is not None:
+        patch = make_frame({"type": PATCH_TYPES[stream], "seq": seq, "base": seq - 1, **changes, **extra})
+        saved = len(snapshot()["json"]) - len(patch["json"])
+        if saved > 0:
+            delta_stats["patches"] += 1
+            delta_stats["patch_bytes_saved"] += saved
+            return patch, snapshot
+    delta_stats["snapshots"] += 1
+    return snapshot(), snapshot
+
+
+def current_snapshot(source_id, stream, state):
+    """
+    The snapshot message of the last version sent on a stream, for clients
+    that connect or resync. A stream that was never sent starts from `state`.
+    """
+    entry = _streams.get((source_id, stream))
+    if entry is None:
+        entry = _streams[(source_id, stream)] = {"seq": 1, "state": copy_state(state)}
+    return _snapshot_message(stream, entry, {})
+
+
+def has_stream(source_id, stream):
+    return (source_id, stream) in _streams
+
+
+def forget(source_id):
+    for key in [key for key in _streams if key[0] == source_id]:
+        del _streams[key]
+
+
+def get_delta_stats():
+    return {**delta_stats, "streams": {f"{s}/{stream}": e["seq"] for (s, stream), e in _streams.items()}}
@@ -0,0 +1,53 @@
+"""
+Shared fixtures for the backend tests.
+
+Run from the repository root or the backend folder:
+
+    python -m pytest backend/tests
+
+The backend modules are imported by plain name like the server does, so
+the backend folder (and benchmarks/, for the workbook generator) is put on
+sys.path. `main` reads config.json and secrets.json from the working
+directory at import time; the `main` fixture imports it from a scratch
+folder with the repo's config.json and a placeholder secrets.json.
+"""
+import os
+import sys
+import json
+import shutil
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    """The server module, with the workbook cache in a temporary folder."""
+    workdir = tmp_path_factory.mktemp("server")
+    shutil.copy(os.path.join(BACKEND_DIR, "config.json"), workdir)
+    (workdir / "secrets.json").write_text(json.dumps({"microsoft": {"client_id": "test-client"}}))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import main as main_module
+    finally:
+        os.chdir(cwd)
+
+    import workbook_cache
+    from executors import shutdown_executors
+    workbook_cache.CACHE_DIR = str(workdir / "workbook_cache")
+    workbook_cache._index.clear()
+    workbook_cache._parsed.clear()
+    yield main_module
+    shutdown_executors()
+
+
+@pytest.fixture
+def source(main):
+    """A fresh watched source, removed again after the test."""
+    source_id = "test-source"
+    main.add_source(source_id)
+    yield source_id
+    main.remove_source(source_id)
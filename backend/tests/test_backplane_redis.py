@@ -0,0 +1,225 @@
+"""
+The Redis backplane against a real Redis server.
+
+The tests start a throwaway redis-server: the one on PATH, or the binary
+bundled with redislite (`pip install redislite`). Set
+BACKPLANE_TEST_REDIS_URL to use a running server instead (the tests use
+their own keys). Every worker is a separate copy of the backplane module
+with its own WORKER_ID, all in one event loop, and short lock timings.
+"""
+import os
+import time
+import uuid
+import shutil
+import socket
+import asyncio
+import subprocess
+import importlib.util
+import pytest
+
+pytest.importorskip("redis")
+
+BACKPLANE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backplane.py")
+
+
+def find_redis_server():
+    executable = shutil.which("redis-server")
+    if executable:
+        return executable
+    try:
+        import redislite
+        return redislite.__redis_executable__
+    except ImportError:
+        return None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_redis(executable, port):
+    process = subprocess.Popen([executable, "--port", str(port), "--bind", "127.0.0.1", "--save", "",
+                                "--appendonly", "no"], stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                pytest.fail("redis-server did not start")
+            time.sleep(0.05)
+
+
+def stop_redis(process):
+    process.terminate()
+    process.wait(timeout=10)
+
+
+@pytest.fixture
+def redis_server():
+    """URL of the server, and a restart function (None for a server the test did not start)."""
+    url = os.environ.get("BACKPLANE_TEST_REDIS_URL")
+    if url:
+        yield url, None
+        return
+    executable = find_redis_server()
+    if not executable:
+        pytest.skip("no redis-server to test against")
+    port = free_port()
+    processes = [start_redis(executable, port)]
+
+    def restart():
+        """Stop the server and start an empty one on the same port."""
+        stop_redis(processes[-1])
+        processes.append(start_redis(executable, port))
+    yield f"redis://127.0.0.1:{port}/0", restart
+    stop_redis(processes[-1])
+
+
+@pytest.fixture
+def workers(redis_server):
+    """Factory for connected backplane workers; the test stops them."""
+    url, _ = redis_server
+    prefix = f"slalomtools-test:{uuid.uuid4().hex}"
+
+    async def start(name):
+        spec = importlib.util.spec_from_file_location(f"backplane_{name}", BACKPLANE_FILE)
+        worker = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(worker)
+        worker.WORKER_ID = name
+        worker.REDIS_CHANNEL, worker.REDIS_RETAINED, worker.REDIS_LEADER = (
+            f"{prefix}:updates", f"{prefix}:retained", f"{prefix}:leader")
+        worker.LEADER_TTL, worker.LEADER_RENEW, worker.RECONNECT_DELAY = 1, 0.1, 0.1
+        worker.configure({"backend": "redis", "redis_url": url})
+        worker.received = []
+        worker.leader_changes = []
+
+        async def handler(message):
+            worker.received.append(message)
+        await worker.start(handler, worker.leader_changes.append)
+        await wait_until(lambda: worker.get_status()["connected"])
+        return worker
+
+    return start
+
+
+async def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for the backplane")
+        await asyncio.sleep(0.02)
+
+
+async def stop_all(*workers):
+    for worker in workers:
+        await worker.stop()
+
+
+def test_updates_reach_other_workers_and_retained_state_replays(workers):
+    async def scenario():
+        a = await workers("a")
+        b = await workers("b")
+        try:
+            await a.publish({"n": 1}, retain="state:default:live")
+            await a.publish({"n": 2}, retain="state:default:public")
+            await a.publish({"n": 3}, retain="state:default:live")
+            await a.publish({"n": 4})
+            await wait_until(lambda: len(b.received) == 4)
+            assert b.received == [{"n": 1}, {"n": 2}, {"n": 3}, {"n": 4}]
+            # The publisher handles its own updates directly
+            assert a.received == []
+
+            # A worker started later gets the retained messages, in publish order
+            c = await workers("c")
+            await wait_until(lambda: len(c.received) == 2)
+            assert c.received == [{"n": 2}, {"n": 3}]
+            await c.stop()
+        finally:
+            await stop_all(a, b)
+    asyncio.run(scenario())
+
+
+def test_update_replayed_and_received_live_is_delivered_once(workers, redis_server):
+    import redis.asyncio as aioredis
+
+    async def scenario():
+        b = await workers("b")
+        publisher = aioredis.from_url(redis_server[0])
+        try:
+            # What b would find in the hash if "a" published right after b subscribed
+            entry = {"at": time.time(), "message": {"n": 1}}
+            b._retained["settings"] = entry
+            await publisher.publish(b.REDIS_CHANNEL, b.encode({"origin": "a", "retain": "settings", **entry}))
+            await publisher.publish(b.REDIS_CHANNEL, b.encode({"origin": "a", "retain": "settings",
+                                                               "at": entry["at"] + 1, "message": {"n": 2}}))
+            await wait_until(lambda: b.received)
+            await asyncio.sleep(0.1)
+            assert b.received == [{"n": 2}]
+        finally:
+            await publisher.aclose()
+            await b.stop()
+    asyncio.run(scenario())
+
+
+def test_exactly_one_leader_and_failover(workers):
+    async def scenario():
+        a = await workers("a")
+        await wait_until(a.is_leader)
+        b = await workers("b")
+        c = await workers("c")
+        try:
+            await asyncio.sleep(0.3)
+            assert [w.is_leader() for w in (a, b, c)] == [True, False, False]
+            assert b.leader_changes == [] and c.leader_changes == []
+
+            # A clean stop releases the lock, so the next leader does not wait for LEADER_TTL
+            stopped = time.monotonic()
+            await a.stop()
+            await wait_until(lambda: b.is_leader() or c.is_leader(), timeout=0.9)
+            assert time.monotonic() - stopped < 0.9
+            leader, follower = (b, c) if b.is_leader() else (c, b)
+            assert not follower.is_leader()
+
+            # A leader that dies without releasing the lock is replaced once it expires
+            for task in leader._state["tasks"]:
+                task.cancel()
+            await asyncio.gather(*leader._state["tasks"], return_exceptions=True)
+            leader._state["tasks"] = []
+            await wait_until(follower.is_leader, timeout=3)
+        finally:
+            await stop_all(a, b, c)
+    asyncio.run(scenario())
+
+
+def test_workers_reconnect_and_restore_state_after_redis_restart(workers, redis_server):
+    _, restart = redis_server
+    if restart is None:
+        pytest.skip("cannot restart a server the test did not start")
+
+    async def scenario():
+        a = await workers("a")
+        b = await workers("b")
+        try:
+            await a.publish({"n": 1}, retain="settings")
+            await wait_until(lambda: b.received == [{"n": 1}])
+
+            await asyncio.get_running_loop().run_in_executor(None, restart)
+            await wait_until(lambda: a.backplane_stats["reconnects"] and b.backplane_stats["reconnects"])
+            await wait_until(lambda: a.get_status()["connected"] and b.get_status()["connected"])
+            await wait_until(lambda: a.is_leader() or b.is_leader())
+
+            await b.publish({"n": 2})
+            await wait_until(lambda: {"n": 2} in a.received)
+
+            # The emptied server got the retained state back from the workers
+            c = await workers("c")
+            await wait_until(lambda: c.received == [{"n": 1}])
+            await c.stop()
+        finally:
+            await stop_all(a, b)
+    asyncio.run(scenario())
@@ -0,0 +1,64 @@
+"""
+Heartbeats close silent connections only if they speak the ping protocol.
+
+Sends and closes are recorded instead of going to a socket; check_heartbeats
+is called with explicit times.
+"""
+import pytest
+import connection_registry
+
+
+class FakeSocket:
+    client = None
+    headers = {}
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Messages sent and sockets closed by the registry."""
+    calls = {"pings": [], "closed": []}
+    monkeypatch.setattr(connection_registry.broadcaster, "send",
+                        lambda ws, msg: calls["pings"].append((ws, msg)))
+    monkeypatch.setattr(connection_registry.broadcaster, "close",
+                        lambda ws, code, reason: calls["closed"].append((ws, code)))
+    monkeypatch.setattr(connection_registry, "_connections", {})
+    return calls
+
+
+def register(connected_at):
+    ws = FakeSocket()
+    info = connection_registry.register(ws, "default", "public")
+    info.update({"connected_at": connected_at, "last_seen": connected_at})
+    return ws
+
+
+def test_client_without_pong_support_is_not_closed(sent):
+    ws = register(1000)
+    for now in range(1015, 1200, 15):
+        connection_registry.check_heartbeats(now)
+    assert sent["closed"] == []
+    # Pings keep going out; the first answer turns the timeout on
+    assert len(sent["pings"]) == 13
+    assert ws in connection_registry._connections
+
+
+def test_client_that_answered_then_went_silent_is_closed(sent):
+    ws = register(1000)
+    connection_registry.check_heartbeats(1015)
+    connection_registry.record_pong(ws, {"type": "pong", "id": 1})
+    connection_registry._connections[ws]["last_seen"] = 1016
+
+    connection_registry.check_heartbeats(1060)
+    assert sent["closed"] == []
+    connection_registry.check_heartbeats(1062)
+    assert sent["closed"] == [(ws, 4408)]
+    assert ws not in connection_registry._connections
+
+
+def test_answering_client_stays_connected(sent):
+    ws = register(1000)
+    for now in range(1015, 1200, 15):
+        connection_registry.check_heartbeats(now)
+        connection_registry.record_pong(ws, {"type": "pong", "id": connection_registry._connections[ws]["ping_id"]})
+        connection_registry.touch(ws)
+    assert sent["closed"] == []
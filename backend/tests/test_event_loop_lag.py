@@ -0,0 +1,55 @@
+"""
+The event loop keeps serving while a workbook is refreshed.
+
+Reading and parsing run through run_io/run_parse, so a ticker task that
+sleeps a few milliseconds at a time must keep waking up on time while a
+large generated workbook goes through refresh_local_file. Parsing on the
+loop would stall it for the whole parse, so the allowed lag is a share of
+the parse time, which leaves room for scheduler noise on a busy machine.
+"""
+import time
+import asyncio
+import pytest
+from results_parser import parse_results_from_excel
+from workbook_generator import make_workbook
+
+TICK = 0.005      # seconds the ticker sleeps
+MIN_LAG = 0.05    # the ticker may always oversleep this long
+LAG_SHARE = 0.5   # and up to this share of the time one parse takes
+
+
+async def sample_lag(done, lags):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+def test_refresh_does_not_block_the_event_loop(main, source, tmp_path):
+    content = make_workbook(competitors=1500, scored=1200, hidden_sheets=2, seed=7)
+    path = tmp_path / "results.xlsx"
+    path.write_bytes(content)
+
+    start = time.perf_counter()
+    parse_results_from_excel(file_bytes=content)
+    max_lag = LAG_SHARE * (time.perf_counter() - start)
+    if max_lag < MIN_LAG:
+        pytest.skip("parsing the workbook is too fast here to show a stall")
+
+    main.sources[source]["current_file"] = str(path)
+
+    async def run():
+        done, lags = asyncio.Event(), []
+        ticker = asyncio.create_task(sample_lag(done, lags))
+        await asyncio.sleep(TICK * 4)
+        try:
+            assert await main.refresh_local_file(source, str(path))
+        finally:
+            done.set()
+            await ticker
+        return lags
+
+    lags = asyncio.run(run())
+    assert main.sources[source]["live"]["competitors"]
+    assert len(lags) > 10
+    assert max(lags) < max_lag, f"event loop stalled for {max(lags) * 1000:.0f}ms"
@@ -0,0 +1,202 @@
+"""
+Retries and conditional fetches against a stand-in Graph server.
+
+httpx.MockTransport answers in place of graph.microsoft.com and records
+every request; sleeps between retries are recorded instead of waited out.
+"""
+import asyncio
+import time
+import httpx
+import pytest
+import http_client
+import refresh_scheduler
+from workbook_generator import make_workbook
+
+SHARE_URL = "https://1drv.ms/x/test"
+DRIVE_ID, ITEM_ID = "test-drive", "test-item"
+
+
+class FakeGraph:
+    """Serves one workbook item; tests change its tags and content to simulate a save."""
+
+    def __init__(self):
+        self.requests = []
+        self.content = make_workbook(competitors=10, seed=1)
+        self.etag = '"{item},1"'
+        self.ctag = '"c:{item},1"'
+        self.metadata_status = []   # statuses (with headers) to answer metadata requests with first
+
+    def __call__(self, request):
+        self.requests.append(request)
+        path = request.url.path
+        if "/shares/" in path:
+            return httpx.Response(200, json={"id": ITEM_ID, "parentReference": {"driveId": DRIVE_ID}})
+        if path == f"/v1.0/drives/{DRIVE_ID}/items/{ITEM_ID}":
+            if self.metadata_status:
+                status, headers = self.metadata_status.pop(0)
+                return httpx.Response(status, headers=headers)
+            if request.headers.get("If-None-Match") == self.etag:
+                return httpx.Response(304)
+            return httpx.Response(200, json={
+                "id": ITEM_ID,
+                "eTag": self.etag,
+                "cTag": self.ctag,
+                "size": len(self.content),
+                "lastModifiedDateTime": "2025-01-01T10:00:00Z",
+                "@microsoft.graph.downloadUrl": f"https://download.invalid/{ITEM_ID}"
+            })
+        if request.url.host == "download.invalid":
+            return httpx.Response(200, content=self.content)
+        return httpx.Response(404, json={"error": {"code": "itemNotFound"}})
+
+    def downloads(self):
+        return [r for r in self.requests if r.url.host == "download.invalid"]
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record retry sleeps instead of waiting."""
+    recorded = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        recorded.append(delay)
+        await real_sleep(0)
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(time, "sleep", recorded.append)
+    return recorded
+
+
+@pytest.fixture
+def graph(monkeypatch, main):
+    fake = FakeGraph()
+    transport = httpx.MockTransport(fake)
+    monkeypatch.setitem(http_client._clients, "async", httpx.AsyncClient(transport=transport))
+    monkeypatch.setitem(http_client._clients, "sync", httpx.Client(transport=transport))
+    monkeypatch.setattr(main, "get_user_token", lambda: "test-token")
+    return fake
+
+
+def replies(*responses):
+    """A transport handler answering with the given responses in order."""
+    queue = list(responses)
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return queue.pop(0)
+    handler.seen = seen
+    return handler
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retry_after_is_honoured(monkeypatch, sleeps, status):
+    handler = replies(httpx.Response(status, headers={"Retry-After": "7"}), httpx.Response(200))
+    monkeypatch.setitem(http_client._clients, "async", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    response = asyncio.run(http_client.request("GET", "https://graph.invalid/item"))
+    assert response.status_code == 200
+    assert len(handler.seen) == 2
+    assert sleeps == [7]
+
+
+def test_retry_without_retry_after_backs_off_and_caps(monkeypatch, sleeps):
+    handler = replies(httpx.Response(503), httpx.Response(429, headers={"Retry-After": "3600"}),
+                      httpx.Response(503), httpx.Response(503))
+    monkeypatch.setitem(http_client._clients, "async", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    response = asyncio.run(http_client.request("GET", "https://graph.invalid/item"))
+    # The last attempt's response is returned as is
+    assert response.status_code == 503
+    assert len(handler.seen) == http_client.MAX_RETRIES + 1
+    assert sleeps == [http_client.BACKOFF_BASE, http_client.MAX_RETRY_AFTER, http_client.BACKOFF_BASE * 4]
+
+
+def test_sync_retry_after_is_honoured(monkeypatch, sleeps):
+    handler = replies(httpx.Response(429, headers={"Retry-After": "2"}), httpx.Response(200))
+    monkeypatch.setitem(http_client._clients, "sync", httpx.Client(transport=httpx.MockTransport(handler)))
+
+    assert http_client.request_sync("GET", "https://www.worldskate.invalid/").status_code == 200
+    assert sleeps == [2]
+
+
+@pytest.mark.parametrize("method", ["POST", "PATCH"])
+def test_non_idempotent_requests_are_not_retried(monkeypatch, sleeps, method):
+    handler = replies(httpx.Response(503), httpx.Response(200))
+    monkeypatch.setitem(http_client._clients, "async", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    response = asyncio.run(http_client.request(method, "https://graph.invalid/item/workbook/createSession"))
+    assert response.status_code == 503
+    assert len(handler.seen) == 1
+    assert not sleeps
+
+
+def test_opted_in_and_unsent_requests_are_retried(monkeypatch, sleeps):
+    handler = replies(httpx.Response(503), httpx.Response(200))
+    monkeypatch.setitem(http_client._clients, "async", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    assert asyncio.run(http_client.request("PATCH", "https://graph.invalid/sub", idempotent=True)).status_code == 200
+
+    # A POST whose connection failed never reached the server, so it is safe to send again
+    attempts = []
+
+    def refuse_once(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(201)
+    monkeypatch.setitem(http_client._clients, "sync", httpx.Client(transport=httpx.MockTransport(refuse_once)))
+    assert http_client.request_sync("POST", "https://graph.invalid/subscriptions").status_code == 201
+    assert len(attempts) == 2
+
+    def read_timeout(request):
+        raise httpx.ReadTimeout("no response", request=request)
+    monkeypatch.setitem(http_client._clients, "sync", httpx.Client(transport=httpx.MockTransport(read_timeout)))
+    with pytest.raises(httpx.ReadTimeout):
+        http_client.request_sync("POST", "https://graph.invalid/subscriptions")
+    assert sleeps == [http_client.BACKOFF_BASE, http_client.BACKOFF_BASE]
+
+
+def test_conditional_fetch_sends_etag_and_skips_download_on_304(main, source, graph):
+    source = main.sources[source]
+    content = asyncio.run(main.download_latest_excel(SHARE_URL, only_if_changed=True, source=source))
+    assert content == graph.content
+    assert source["etag"] == graph.etag and source["ctag"] == graph.ctag
+    assert len(graph.downloads()) == 1
+
+    graph.requests.clear()
+    assert asyncio.run(main.download_latest_excel(SHARE_URL, only_if_changed=True, source=source)) is None
+    metadata, = graph.requests
+    assert metadata.headers["If-None-Match"] == graph.etag
+    assert not graph.downloads()
+
+
+def test_same_ctag_skips_download(main, source, graph):
+    source = main.sources[source]
+    asyncio.run(main.download_latest_excel(SHARE_URL, only_if_changed=True, source=source))
+
+    # A metadata-only save: new eTag, same content tag
+    graph.etag = '"{item},2"'
+    graph.requests.clear()
+    assert asyncio.run(main.download_latest_excel(SHARE_URL, only_if_changed=True, source=source)) is None
+    assert not graph.downloads()
+    assert source["etag"] == graph.etag
+
+    # A content change downloads again
+    graph.etag, graph.ctag = '"{item},3"', '"c:{item},3"'
+    graph.content = make_workbook(competitors=10, scored=7, seed=1)
+    assert asyncio.run(main.download_latest_excel(SHARE_URL, only_if_changed=True, source=source)) == graph.content
+    assert len(graph.downloads()) == 1
+
+
+def test_throttled_poll_pauses_until_retry_after(main, source, graph, sleeps):
+    source_id, source = source, main.sources[source]
+    asyncio.run(main.download_latest_excel(SHARE_URL, source=source))
+
+    graph.metadata_status.append((429, {"Retry-After": "120"}))
+    before = time.time()
+    asyncio.run(main.refresh_watched_file([source_id]))
+    # Polls are not retried; the schedule waits out the Retry-After instead
+    assert not sleeps
+    assert source["schedule"]["mode"] == "throttled"
+    assert source["schedule"]["throttled_until"] >= before + 120
+    assert not refresh_scheduler.is_due(source["schedule"], before + 119)
@@ -0,0 +1,142 @@
+"""
+The Graph change notification webhook, driven by a stand-in notifier.
+
+The tests post what Graph would post to /graph/notifications: the
+validation handshake and notification batches with a right or wrong
+clientState. Subscription calls go to an httpx.MockTransport.
+"""
+import json
+import asyncio
+from datetime import datetime, timedelta, timezone
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+import graph_notifications
+import http_client
+
+SUBSCRIPTION_ID = "sub-1"
+
+
+@pytest.fixture
+def notifier(main, monkeypatch):
+    """A client posting to the webhook, with a subscription in place."""
+    for key, value in {"id": SUBSCRIPTION_ID, "resource": "/drives/d/root", "notification_count": 0,
+                       "expires_at": datetime.now(timezone.utc) + timedelta(days=1)}.items():
+        monkeypatch.setitem(graph_notifications.subscription_state, key, value)
+    main.file_changed_event.clear()
+    yield TestClient(main.app)
+    main.file_changed_event.clear()
+
+
+def notification(client_state, subscription_id=SUBSCRIPTION_ID):
+    return {"value": [{
+        "subscriptionId": subscription_id,
+        "clientState": client_state,
+        "changeType": "updated",
+        "resource": "/drives/d/root"
+    }]}
+
+
+def test_validation_token_is_echoed(notifier, main):
+    response = notifier.post("/graph/notifications?validationToken=Validation%3A+Testing+client+application")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text == "Validation: Testing client application"
+    assert not main.file_changed_event.is_set()
+
+
+def test_wrong_client_state_is_rejected(notifier, main):
+    response = notifier.post("/graph/notifications", json=notification("not-our-secret"))
+    assert response.status_code == 202
+    assert not main.file_changed_event.is_set()
+    assert graph_notifications.subscription_state["notification_count"] == 0
+
+
+def test_foreign_subscription_is_ignored(notifier, main):
+    client_state = graph_notifications.subscription_state["client_state"]
+    notifier.post("/graph/notifications", json=notification(client_state, "someone-elses"))
+    assert not main.file_changed_event.is_set()
+
+
+def test_matching_notification_wakes_the_update_checker(notifier, main):
+    client_state = graph_notifications.subscription_state["client_state"]
+    response = notifier.post("/graph/notifications", json=notification(client_state))
+    assert response.status_code == 202
+    assert main.file_changed_event.is_set()
+    assert graph_notifications.subscription_state["notification_count"] == 1
+
+
+def test_invalid_payload_is_400(notifier, main):
+    response = notifier.post("/graph/notifications", content=b"not json",
+                             headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert not main.file_changed_event.is_set()
+
+
+def test_subscription_is_created_then_renewed(monkeypatch):
+    calls = []
+
+    def graph(request):
+        calls.append(request)
+        body = json.loads(request.content)
+        return httpx.Response(201 if request.method == "POST" else 200, json={
+            "id": SUBSCRIPTION_ID,
+            "expirationDateTime": body["expirationDateTime"]
+        })
+    monkeypatch.setitem(http_client._clients, "async", httpx.AsyncClient(transport=httpx.MockTransport(graph)))
+    for key in ("id", "resource", "expires_at"):
+        monkeypatch.setitem(graph_notifications.subscription_state, key, None)
+
+    assert asyncio.run(graph_notifications.ensure_subscription("token", "d", "https://example.invalid/hook"))
+    created = json.loads(calls[0].content)
+    assert calls[0].method == "POST"
+    assert created["clientState"] == graph_notifications.subscription_state["client_state"]
+    assert created["notificationUrl"] == "https://example.invalid/hook"
+    assert graph_notifications.is_active()
+
+    # Close to expiry the subscription is renewed, not created again
+    graph_notifications.subscription_state["expires_at"] = datetime.now(timezone.utc) + timedelta(hours=1)
+    assert asyncio.run(graph_notifications.ensure_subscription("token", "d", "https://example.invalid/hook"))
+    assert [call.method for call in calls] == ["POST", "PATCH"]
+    assert calls[1].url.path.endswith(f"/subscriptions/{SUBSCRIPTION_ID}")
+    assert graph_notifications.subscription_state["expires_at"] > datetime.now(timezone.utc) + timedelta(days=1)
+
+
+def test_follower_validates_with_the_leaders_client_state(notifier, main, monkeypatch):
+    monkeypatch.setitem(graph_notifications.subscription_state, "client_state", "follower-secret")
+    leader = {"id": "sub-leader", "resource": "/drives/d/root", "client_state": "leader-secret",
+              "expires_at": (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()}
+    asyncio.run(main.handle_backplane_message({"kind": "subscription", "subscription": leader}))
+    assert graph_notifications.is_active()
+
+    notifier.post("/graph/notifications", json=notification("follower-secret", "sub-leader"))
+    assert not main.file_changed_event.is_set()
+    notifier.post("/graph/notifications", json=notification("leader-secret", "sub-leader"))
+    assert main.file_changed_event.is_set()
+
+
+def test_leader_shares_a_new_or_renewed_subscription(main, monkeypatch):
+    published = []
+
+    async def publish(message, retain=None):
+        published.append((message, retain))
+
+    def graph(request):
+        body = json.loads(request.content)
+        return httpx.Response(201, json={"id": SUBSCRIPTION_ID, "expirationDateTime": body["expirationDateTime"]})
+    monkeypatch.setattr(main.backplane, "publish", publish)
+    monkeypatch.setattr(main, "get_user_token", lambda: "test-token")
+    monkeypatch.setitem(main.PUSH_SETTINGS, "notification_url", "https://example.invalid/hook")
+    monkeypatch.setitem(http_client._clients, "async", httpx.AsyncClient(transport=httpx.MockTransport(graph)))
+    for key in ("id", "resource", "expires_at"):
+        monkeypatch.setitem(graph_notifications.subscription_state, key, None)
+
+    asyncio.run(main.update_graph_subscription("d"))
+    (message, retain), = published
+    assert retain == "subscription"
+    assert message["subscription"]["id"] == SUBSCRIPTION_ID
+    assert message["subscription"]["client_state"] == graph_notifications.subscription_state["client_state"]
+
+    # Nothing changed, nothing to share
+    asyncio.run(main.update_graph_subscription("d"))
+    assert len(published) == 1
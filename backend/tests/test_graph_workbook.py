@@ -0,0 +1,137 @@
+"""
+Range reads through the Graph workbook API, against a stand-in Graph server.
+
+The stand-in answers usedRange requests from the same generated workbook
+it serves for download, so both ingest engines see the same data.
+"""
+import re
+import asyncio
+from io import BytesIO
+import httpx
+import pytest
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+import http_client
+import graph_workbook
+from results_parser import parse_results_from_excel
+from workbook_generator import make_workbook
+from test_graph_fetch import FakeGraph, SHARE_URL, DRIVE_ID, ITEM_ID, sleeps  # noqa: F401
+
+WORKBOOK_PATH = f"/v1.0/drives/{DRIVE_ID}/items/{ITEM_ID}/workbook"
+USED_RANGE = re.compile(re.escape(WORKBOOK_PATH) + r"/worksheets/(.+)/usedRange\(valuesOnly=true\)$")
+
+
+def used_range(content, sheet):
+    """What Graph answers for a sheet's used range: the bounding box of non-empty cells."""
+    wb = load_workbook(BytesIO(content), data_only=True)
+    if sheet not in wb.sheetnames:
+        return None
+    cells = [c for row in wb[sheet].iter_rows() for c in row if c.value is not None]
+    top, bottom = min(c.row for c in cells), max(c.row for c in cells)
+    left, right = min(c.column for c in cells), max(c.column for c in cells)
+    values = [[""] * (right - left + 1) for _ in range(bottom - top + 1)]
+    for c in cells:
+        values[c.row - top][c.column - left] = c.value
+    address = f"'{sheet}'!{get_column_letter(left)}{top}:{get_column_letter(right)}{bottom}"
+    return {"address": address, "values": values}
+
+
+class FakeWorkbookGraph(FakeGraph):
+    """Also serves workbook sessions and used ranges; tests expire sessions or break range reads."""
+
+    def __init__(self):
+        super().__init__()
+        self.sessions = []
+        self.expired = set()
+        self.range_status = None
+
+    def __call__(self, request):
+        path = request.url.path
+        if path == f"{WORKBOOK_PATH}/createSession":
+            self.requests.append(request)
+            self.sessions.append(f"session-{len(self.sessions) + 1}")
+            return httpx.Response(201, json={"id": self.sessions[-1], "persistChanges": False})
+        match = USED_RANGE.match(path)
+        if match:
+            self.requests.append(request)
+            if request.headers.get("workbook-session-id") in self.expired:
+                return httpx.Response(404, json={"error": {"code": "InvalidSessionNotFound"}})
+            if self.range_status:
+                return httpx.Response(self.range_status, json={"error": {"code": "generalException"}})
+            data = used_range(self.content, match.group(1))
+            if data is None:
+                return httpx.Response(404, json={"error": {"code": "ItemNotFound"}})
+            return httpx.Response(200, json=data)
+        return super().__call__(request)
+
+    def range_reads(self):
+        return [r for r in self.requests if USED_RANGE.match(r.url.path)]
+
+
+@pytest.fixture
+def graph(monkeypatch, main):
+    fake = FakeWorkbookGraph()
+    transport = httpx.MockTransport(fake)
+    monkeypatch.setitem(http_client._clients, "async", httpx.AsyncClient(transport=transport))
+    monkeypatch.setattr(main, "get_user_token", lambda: "test-token")
+    monkeypatch.setattr(main, "RANGE_READS_ENABLED", True)
+    monkeypatch.setattr(graph_workbook, "_sessions", {})
+    monkeypatch.setattr(graph_workbook, "range_stats", dict.fromkeys(graph_workbook.range_stats, 0))
+    return fake
+
+
+def fetch(main, source):
+    return asyncio.run(main.fetch_latest_results(SHARE_URL, only_if_changed=True, source=source))
+
+
+def save(graph, version, **workbook):
+    """Simulate a judge saving the workbook with new content."""
+    graph.etag, graph.ctag = f'"{{item}},{version}"', f'"c:{{item}},{version}"'
+    graph.content = make_workbook(**workbook)
+
+
+def test_range_read_matches_parsing_the_download(main, source, graph):
+    save(graph, 2, competitors=30, scored=12, seed=3)
+    result = fetch(main, main.sources[source])
+
+    assert result == parse_results_from_excel(file_bytes=graph.content)
+    assert len(result[2]) >= 12
+    assert not graph.downloads()
+    assert len(graph.range_reads()) == 2
+    assert main.sources[source]["etag"] == graph.etag
+
+    # The session is reused by the next poll
+    save(graph, 3, competitors=30, scored=13, seed=3)
+    assert fetch(main, main.sources[source]) == parse_results_from_excel(file_bytes=graph.content)
+    assert graph.sessions == ["session-1"]
+
+
+def test_expired_session_is_replaced(main, source, graph):
+    fetch(main, main.sources[source])
+    graph.expired.add("session-1")
+
+    save(graph, 2, competitors=10, scored=7, seed=1)
+    assert fetch(main, main.sources[source]) == parse_results_from_excel(file_bytes=graph.content)
+    assert graph.sessions == ["session-1", "session-2"]
+    assert graph_workbook.range_stats["session_errors"] == 1
+    assert graph_workbook._sessions[(DRIVE_ID, ITEM_ID)]["id"] == "session-2"
+    assert not graph.downloads()
+
+
+def test_failed_range_read_falls_back_to_the_download(main, source, graph, sleeps):
+    fetch(main, main.sources[source])
+
+    save(graph, 2, competitors=10, scored=8, seed=1)
+    graph.range_status = 500
+    assert fetch(main, main.sources[source]) == parse_results_from_excel(file_bytes=graph.content)
+    assert len(graph.downloads()) == 1
+    assert graph_workbook.range_stats["fallbacks"] == 1
+    assert main.sources[source]["etag"] == graph.etag
+    # The session is not trusted after the error
+    assert (DRIVE_ID, ITEM_ID) not in graph_workbook._sessions
+
+    graph.range_status = None
+    save(graph, 3, competitors=10, scored=9, seed=1)
+    assert fetch(main, main.sources[source]) == parse_results_from_excel(file_bytes=graph.content)
+    assert len(graph.downloads()) == 1
+    assert graph.sessions == ["session-1", "session-2"]
@@ -0,0 +1,42 @@
+"""
+The public snapshot document carries its stream seq and is revalidated by it.
+
+Public updates go through main.broadcast_state like in the server; the
+source has no sockets, so nothing is sent.
+"""
+import asyncio
+from fastapi.testclient import TestClient
+import public_feed
+
+
+def publish(main, source_id, **changes):
+    main.sources[source_id]["public"].update(changes)
+    asyncio.run(main.broadcast_state(source_id, "public"))
+
+
+def test_snapshot_has_seq_and_etag_follows_it(main, source):
+    client = TestClient(main.app)
+    publish(main, source, category="Senior Women")
+
+    response = client.get("/public/snapshot", params={"source": source})
+    document = response.json()
+    assert document["source"] == source
+    assert document["seq"] == 1
+    assert document["data"]["category"] == "Senior Women"
+    etag = response.headers["etag"]
+    assert etag == public_feed.document_etag(source, 1)
+
+    # Revalidation of the same version is answered without encoding the document again
+    encoded = public_feed.feed_stats["documents_encoded"]
+    response = client.get("/public/snapshot", params={"source": source}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert public_feed.feed_stats["documents_encoded"] == encoded
+
+    # The next version has the next seq, so the old tag no longer matches
+    publish(main, source, category="Senior Men")
+    response = client.get("/public/snapshot", params={"source": source}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["seq"] == 2
+    assert response.json()["data"]["category"] == "Senior Men"
+    assert response.headers["etag"] == public_feed.document_etag(source, 2) != etag
@@ -0,0 +1,28 @@
+"""
+The rankings download reports completion however it ends, so the page
+polling /rankings/progress stops. No request leaves the machine.
+"""
+import httpx
+import pytest
+import rankings
+
+
+def fail_request(method, url, **kwargs):
+    raise httpx.ConnectError("no network", request=httpx.Request(method, url))
+
+
+def page_without_archives(method, url, **kwargs):
+    return httpx.Response(200, text="<html><body>maintenance</body></html>", request=httpx.Request(method, url))
+
+
+@pytest.mark.parametrize("request_sync, error", [
+    (fail_request, httpx.ConnectError),
+    (page_without_archives, ValueError),
+])
+def test_failed_fetch_is_complete(monkeypatch, request_sync, error):
+    monkeypatch.setattr(rankings, "request_sync", request_sync)
+    with pytest.raises(error):
+        rankings.fetch_rankings("https://rankings.example.invalid")
+    progress = rankings.get_download_progress()
+    assert progress["is_complete"]
+    assert progress["active_disciplines"] == []
@@ -0,0 +1,83 @@
+"""
+The rankings index is read from memory and only swapped by reload().
+
+The rankings folders are written to a temporary directory in the layout
+fetch_rankings leaves behind.
+"""
+import os
+import threading
+import pytest
+from fastapi.testclient import TestClient
+import rankings_index
+
+
+def write_folder(main_dir, folder, skaters):
+    path = main_dir / folder
+    path.mkdir(parents=True, exist_ok=True)
+    lines = ['"Rank","Name","Nat.","ID","Best"'] + [
+        f'"{rank}","{name}","FRA","{ws_id}","{100 - rank}"' for rank, (name, ws_id) in enumerate(skaters, 1)
+    ]
+    (path / "Classic_Senior_Women.csv").write_text("\n".join(lines) + "\n")
+    return path
+
+
+@pytest.fixture
+def rankings_dir(tmp_path, monkeypatch):
+    main_dir = tmp_path / "rankings"
+    write_folder(main_dir, "2025-01_January", [("Ann", "101"), ("Bea", "102")])
+    monkeypatch.setitem(rankings_index._current, "index", {"version": None, "folder": None})
+    monkeypatch.setitem(rankings_index.index_stats, "loads", 0)
+    return main_dir
+
+
+def test_requests_do_not_touch_the_disk(main, rankings_dir, monkeypatch):
+    rankings_index.reload(rankings_dir)
+
+    def no_disk(*args):
+        raise AssertionError("rankings request touched the disk")
+    monkeypatch.setattr(os, "listdir", no_disk)
+    monkeypatch.setattr(os, "scandir", no_disk)
+    monkeypatch.setattr(os, "stat", no_disk)
+    client = TestClient(main.app)
+    response = client.get("/api/rankings/Classic_Senior_Women")
+    assert response.status_code == 200
+    assert [row["name"] for row in response.json()["rankings"]] == ["Ann", "Bea"]
+    assert client.get("/api/rankings/all/combined").json()["rankings"]["Classic_Senior_Women"]["102"]["rank"] == 2
+
+
+def test_reload_swaps_only_when_the_folder_changed(rankings_dir):
+    first = rankings_index.reload(rankings_dir)
+    assert rankings_index.reload(rankings_dir) is first
+    assert rankings_index.index_stats["loads"] == 1
+
+    # fetch_rankings rewrote the month's files in place
+    csv_file = write_folder(rankings_dir, "2025-01_January", [("Cid", "103")]) / "Classic_Senior_Women.csv"
+    stat = os.stat(csv_file)
+    os.utime(csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    rewritten = rankings_index.reload(rankings_dir)
+    assert rewritten is not first
+    assert rewritten["disciplines"]["Classic_Senior_Women"]["name"] == ["Cid"]
+
+    # A new month's folder
+    write_folder(rankings_dir, "2025-02_February", [("Dee", "104")])
+    assert rankings_index.reload(rankings_dir)["latest_update"] == "2025-02_February"
+    assert rankings_index._current["index"]["latest_update"] == "2025-02_February"
+
+
+def test_concurrent_reloads_build_once(rankings_dir):
+    start = threading.Barrier(4)
+
+    def reload():
+        start.wait()
+        rankings_index.reload(rankings_dir)
+    threads = [threading.Thread(target=reload) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert rankings_index.index_stats["loads"] == 1
+
+
+def test_reload_endpoint_waits_for_a_running_download(main, monkeypatch):
+    monkeypatch.setitem(main.rankings_update, "running", True)
+    assert TestClient(main.app).post("/api/rankings/reload").status_code == 409
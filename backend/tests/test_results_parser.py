@@ -0,0 +1,50 @@
+"""
+The column-wise results parser returns what the original pandas parser did.
+
+legacy_parse in benchmarks/bench_results_parser.py is the implementation
+results_parser.py replaced; it is the reference for generated workbooks
+of different sizes and shapes.
+"""
+from io import BytesIO
+import pytest
+from openpyxl import load_workbook
+import results_parser
+from bench_results_parser import legacy_parse
+from workbook_generator import make_workbook
+
+WORKBOOKS = {
+    "small": dict(competitors=8, seed=1),
+    "half-scored": dict(competitors=200, seed=2),
+    "all-scored": dict(competitors=60, scored=60, seed=3),
+    "none-scored": dict(competitors=30, scored=0, seed=4),
+    "partial-and-remarks": dict(competitors=120, seed=5, partial_rate=0.5, remark_rate=0.6),
+    "hidden-sheets": dict(competitors=40, seed=6, hidden_sheets=3, hidden_rows=50),
+}
+
+
+@pytest.fixture(params=list(WORKBOOKS), ids=list(WORKBOOKS))
+def workbook(request):
+    return make_workbook(**WORKBOOKS[request.param])
+
+
+def test_matches_legacy_parser(workbook):
+    expected = legacy_parse(workbook)
+    assert results_parser.parse_results_from_excel(file_bytes=workbook) == expected
+
+
+def test_rows_path_matches_workbook_path(workbook):
+    # Range reads feed the same tables into parse_results_from_rows
+    wb = load_workbook(BytesIO(workbook), read_only=True, data_only=True)
+    results_rows = results_parser.read_sheet_rows(wb[results_parser.RESULTS_SHEET])
+    marks_rows = results_parser.read_sheet_rows(wb[results_parser.MARKS_SHEET])
+    wb.close()
+    assert (results_parser.parse_results_from_rows(results_rows, marks_rows)
+            == results_parser.parse_results_from_excel(file_bytes=workbook))
+
+
+def test_last_skater_is_marked():
+    content = make_workbook(competitors=20, scored=9, partial_rate=0, seed=8)
+    discipline, category, competitors = results_parser.parse_results_from_excel(file_bytes=content)
+    assert (discipline, category) == ("Classic", "Senior Women")
+    last = [c["name"] for c in competitors if c["last_skater"]]
+    assert last == ["Skater 0008"]
@@ -0,0 +1,43 @@
+"""
+Source-scoped endpoints refuse unknown sources instead of creating them.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from workbook_generator import make_workbook
+
+
+@pytest.fixture
+def client(main):
+    # Without the context manager the startup tasks (polling, heartbeats) do not run
+    return TestClient(main.app)
+
+
+def source_ids(client):
+    return [s["id"] for s in client.get("/sources").json()["sources"]]
+
+
+def test_load_excel_into_unknown_source_is_404(client):
+    response = client.post("/load_excel?source=nope", json={"path": "/does/not/exist.xlsx"})
+    assert response.status_code == 404
+    assert "nope" not in source_ids(client)
+
+
+def test_failed_create_leaves_no_source(client, tmp_path):
+    response = client.post("/sources", json={"id": "rink-2", "path": str(tmp_path / "missing.xlsx")})
+    assert response.status_code == 400
+    assert "rink-2" not in source_ids(client)
+
+
+def test_load_excel_into_created_source(client, tmp_path):
+    path = tmp_path / "rink-3.xlsx"
+    path.write_bytes(make_workbook(competitors=12, seed=3))
+
+    response = client.post("/sources", json={"id": "rink-3", "path": str(path)})
+    try:
+        assert response.status_code == 200
+        response = client.post("/load_excel?source=rink-3", json={"path": str(path)})
+        assert response.status_code == 200
+        assert response.json()["source"] == "rink-3"
+    finally:
+        client.delete("/sources/rink-3")
+    assert "rink-3" not in source_ids(client)
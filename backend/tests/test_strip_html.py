@@ -0,0 +1,65 @@
+"""
+strip_html gives the same text as BeautifulSoup for every cell.
+
+The regex path must match get_text(strip=True) exactly; whatever it cannot
+match (unknown entity names, bare "&", unusual code points, comments) goes
+to the BeautifulSoup fallback.
+"""
+import random
+from html.entities import html5
+import pytest
+import rankings
+from bench_strip_html import generated_payload
+
+TRICKY = [
+    "&NotAnEntity;", "&ampx;", "&notit;", "&Amp;", "<b>&NotAnEntity;</b>", "AT&T", "a & b", "&amp", "&;", "&#;",
+    "&#x;", "&#1;", "&#0;", "&#13;", "&#128;", "&#xFFFF;", "&#xD800;", "&#x1F600;", "&#99999999999;",
+    "a &amp; b", "&nbsp;x", "&AMP;", "&notin;", "&lt;b&gt;", "<!-- note -->x", "<a title='1 > 0'>x</a>",
+    "<script>x</script>y", "1 < 2", "  <span> 12 </span>  ",
+]
+
+
+@pytest.fixture
+def soup_calls(monkeypatch):
+    calls = []
+    soup = rankings.strip_html_soup
+
+    def counting_soup(html_str):
+        calls.append(html_str)
+        return soup(html_str)
+    monkeypatch.setattr(rankings, "strip_html_soup", counting_soup)
+    return calls
+
+
+def assert_same(cells):
+    mismatches = [(cell, rankings.strip_html(cell), rankings.strip_html_soup(cell)) for cell in cells
+                  if rankings.strip_html(cell) != rankings.strip_html_soup(cell)]
+    assert mismatches == []
+
+
+def test_generated_table_matches_soup_without_fallback(soup_calls):
+    cells = [str(cell) for row in generated_payload(500, seed=1)["data"] for cell in row]
+    stripped = [rankings.strip_html(cell) for cell in cells]
+    # The regular World Skate markup takes the fast path
+    assert soup_calls == []
+    assert stripped == [rankings.strip_html_soup(cell) for cell in cells]
+
+
+@pytest.mark.parametrize("cell", TRICKY)
+def test_tricky_cells_match_soup(cell):
+    assert_same([cell])
+
+
+def test_every_html5_entity_matches_soup():
+    assert_same(cell for name in html5 for cell in (f"&{name}", f"a&{name}b", f"<i>&{name}</i>"))
+
+
+def test_numeric_references_match_soup():
+    codes = [*range(0, 0x300), *range(0xd7f0, 0xe010), *range(0xfdc0, 0xfe00), *range(0xfff0, 0x10010), 0x10FFFF, 0x110000]
+    assert_same(cell for code in codes for cell in (f"&#{code};", f"x&#x{code:X};y"))
+
+
+def test_random_markup_matches_soup():
+    rnd = random.Random(0)
+    pieces = [*"aA&#;x0159<>b/ ", "&amp;", "&nbsp;", "&notin;", "&#x", "&#", "<b>", "</b>", "&lt;", "&Amp;", "&notit;"]
+    assert_same("".join(rnd.choice(pieces) for _ in range(rnd.randint(1, 12))) for _ in range(5000))
@@ -0,0 +1,149 @@
+"""
+A worker picks up a sign-in that finished on another worker, and a
+pending device-code login does not hold an I/O thread.
+
+The MSAL client is replaced by a stub reading the shared cache object, or
+given a stand-in HTTP client, so no request goes to Azure AD.
+"""
+import os
+import json
+import time
+import base64
+import threading
+import msal
+import pytest
+import token_manager
+
+CLIENT_ID = "00000000-0000-0000-0000-000000000000"
+
+
+def b64(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def signed_in_cache(username):
+    """A token cache as the device-code login leaves it."""
+    now = int(time.time())
+    id_token = ".".join([b64({"alg": "none"}), b64({
+        "iss": "https://login.microsoftonline.com/t/v2.0", "sub": "s", "aud": CLIENT_ID, "oid": "u", "tid": "t",
+        "preferred_username": username, "iat": now, "exp": now + 3600
+    }), "sig"])
+    cache = msal.SerializableTokenCache()
+    cache.add({
+        "client_id": CLIENT_ID,
+        "scope": ["Files.Read"],
+        "token_endpoint": "https://login.microsoftonline.com/common/oauth2/v2.0/token",
+        "response": {"access_token": "at", "expires_in": 3600, "refresh_token": "rt", "token_type": "Bearer",
+                     "id_token": id_token, "client_info": b64({"uid": "u", "utid": "t"})}
+    })
+    return cache
+
+
+class StubClient:
+    def get_accounts(self):
+        return list(token_manager._app["cache"].search(msal.TokenCache.CredentialType.ACCOUNT))
+
+
+@pytest.fixture
+def worker(monkeypatch, tmp_path):
+    """This process's token manager, signed out, with an empty cache file location."""
+    cache_file = tmp_path / "token_cache.json"
+    monkeypatch.setitem(token_manager._settings, "cache_file", str(cache_file))
+    monkeypatch.setitem(token_manager._app, "client", StubClient())
+    monkeypatch.setitem(token_manager._app, "cache", msal.SerializableTokenCache())
+    monkeypatch.setitem(token_manager._app, "cache_mtime", None)
+    return cache_file
+
+
+def write_from_other_worker(cache_file, cache):
+    cache_file.write_text(base64.b64encode(cache.serialize().encode("utf-8")).decode("utf-8"))
+    # Make sure the mtime differs even on coarse file system clocks
+    stat = os.stat(cache_file)
+    os.utime(cache_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_sign_in_on_another_worker_is_picked_up(worker):
+    assert token_manager.get_accounts() == []
+
+    write_from_other_worker(worker, signed_in_cache("judge@example.com"))
+    accounts = token_manager.get_accounts()
+    assert [a["username"] for a in accounts] == ["judge@example.com"]
+
+    # Unchanged file: not read again
+    assert not token_manager.reload_cache_if_changed()
+
+    write_from_other_worker(worker, signed_in_cache("referee@example.com"))
+    assert [a["username"] for a in token_manager.get_accounts()] == ["referee@example.com"]
+
+
+def test_own_write_is_not_read_back(worker):
+    token_manager._app["cache"] = signed_in_cache("judge@example.com")
+    token_manager.save_cache()
+    assert worker.exists()
+    assert not token_manager._app["cache"].has_state_changed
+    assert not token_manager.reload_cache_if_changed()
+    assert not list(worker.parent.glob("*.tmp"))
+
+
+def test_unsaved_changes_are_not_overwritten(worker):
+    write_from_other_worker(worker, signed_in_cache("referee@example.com"))
+    token_manager._app["cache"] = signed_in_cache("judge@example.com")
+    assert token_manager._app["cache"].has_state_changed
+    assert not token_manager.reload_cache_if_changed()
+    assert [a["username"] for a in token_manager.get_accounts()] == ["judge@example.com"]
+
+
+class Reply:
+    def __init__(self, status_code, body):
+        self.status_code, self.text, self.headers = status_code, json.dumps(body), {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class PendingLogin:
+    """Azure AD while nobody has entered the user code yet."""
+    authority = "https://login.microsoftonline.com/common/oauth2/v2.0"
+
+    def __init__(self):
+        self.token_requests = 0
+
+    def get(self, url, **kwargs):
+        return Reply(200, {"authorization_endpoint": f"{self.authority}/authorize",
+                           "token_endpoint": f"{self.authority}/token",
+                           "device_authorization_endpoint": f"{self.authority}/devicecode",
+                           "issuer": "https://login.microsoftonline.com/{tenantid}/v2.0"})
+
+    def post(self, url, **kwargs):
+        if url.endswith("/devicecode"):
+            return Reply(200, {"device_code": "device-code", "user_code": "ABCD1234", "expires_in": 900,
+                               "interval": 5, "verification_uri": "https://microsoft.com/devicelogin",
+                               "message": "Enter ABCD1234"})
+        self.token_requests += 1
+        return Reply(400, {"error": "authorization_pending"})
+
+    def close(self):
+        pass
+
+
+def test_pending_device_flow_is_polled_once(worker, monkeypatch):
+    azure_ad = PendingLogin()
+    client = msal.PublicClientApplication(CLIENT_ID, authority="https://login.microsoftonline.com/common",
+                                          http_client=azure_ad, token_cache=token_manager._app["cache"])
+    monkeypatch.setitem(token_manager._app, "client", client)
+    flow = token_manager.initiate_device_flow()
+
+    # MSAL's own loop would block until the code expires, 15 minutes from now
+    results = []
+    poll = threading.Thread(target=lambda: results.append(token_manager.acquire_by_device_flow(flow)), daemon=True)
+    poll.start()
+    poll.join(timeout=3)
+    assert not poll.is_alive()
+    assert results[0]["error"] == "authorization_pending"
+    assert azure_ad.token_requests == 1
+
+
+def test_device_flow_poll_in_flight_reports_pending(worker):
+    with token_manager._device_flow_lock:
+        assert token_manager.acquire_by_device_flow({"device_code": "x"}) == {"error": "authorization_pending"}
@@ -0,0 +1,243 @@
+"""
+Long-lived MSAL client and the Microsoft Graph access token.
+
+One PublicClientApplication and one token cache live for the whole
+process. The cache is read from token_cache.json and written back only
+when MSAL changed it. A background task refreshes the access token
+REFRESH_BEFORE seconds before it expires, so Graph calls on the polling path
+find a valid token in memory instead of waiting for Azure AD.
+
+With several workers the device-code login can finish on any of them, so
+the cache file is read again whenever its mtime changed since this process
+last read or wrote it; the ingest leader then finds the account that
+another worker signed in.
+"""
+import os
+import base64
+import time
+import asyncio
+import threading
+import msal
+from executors import run_io
+
+REFRESH_BEFORE = 300     # seconds before expiry the background refresh kicks in
+RETRY_INTERVAL = 60      # seconds between attempts after a failed refresh
+
+token_state = {
+    "token": None,
+    "expires_at": 0,
+    "acquired_at": None,     # when the current access token was issued
+    "signed_in_at": None,    # first token of this process (cache or device flow)
+    "origin": None,          # cache, device_flow or refresh
+    "refresh_count": 0,
+    "refresh_failures": 0,
+    "last_refresh": None,
+    "last_error": None,
+    "cache_writes": 0
+}
+
+_settings = {"client_id": None, "authority": None, "scopes": None, "cache_file": None}
+_app = {"client": None, "cache": None, "cache_mtime": None}
+# Serializes silent acquisition so concurrent callers do not refresh twice
+_lock = threading.Lock()
+# At most one device-flow poll at a time; callers arriving meanwhile see it as pending
+_device_flow_lock = threading.Lock()
+
+
+def configure(client_id, authority, scopes, cache_file):
+    _settings.update({"client_id": client_id, "authority": authority, "scopes": scopes, "cache_file": cache_file})
+
+
+def _cache_mtime():
+    try:
+        return os.stat(_settings["cache_file"]).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load_cache(cache):
+    """Load the token cache from its base64-encoded JSON file if it exists."""
+    cache_file = _settings["cache_file"]
+    mtime = _cache_mtime()
+    if mtime is None:
+        print("Token cache file does not exist")
+        return cache
+    try:
+        with open(cache_file, "r") as f:
+            cache.deserialize(base64.b64decode(f.read()).decode("utf-8"))
+        _app["cache_mtime"] = mtime
+        print(f"Loaded token cache from {cache_file}")
+    except Exception as e:
+        print(f"Failed to load token cache: {e}")
+    return cache
+
+
+def reload_cache_if_changed():
+    """Pick up a cache file written by another worker (sign-in or refresh)."""
+    cache = _app["cache"]
+    if cache is None or cache.has_state_changed or _cache_mtime() in (None, _app["cache_mtime"]):
+        return False
+    # The client keeps its reference to the cache object, so reload it in place
+    _load_cache(cache)
+    return True
+
+
+def get_client():
+    """Return the MSAL client, creating it and loading the cache on first use."""
+    if _app["client"] is None:
+        _app["cache"] = _load_cache(msal.SerializableTokenCache())
+        _app["client"] = msal.PublicClientApplication(
+            _settings["client_id"],
+            authority=_settings["authority"],
+            token_cache=_app["cache"]
+        )
+    else:
+        reload_cache_if_changed()
+    return _app["client"]
+
+
+def save_cache():
+    """Write the token cache to disk if MSAL changed it and it holds an account."""
+    cache = _app["cache"]
+    if cache is None or not cache.has_state_changed:
+        return
+    try:
+        if not cache.find(msal.TokenCache.CredentialType.ACCOUNT):
+            return
+        encoded = base64.b64encode(cache.serialize().encode("utf-8")).decode("utf-8")
+        # Write and rename so another worker never reads a half-written file
+        temp_file = f"{_settings['cache_file']}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as f:
+            f.write(encoded)
+        os.replace(temp_file, _settings["cache_file"])
+        _app["cache_mtime"] = _cache_mtime()
+        cache.has_state_changed = False
+        token_state["cache_writes"] += 1
+        print("Saved token cache")
+    except Exception as e:
+        print(f"Failed to save token cache: {e}")
+
+
+def _store(result, origin):
+    now = time.time()
+    token_state.update({
+        "token": result["access_token"],
+        "expires_at": now + result.get("expires_in", 3600),
+        "acquired_at": now,
+        "origin": origin,
+        "last_error": None
+    })
+    if token_state["signed_in_at"] is None:
+        token_state["signed_in_at"] = now
+    save_cache()
+
+
+def cached_token():
+    """The in-memory access token if it is still valid, else None."""
+    if token_state["token"] and time.time() < token_state["expires_at"]:
+        return token_state["token"]
+    return None
+
+
+def clear_token():
+    token_state.update({"token": None, "expires_at": 0, "acquired_at": None, "origin": None})
+
+
+def get_accounts():
+    return get_client().get_accounts()
+
+
+def acquire_silent(force_refresh=False):
+    """
+    Get a token from the cache (refreshing it with the refresh token if needed).
+
+    Returns the access token, or None if there is no account or MSAL needs
+    user interaction. Blocking, so call it through run_io from async code.
+    """
+    with _lock:
+        if not force_refresh and cached_token():
+            return token_state["token"]
+        client = get_client()
+        accounts = client.get_accounts()
+        if not accounts:
+            return None
+        try:
+            result = client.acquire_token_silent_with_error(_settings["scopes"], account=accounts[0],
+                                                           force_refresh=force_refresh)
+        except Exception as e:
+            token_state["last_error"] = str(e)
+            print(f"Error during silent token acquisition: {e}")
+            return None
+        if result and "access_token" in result:
+            _store(result, "refresh" if force_refresh else "cache")
+            return result["access_token"]
+        if result:
+            token_state["last_error"] = result.get("error_description") or result.get("error")
+            print(f"Silent token acquisition failed: {result.get('error')}")
+        return None
+
+
+def initiate_device_flow():
+    return get_client().initiate_device_flow(scopes=_settings["scopes"])
+
+
+def acquire_by_device_flow(flow):
+    """
+    Ask Azure AD once whether the device flow was completed; returns MSAL's result dict.
+
+    MSAL would otherwise keep polling until the code expires, holding an
+    I/O thread for up to 15 minutes. The operator page polls /auth/status
+    every few seconds instead, and an "authorization_pending" error tells it
+    to keep waiting.
+    """
+    if not _device_flow_lock.acquire(blocking=False):
+        return {"error": "authorization_pending"}
+    try:
+        result = get_client().acquire_token_by_device_flow(flow, exit_condition=lambda flow: True)
+    finally:
+        _device_flow_lock.release()
+    if result and "access_token" in result:
+        _store(result, "device_flow")
+    return result
+
+
+async def refresh_loop():
+    """Background task that renews the access token shortly before it expires."""
+    while True:
+        now = time.time()
+        refresh_at = token_state["expires_at"] - REFRESH_BEFORE
+        if token_state["token"] and now >= refresh_at:
+            print("Refreshing Graph access token before it expires")
+            token = await run_io(acquire_silent, True)
+            token_state["last_refresh"] = time.time()
+            if token:
+                token_state["refresh_count"] += 1
+            else:
+                token_state["refresh_failures"] += 1
+                await asyncio.sleep(RETRY_INTERVAL)
+            continue
+        # Nothing to refresh until signed in; otherwise sleep until the refresh is due
+        delay = refresh_at - now if token_state["token"] else RETRY_INTERVAL
+        await asyncio.sleep(max(1, min(delay, RETRY_INTERVAL)))
+
+
+def get_token_metrics():
+    """Token age and refresh statistics for status endpoints."""
+    now = time.time()
+    has_token = bool(token_state["token"])
+    expires_in = token_state["expires_at"] - now if has_token else None
+    return {
+        "has_token": has_token,
+        "origin": token_state["origin"],
+        "age_seconds": round(now - token_state["acquired_at"]) if token_state["acquired_at"] else None,
+        "expires_at": token_state["expires_at"] or None,
+        "expires_in_seconds": round(expires_in) if expires_in is not None else None,
+        "refresh_at": token_state["expires_at"] - REFRESH_BEFORE if has_token else None,
+        "signed_in_for_seconds": round(now - token_state["signed_in_at"]) if token_state["signed_in_at"] else None,
+        "expiring": expires_in is not None and expires_in < REFRESH_BEFORE,
+        "refresh_count": token_state["refresh_count"],
+        "refresh_failures": token_state["refresh_failures"],
+        "last_refresh": token_state["last_refresh"],
+        "last_error": token_state["last_error"],
+        "cache_writes": token_state["cache_writes"]
+    }
@@ -0,0 +1,155 @@
+"""
+Content-addressed cache of downloaded result workbooks.
+
+Every downloaded workbook is stored once under its SHA-256 in
+`workbook_cache/`, so re-downloading identical bytes does not add a file.
+The cache is bounded by entry count and total size and evicts the least
+recently used versions first. Parse results are memoized in memory by the
+same hash, which makes re-parsing a known version free.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workbook_cache")
+MAX_ENTRIES = 50
+MAX_BYTES = 200 * 1024 * 1024
+
+# hash -> metadata, ordered from least to most recently used
+_index = OrderedDict()
+# hash -> (discipline, category, competitors)
+_parsed = {}
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.Lock()
+
+
+def content_hash(content):
+    """SHA-256 hex digest identifying a workbook version."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def _path(digest):
+    return os.path.join(CACHE_DIR, f"{digest}.xlsx")
+
+
+def _load_index():
+    """Rebuild the index from files on disk, oldest access first."""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".xlsx") and len(name) == 69:
+            path = os.path.join(CACHE_DIR, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, {
+                "hash": name[:-5],
+                "size": stat.st_size,
+                "source": None,
+                "stored_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                "last_used": stat.st_mtime
+            }))
+    for _, meta in sorted(entries, key=lambda e: e[0]):
+        _index[meta["hash"]] = meta
+
+
+def _evict():
+    """Drop least recently used versions until both bounds hold."""
+    total = sum(meta["size"] for meta in _index.values())
+    while _index and (len(_index) > MAX_ENTRIES or total > MAX_BYTES):
+        digest, meta = _index.popitem(last=False)
+        _parsed.pop(digest, None)
+        total -= meta["size"]
+        _stats["evictions"] += 1
+        try:
+            os.remove(_path(digest))
+        except OSError as e:
+            print(f"Warning: Failed to remove cached workbook {digest}: {e}")
+
+
+def store(content, source=None):
+    """Store workbook bytes (deduplicated) and return their hash."""
+    digest = content_hash(content)
+    with _lock:
+        meta = _index.get(digest)
+        if meta is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = _path(digest) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, _path(digest))
+            meta = {
+                "hash": digest,
+                "size": len(content),
+                "source": source,
+                "stored_at": datetime.now().isoformat(),
+                "last_used": None
+            }
+            _index[digest] = meta
+        else:
+            # Keep the file's mtime as the access time used after a restart
+            os.utime(_path(digest))
+        meta["last_used"] = datetime.now().timestamp()
+        _index.move_to_end(digest)
+        _evict()
+    return digest
+
+
+def load(digest):
+    """Return the cached bytes for a hash, or None if it is not cached."""
+    with _lock:
+        if digest not in _index:
+            return None
+        _index.move_to_end(digest)
+    with open(_path(digest), "rb") as f:
+        return f.read()
+
+
+def get_parsed(digest):
+    """Return the memoized parse result for a hash, or None."""
+    with _lock:
+        result = _parsed.get(digest)
+        if result is None:
+            _stats["misses"] += 1
+        else:
+            _stats["hits"] += 1
+        return result
+
+
+def set_parsed(digest, result):
+    """Memoize a parse result; ignored if the version was already evicted."""
+    with _lock:
+        if digest in _index:
+            _parsed[digest] = result
+
+
+def list_versions():
+    """Cached workbook versions, most recently used first."""
+    with _lock:
+        versions = []
+        for digest, meta in reversed(_index.items()):
+            result = _parsed.get(digest)
+            versions.append({
+                **meta,
+                "last_used": datetime.fromtimestamp(meta["last_used"]).isoformat() if meta["last_used"] else None,
+                "parsed": result is not None,
+                "category": result[1] if result else None,
+                "competitors": len(result[2]) if result else None
+            })
+        return versions
+
+
+def get_cache_stats():
+    """Entry count, size and hit/miss counters."""
+    with _lock:
+        return {
+            "entries": len(_index),
+            "bytes": sum(meta["size"] for meta in _index.values()),
+            "max_entries": MAX_ENTRIES,
+            "max_bytes": MAX_BYTES,
+            **_stats
+        }
+
+
+_load_index()
@@ -1,5 +1,9 @@
 import React, { useEffect, useState } from 'react';
+import { createStateStream, openUpdatesSocket, decodeMessage, answerHeartbeat } from './stateSync';
 const API_BASE = "http://localhost:8000";
+// Which watched workbook this page controls, e.g. /operator?source=rink2
+const SOURCE = new URLSearchParams(window.location.search).get("source") || "default";
+const SOURCE_QUERY = `source=${encodeURIComponent(SOURCE)}`;
 function OperatorPage() {
   const [excelUrl, setExcelUrl] = useState("");
   const [liveState, setLiveState] = useState({ category: null, discipline: null, competitors: [], category_complete: false });
@@ -113,21 +117,22 @@ function OperatorPage() {
         console.error("Error fetching auto-refresh settings:", err);
       });
     
-    const ws = new WebSocket(`ws://localhost:8000/ws/operator`);
+    const ws = openUpdatesSocket(`ws://localhost:8000/ws/operator?${SOURCE_QUERY}`);
+    // Live and public state arrive as snapshots or as patches against the previous version
+    const liveStream = createStateStream(ws, "live", setLiveState);
+    const publicStream = createStateStream(ws, "public", setPublicState);
     ws.onmessage = e => {
-      const msg = JSON.parse(e.data);
+      const msg = decodeMessage(e);
+      if (answerHeartbeat(ws, msg)) return;
       console.log("Received WebSocket message:", msg);
-      if (msg.type === "live_update") {
-        console.log("Updating live state with:", msg.data);
-        setLiveState(msg.data);
-        
+      if (liveStream(msg)) {
         // Check if this was an auto-refresh
         if (msg.auto_refreshed) {
           setLastAutoRefresh(msg.timestamp || new Date().toISOString());
           console.log("Auto-refreshed data at:", msg.timestamp);
         }
       }
-      if (msg.type === "public_update") setPublicState(msg.data);
+      publicStream(msg);
       // No longer handling background_update for operator view
     };
     return () => ws.close();
@@ -217,7 +222,7 @@ function OperatorPage() {
       setError("");
       console.log(`Making POST request to ${url}`, body);
       
-      const response = await fetch(`${API_BASE}${url}`, {
+      const response = await fetch(`${API_BASE}${url}?${SOURCE_QUERY}`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(body)
@@ -265,7 +270,7 @@ function OperatorPage() {
       setIsLoading(true);
       try {
         // Raw fetch implementation as a fallback
-        const response = await fetch(`${API_BASE}/switch_display_mode`, {
+        const response = await fetch(`${API_BASE}/switch_display_mode?${SOURCE_QUERY}`, {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ mode: "results" })
@@ -284,7 +289,7 @@ function OperatorPage() {
     safelyCallAPI(async () => {
       setIsLoading(true);
       try {
-        const response = await fetch(`${API_BASE}/switch_display_mode`, {
+        const response = await fetch(`${API_BASE}/switch_display_mode?${SOURCE_QUERY}`, {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({ mode: "message" })
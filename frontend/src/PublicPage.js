@@ -1,5 +1,8 @@
 import React, { useEffect, useState, useRef, useCallback } from 'react';
+import { createStateStream, openUpdatesSocket, decodeMessage, answerHeartbeat } from './stateSync';
 const API_BASE = "http://localhost:8000";
+// Which watched workbook this display shows, e.g. /public?source=rink2
+const SOURCE = new URLSearchParams(window.location.search).get("source") || "default";
 
 // Country code to flag mapping using flag API
 const getFlag = (countryCode) => {
@@ -288,10 +291,13 @@ function PublicPage() {
       document.head.appendChild(fontLink);
     });
     
-    const ws=new WebSocket(`ws://localhost:8000/ws/public`);
+    const ws=openUpdatesSocket(`ws://localhost:8000/ws/public?source=${encodeURIComponent(SOURCE)}`);
+    // The public state arrives as a snapshot or as a patch against the previous version
+    const publicStream=createStateStream(ws,"public",setState);
     ws.onmessage=e=>{
-      const msg=JSON.parse(e.data);
-      if(msg.type==="public_update")setState(msg.data);
+      const msg=decodeMessage(e);
+      if(answerHeartbeat(ws,msg))return;
+      if(publicStream(msg))return;
       if(msg.type==="background_update"){
         console.log(`Received background update: ${msg.url}`);
         
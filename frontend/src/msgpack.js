@@ -0,0 +1,88 @@
+// Minimal MessagePack decoder for the binary WebSocket frames of the
+// "slalom.msgpack" subprotocol. Decoding only, and only the types the
+// backend produces (no extension types).
+const textDecoder = new TextDecoder();
+
+export function decodeMsgpack(bytes) {
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  let pos = 0;
+
+  const str = length => {
+    const value = textDecoder.decode(bytes.subarray(pos, pos + length));
+    pos += length;
+    return value;
+  };
+  const array = length => {
+    const value = new Array(length);
+    for (let i = 0; i < length; i++) value[i] = read();
+    return value;
+  };
+  const map = length => {
+    const value = {};
+    for (let i = 0; i < length; i++) {
+      const key = read();
+      value[key] = read();
+    }
+    return value;
+  };
+  const bin = length => {
+    const value = bytes.slice(pos, pos + length);
+    pos += length;
+    return value;
+  };
+  const uint = size => {
+    let value;
+    if (size === 1) value = view.getUint8(pos);
+    else if (size === 2) value = view.getUint16(pos);
+    else if (size === 4) value = view.getUint32(pos);
+    else value = Number(view.getBigUint64(pos));
+    pos += size;
+    return value;
+  };
+  const int = size => {
+    let value;
+    if (size === 1) value = view.getInt8(pos);
+    else if (size === 2) value = view.getInt16(pos);
+    else if (size === 4) value = view.getInt32(pos);
+    else value = Number(view.getBigInt64(pos));
+    pos += size;
+    return value;
+  };
+
+  function read() {
+    const type = view.getUint8(pos++);
+    if (type <= 0x7f) return type;
+    if (type <= 0x8f) return map(type & 0x0f);
+    if (type <= 0x9f) return array(type & 0x0f);
+    if (type <= 0xbf) return str(type & 0x1f);
+    if (type >= 0xe0) return type - 0x100;
+    switch (type) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return bin(uint(1));
+      case 0xc5: return bin(uint(2));
+      case 0xc6: return bin(uint(4));
+      case 0xca: { const value = view.getFloat32(pos); pos += 4; return value; }
+      case 0xcb: { const value = view.getFloat64(pos); pos += 8; return value; }
+      case 0xcc: return uint(1);
+      case 0xcd: return uint(2);
+      case 0xce: return uint(4);
+      case 0xcf: return uint(8);
+      case 0xd0: return int(1);
+      case 0xd1: return int(2);
+      case 0xd2: return int(4);
+      case 0xd3: return int(8);
+      case 0xd9: return str(uint(1));
+      case 0xda: return str(uint(2));
+      case 0xdb: return str(uint(4));
+      case 0xdc: return array(uint(2));
+      case 0xdd: return array(uint(4));
+      case 0xde: return map(uint(2));
+      case 0xdf: return map(uint(4));
+      default: throw new Error(`Unsupported MessagePack type 0x${type.toString(16)}`);
+    }
+  }
+
+  return read();
+}
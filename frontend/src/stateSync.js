@@ -0,0 +1,85 @@
+// Versioned live/public state updates from the backend.
+// Snapshots (live_update / public_update) replace the state, patches
+// (live_patch / public_patch) are applied on top of the version they were
+// made from. A patch for any other version means a message was missed, so
+// the page asks the server for a fresh snapshot instead.
+import { decodeMsgpack } from './msgpack';
+
+// Open an updates WebSocket. With ?transport=msgpack in the page URL the
+// page asks for binary MessagePack frames (smaller on congested venue
+// networks); a server without MessagePack support accepts "slalom.json"
+// and sends JSON as before. ?label=... in the page URL names the screen in
+// the server's connection list.
+export function openUpdatesSocket(url) {
+  const params = new URLSearchParams(window.location.search);
+  const transport = params.get("transport");
+  const label = params.get("label");
+  if (label) url += `${url.includes("?") ? "&" : "?"}label=${encodeURIComponent(label)}`;
+  const ws = transport === "msgpack" ? new WebSocket(url, ["slalom.msgpack", "slalom.json"]) : new WebSocket(url);
+  ws.binaryType = "arraybuffer";
+  return ws;
+}
+
+// Decode a message event of an updates socket, text (JSON) or binary (MessagePack)
+export function decodeMessage(event) {
+  return typeof event.data === "string" ? JSON.parse(event.data) : decodeMsgpack(new Uint8Array(event.data));
+}
+
+// Answer the server's heartbeat pings; a page that stops answering is
+// treated as gone. Returns true if the message was a ping.
+export function answerHeartbeat(ws, msg) {
+  if (msg.type !== "ping") return false;
+  if (ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify({ type: "pong", id: msg.id }));
+  return true;
+}
+
+// Apply a patch message to a state object without mutating it. Unchanged
+// competitors keep their object identity, so rows that did not change do
+// not have to re-render.
+export function applyPatch(state, patch) {
+  const next = { ...state, ...(patch.fields || {}) };
+  (patch.removed_fields || []).forEach(key => { delete next[key]; });
+  if (patch.competitors) {
+    const { upsert = [], remove = [], order } = patch.competitors;
+    const previous = state.competitors || [];
+    const removed = new Set(remove);
+    const byName = new Map(previous.map(c => [c.name, c]));
+    remove.forEach(name => byName.delete(name));
+    const added = [];
+    upsert.forEach(c => {
+      if (!byName.has(c.name)) added.push(c.name);
+      byName.set(c.name, c);
+    });
+    const names = order || [...previous.map(c => c.name).filter(name => !removed.has(name)), ...added];
+    next.competitors = names.map(name => byName.get(name));
+  }
+  return next;
+}
+
+// Returns a handler for the messages of one stream ("live" or "public")
+// that keeps track of the sequence number and updates the state through
+// setState. Returns true if the message belonged to the stream.
+export function createStateStream(ws, stream, setState) {
+  let seq = null;
+  let resyncRequested = false;
+  return msg => {
+    if (msg.type === `${stream}_update`) {
+      seq = msg.seq ?? null;
+      resyncRequested = false;
+      setState(msg.data);
+      return true;
+    }
+    if (msg.type === `${stream}_patch`) {
+      if (seq !== null && msg.base === seq) {
+        seq = msg.seq;
+        setState(prev => applyPatch(prev, msg));
+      } else if (!resyncRequested && ws.readyState === WebSocket.OPEN) {
+        console.log(`Missed ${stream} update (have ${seq}, patch is based on ${msg.base}), requesting snapshot`);
+        resyncRequested = true;
+        ws.send(JSON.stringify({ type: "resync", stream }));
+      }
+      return true;
+    }
+    return false;
+  };
+}